@@ -116,7 +116,6 @@ def get_stock_daily_prices(code=None, start_date=datetime(1995, 5, 2), end_date=
                     close                   | (float)
                     market_capitalization   | (bigint)
                     listed_stocks_number    | (bigint)
-                    adj_close               | (float)
     """
     schema_name = 'stock_daily_price'
     select_sql = "SELECT * FROM {}".format(schema_name)
@@ -134,8 +133,6 @@ def get_stock_daily_prices(code=None, start_date=datetime(1995, 5, 2), end_date=
         # get all stock codes from the db.
         stock_daily_prices = pd.read_sql(select_sql, connection, parse_dates=['date'])
         stock_daily_prices.set_index(['code', 'date'], inplace=True)
-        stock_daily_prices['adj_close'] = stock_daily_prices['market_capitalization'] / stock_daily_prices[
-            'listed_stocks_number']
 
     except SQLAlchemyError or EnvironmentError:
         traceback.print_exc()
@@ -3,20 +3,21 @@
 :Author: Jaekyoung Kim
 :Date: 2018. 1. 10.
 """
-import os
 import time
 import traceback
 from datetime import datetime
-from pathlib import Path
 import argparse
 
+import pandas as pd
 from sqlalchemy import types
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError, InterfaceError, OperationalError
 
 import scrapper.database_reader as dr
 from scrapper import krx
+from scrapper.rate_limiter import RateLimiter
 from scrapper.sql import stock_master_create_table_sql, stock_daily_price_create_table_sql, stock_trend_create_table_sql
 from table.base import DATA_DIR
+from table.tables import StockMaster, StockDailyPrice
 from util.database_supporter import get_connection
 from util.date_supporter import get_business_days
 from util.pandas_expansion import df_difference
@@ -51,11 +52,8 @@ def save_stock_masters():
                 stock_masters.to_csv(csv_file_path, encoding='utf-8')
                 print('Replace {}'.format(csv_file_path))
 
-                # Remove stock_master.h5
-                hdf_file_path = DATA_DIR + schema_name + '.h5'
-                if Path(hdf_file_path).exists():
-                    os.remove(hdf_file_path)
-                    print('Remove {}'.format(hdf_file_path))
+                # Append new_stock_masters to the cache of stock_master.
+                StockMaster.instance().append(new_stock_masters)
 
         except IntegrityError:
             pass
@@ -90,7 +88,17 @@ def save_stock_daily_prices(start_date=datetime(1995, 5, 2), end_date=datetime.t
         connection.close()
 
     dates = get_business_days(start_date, end_date).sort_values(ascending=False)
-    parallel_process(save_stock_daily_price, dates, timeout=None)
+    results = parallel_process(save_stock_daily_price, dates, timeout=None)
+
+    # Append only the days which are inserted now to the cache of stock_daily_price,
+    # instead of reading all days from start_date again.
+    inserted_dates = pd.DatetimeIndex([result for result in results if isinstance(result, datetime)])
+    if len(inserted_dates) != 0:
+        stock_daily_prices = dr.get_stock_daily_prices(start_date=inserted_dates.min(), end_date=inserted_dates.max())
+        if len(stock_daily_prices) != 0:
+            stock_daily_prices = stock_daily_prices.loc[
+                stock_daily_prices.index.get_level_values('date').normalize().isin(inserted_dates.normalize())]
+            StockDailyPrice.instance().append(stock_daily_prices)
 
     print(
         "Scrapping {} of {} days is done taking {} seconds!!".format(schema_name, len(dates), time.time() - start_time))
@@ -102,6 +110,8 @@ def save_stock_daily_price(date=datetime.today(), create_table=False):
 
     :param date: (datetime, default=datetime.today())
     :param create_table: whether execute create_table_sql or not.
+
+    :return inserted_date: (datetime) The date if new prices of it are inserted, otherwise None.
     """
     schema_name = 'stock_daily_price'
     connection = get_connection()
@@ -119,6 +129,8 @@ def save_stock_daily_price(date=datetime.today(), create_table=False):
             new_stock_daily_prices.to_sql(schema_name, connection, if_exists='append',
                                           dtype={'code': types.VARCHAR(12)})
             print('Insert {}, count {}'.format(date, len(new_stock_daily_prices)))
+            if len(new_stock_daily_prices) != 0:
+                return date
 
         except IntegrityError:
             pass
@@ -131,6 +143,14 @@ def save_stock_daily_price(date=datetime.today(), create_table=False):
         connection.close()
 
 
+def print_krx_stats():
+    """
+    Print the request rate which all scrapping processes share.
+    """
+    print('KRX request rate: {request_rate:.1f}/s, rate limit: {rate:.1f}/s, latency: {latency:.2f}s, '
+          'error rate: {error_rate:.2%}'.format(**RateLimiter().get_stats()))
+
+
 def save_stock_trends(start_date=datetime(1995, 5, 2), end_date=datetime.today(), process_multiplier=None):
     # 날짜 구해서 역수로 돌려가며 save_stock_trend 병렬로
     schema_name = 'stock_trend'
@@ -148,6 +168,7 @@ def save_stock_trends(start_date=datetime(1995, 5, 2), end_date=datetime.today()
 
     dates = get_business_days(start_date, end_date).sort_values(ascending=False)
     parallel_process(save_stock_trend, dates, process_multiplier=process_multiplier)
+    print_krx_stats()
 
     print(
         "Scrapping {} of {} days is done taking {} seconds!!".format(schema_name, len(dates), time.time() - start_time))
@@ -185,6 +206,83 @@ def save_stock_trend(date):
         connection.close()
 
 
+def save_stock_trends_by_range(start_date=datetime(1995, 5, 2), end_date=datetime.today(),
+                               window_days=krx.DEFAULT_TREND_WINDOW_DAYS, process_multiplier=None):
+    """
+    Save stock trends from start date to end date stock by stock.
+    Each stock downloads a file per window of dates instead of a file per date, so it needs far fewer requests
+    than save_stock_trends for a long period.
+
+    :param start_date: (datetime, default=datetime(1995, 5, 2))
+    :param end_date: (datetime, default=datetime.today())
+    :param window_days: (int, default=krx.DEFAULT_TREND_WINDOW_DAYS) The number of days of a file.
+    :param process_multiplier: (int, default=None) The multiplier of processes.
+    """
+    schema_name = 'stock_trend'
+    start_time = time.time()
+    print("Scrapping {} by range...".format(schema_name))
+
+    # create a table if not exists.
+    connection = get_connection()
+    try:
+        connection.execute(stock_trend_create_table_sql)
+    except SQLAlchemyError or EnvironmentError:
+        traceback.print_exc()
+    finally:
+        connection.close()
+
+    stock_masters = dr.get_stock_masters()
+    params = [{'code': code, 'short_code': short_code, 'company_name': company_name,
+               'start_date': start_date, 'end_date': end_date, 'window_days': window_days}
+              for code, short_code, company_name
+              in zip(stock_masters.index, stock_masters['short_code'], stock_masters['company_name'])]
+    parallel_process(save_stock_trend_range, params, process_multiplier=process_multiplier, use_kwargs=True)
+    print_krx_stats()
+
+    print("Scrapping {} of {} stocks is done taking {} seconds!!".format(schema_name, len(params),
+                                                                        time.time() - start_time))
+
+
+def save_stock_trend_range(code, short_code, company_name, start_date, end_date,
+                           window_days=krx.DEFAULT_TREND_WINDOW_DAYS):
+    """
+    Save trends of a stock from start date to end date at once.
+
+    :param code: (string)
+    :param short_code: (string)
+    :param company_name: (string)
+    :param start_date: (datetime)
+    :param end_date: (datetime)
+    :param window_days: (int, default=krx.DEFAULT_TREND_WINDOW_DAYS) The number of days of a file.
+    """
+    schema_name = 'stock_trend'
+    connection = get_connection()
+
+    try:
+        old_stock_trends = dr.get_stock_trends(code=code, start_date=start_date, end_date=end_date)
+        new_stock_trends = krx.get_stock_trend_range(code, short_code, company_name, start_date, end_date,
+                                                     window_days=window_days)
+        if len(new_stock_trends) == 0:
+            return
+
+        new_stock_trends = df_difference(new_stock_trends, old_stock_trends)
+
+        # Insert rows of all dates at once.
+        try:
+            new_stock_trends.to_sql(schema_name, connection, if_exists='append', dtype={'code': types.VARCHAR(12)},
+                                    chunksize=1000)
+            print('Insert {}, count {}'.format(code, len(new_stock_trends)))
+        except IntegrityError:
+            pass
+
+    except SQLAlchemyError or EnvironmentError or OperationalError:
+        print('Error is occur at {}.'.format(code))
+        traceback.print_exc()
+
+    finally:
+        connection.close()
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Process some integers.')
     parser.add_argument('-S', '--start_date',
@@ -205,8 +303,17 @@ if __name__ == '__main__':
                         default=None,
                         required=False,
                         help='The multiplier of processes.')
+    parser.add_argument('-R', '--by_range',
+                        dest='by_range',
+                        action='store_true',
+                        help='Download a file per stock and window of dates instead of per stock and date.')
     args = parser.parse_args()
 
     # save_stock_masters()
     # save_stock_daily_prices(start_date=datetime.today())
-    save_stock_trends(start_date=args.start_date, end_date=args.end_date, process_multiplier=args.process_multiplier)
+    if args.by_range:
+        save_stock_trends_by_range(start_date=args.start_date, end_date=args.end_date,
+                                   process_multiplier=args.process_multiplier)
+    else:
+        save_stock_trends(start_date=args.start_date, end_date=args.end_date,
+                          process_multiplier=args.process_multiplier)
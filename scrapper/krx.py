@@ -4,18 +4,21 @@
 :Date: 2018. 1. 10.
 """
 import json
-from datetime import datetime
+import warnings
+from datetime import datetime, timedelta
 from io import BytesIO, StringIO
 
+import numpy as np
 import pandas as pd
-import requests
 
 from table.tables import StockMaster
 import scrapper.database_reader as dr
+from scrapper.krx_client import GENERATE_OTP_PATH, get_krx_client
 
 delisted_stock_master_usecols = {'isu_cd': 'code', 'shrt_isu_cd': 'short_code', 'isu_nm': 'company_name',
                                  'market_name': 'market_name'}
 stock_master_index = ['code']
+stock_master_path = '/contents/MKD/99/MKD99000001.jspx'
 
 
 def get_stock_masters():
@@ -26,30 +29,27 @@ def get_stock_masters():
         index       code        | (string) with 6 length numbers.
         columns     name        | (string)
     """
+    client = get_krx_client()
+
     # Listed Stock Master
     # STEP 01: Generate OTP
-    gen_otp_url = 'http://marketdata.krx.co.kr/contents/COM/GenerateOTP.jspx'
     gen_otp_data = {
         'bld': 'COM/finder_stkisu',
         'name': 'form',
         '_': '1515578494324',
     }
 
-    r = requests.get(url=gen_otp_url, params=gen_otp_data)
-    code = r.content
-
     # STEP 02: download
-    down_url = 'http://marketdata.krx.co.kr/contents/MKD/99/MKD99000001.jspx'
+    down_url = client.marketdata_url + stock_master_path
     down_data = {
         'no': 'P1',
         'mktsel': 'ALL',
         'pagePath': '/contents/COM/FinderStkIsu.jsp',
-        'code': code,
         'pageFirstCall': 'Y'
     }
 
-    r = requests.post(down_url, down_data)
-    dict_stock_masters = json.loads(str(BytesIO(r.content).getvalue()))['block1']
+    r = client.download(gen_otp_data, down_url=down_url, down_data=down_data, otp_method='get')
+    dict_stock_masters = json.loads(BytesIO(r.content).getvalue())['block1']
     listed_stock_masters = pd.DataFrame(dict_stock_masters)
     listed_stock_masters = listed_stock_masters.rename(columns={'full_code': 'code',
                                                                 'codeName': 'company_name',
@@ -57,28 +57,22 @@ def get_stock_masters():
 
     # Delisted Stock Master
     # STEP 01: Generate OTP
-    gen_otp_url = 'http://marketdata.krx.co.kr/contents/COM/GenerateOTP.jspx'
     gen_otp_data = {
         'bld': 'COM/finder_dellist_isu',
         'name': 'form',
         '_': '1515817443613',
     }
 
-    r = requests.post(gen_otp_url, gen_otp_data)
-    code = r.content
-
     # STEP 02: download
-    down_url = 'http://marketdata.krx.co.kr/contents/MKD/99/MKD99000001.jspx'
     down_data = {
         'isuCd': '',
         'mktsel': 'ALL',
         'searchText': '',
         'pagePath': '/contents/COM/FinderDelListIsu.jsp',
-        'code': code,
         'pageFirstCall': 'Y'
     }
 
-    r = requests.post(down_url, down_data)
+    r = client.download(gen_otp_data, down_url=down_url, down_data=down_data)
     dict_stock_masters = json.loads(BytesIO(r.content).getvalue())['result']
     delisted_stock_masters = pd.DataFrame(dict_stock_masters)
     delisted_stock_masters = delisted_stock_masters[list(delisted_stock_master_usecols.keys())]
@@ -112,7 +106,6 @@ def get_stock_daily_prices(date=datetime.today()):
     str_date = date.strftime("%Y%m%d")
 
     # STEP 01: Generate OTP
-    gen_otp_url = 'http://marketdata.krx.co.kr/contents/COM/GenerateOTP.jspx'
     gen_otp_data = {
         'name': 'fileDown',
         'filetype': 'xls',
@@ -124,19 +117,13 @@ def get_stock_daily_prices(date=datetime.today()):
         'pagePath': '/contents/MKD/04/0404/04040200/MKD04040200.jsp',
     }
 
-    r = requests.post(url=gen_otp_url, data=gen_otp_data)
-    code = r.content
-
     # STEP 02: download
-    down_url = 'http://file.krx.co.kr/download.jspx'
-    down_data = {
-        'code': code,
-    }
+    client = get_krx_client()
     headers = {
-        'referer': gen_otp_url,
+        'referer': client.marketdata_url + GENERATE_OTP_PATH,
     }
 
-    r = requests.post(down_url, down_data, headers=headers)
+    r = client.download(gen_otp_data, headers=headers)
     stock_daily_prices = pd.read_excel(BytesIO(r.content), thousands=',')
 
     stock_daily_prices['날짜'] = date
@@ -146,8 +133,32 @@ def get_stock_daily_prices(date=datetime.today()):
     return stock_daily_prices
 
 
-stock_trend_usecols = {'투자자명': 'investor', '거래량_매수': 'buy', '거래량_매도': 'sell'}
 stock_trend_columns = ['투자자명', '거래량_매수', '거래량_매도']
+stock_trend_investor_column = '투자자명'
+stock_trend_volume_columns = ['거래량_매수', '거래량_매도']
+stock_trend_date_column = '일자'
+stock_trend_investors = {
+    '금융투자': 'investing_organization',
+    '보험': 'insurance',
+    '투신': 'investment_trust',
+    '사모': 'private_equity_fund',
+    '은행': 'bank',
+    '기타금융': 'other_finance',
+    '연기금': 'pension_fund',
+    '국가.지자체': 'government',
+    '기타법인': 'other_corporation',
+    '개인': 'individual',
+    '외국인': 'foreigner',
+    '기타외국인': 'other_foreigner',
+}
+# Investor names in the order of stock_trend_result_columns. Its hash table maps names to positions at once.
+stock_trend_investor_names = pd.Index(sorted(stock_trend_investors, key=stock_trend_investors.get))
+stock_trend_result_columns = ['{}_{}'.format(stock_trend_investors[investor_name], side)
+                              for investor_name in stock_trend_investor_names for side in ['buy', 'sell']]
+stock_trend_index = ['code', 'date']
+
+# The number of days of a trend file. A file of a year has about 250 dates.
+DEFAULT_TREND_WINDOW_DAYS = 365
 
 
 def get_stock_trends(date):
@@ -186,129 +197,208 @@ def get_stock_trends(date):
     if dr.count_stock_daily_prices(start_date=date, end_date=date) == 0:
         return pd.DataFrame()
 
-    stock_masters = StockMaster.instance().select().values()
-
     stock_daily_prices = dr.get_stock_daily_prices(start_date=date, end_date=date)
 
     if len(stock_daily_prices) == 0:
         return pd.DataFrame()
 
-    results = []
-    for index, row in stock_daily_prices.iterrows():
-        code = index[0]
+    # Find short_codes and company_names of all codes at once.
+    codes = stock_daily_prices.index.get_level_values(0)
+    stock_masters = StockMaster.instance().lookup(codes, columns=['short_code', 'company_name'])
+
+    return get_stock_trends_of_codes(date, codes, stock_masters['short_code'], stock_masters['company_name'])
 
-        # Set the short_code by stock_masters.
-        short_code = stock_masters.loc[code, 'short_code']
-        company_name = stock_masters.loc[code, 'company_name']
 
-        results.append(get_stock_trend(date, code, short_code, company_name))
+def get_stock_trends_of_codes(date, codes, short_codes, company_names):
+    """
+    Get trends of the stocks of the date by scrapping KRX.
+
+    :param date: (datetime)
+    :param codes: (array-like)
+    :param short_codes: (array-like) Short codes in the order of codes.
+    :param company_names: (array-like) Company names in the order of codes.
 
-    # Concat results
-    if len(results) > 0:
-        stock_trends = pd.concat(results)
-    else:
+    :return stock_trends: (DataFrame) See get_stock_trends. Codes without short codes or company names are dropped.
+    """
+    # StockMaster.lookup gives NaN to unknown codes, which make OTP forms of no stock.
+    codes, short_codes, company_names = np.asarray(codes), np.asarray(short_codes), np.asarray(company_names)
+    is_known = pd.notnull(short_codes) & pd.notnull(company_names)
+    if not is_known.all():
+        warnings.warn('{} are not in stock_master, so their trends are not scrapped.'.format(list(codes[~is_known])))
+        codes, short_codes, company_names = codes[is_known], short_codes[is_known], company_names[is_known]
+
+    # Download trends of all stocks at the same time through kept-alive connections.
+    gen_otp_data_list = [_get_stock_trend_otp_data(code, short_code, company_name, date, date)
+                         for code, short_code, company_name
+                         in zip(codes, short_codes, company_names)]
+    responses = get_krx_client().download_all(gen_otp_data_list, otp_method='get')
+
+    # Fill a preallocated array row by row, and make a frame of the date at once.
+    values = np.zeros((len(codes), len(stock_trend_result_columns)), dtype=np.int64)
+    is_found = np.zeros(len(codes), dtype=bool)
+    for position, response in enumerate(responses):
+        stock_trend_values = _parse_stock_trend_values(response.text)
+        if stock_trend_values is not None:
+            values[position] = stock_trend_values
+            is_found[position] = True
+
+    if not np.any(is_found):
         raise RuntimeError("{} has no result.".format(date))
 
-    return stock_trends
+    return _to_stock_trends(values[is_found], codes[is_found], [date] * int(is_found.sum()))
 
 
-def get_stock_trend(date, code, short_code, company_name):
-    # STEP 01: Generate OTP
-    gen_otp_url = 'http://marketdata.krx.co.kr/contents/COM/GenerateOTP.jspx'
-    gen_otp_data = {
+def _get_stock_trend_otp_data(code, short_code, company_name, from_date, to_date):
+    return {
         'name': 'fileDown',
         'filetype': 'csv',
         'url': 'MKD/10/1002/10020101/mkd10020101',
         'isu_cdnm': '{}/{}'.format(short_code, company_name),
         'isu_cd': '{}'.format(code),
         'isu_srt_cd': '{}'.format(short_code),
-        'fromdate': date.strftime('%Y%m%d'),
-        'todate': date.strftime('%Y%m%d'),
+        'fromdate': from_date.strftime('%Y%m%d'),
+        'todate': to_date.strftime('%Y%m%d'),
         'pagePath': '/contents/MKD/10/1002/10020101/MKD10020101.jsp',
     }
 
-    r = requests.get(url=gen_otp_url, params=gen_otp_data)
-    request_code = r.content
+
+def get_stock_trend(date, code, short_code, company_name):
+    # STEP 01: Generate OTP
+    gen_otp_data = _get_stock_trend_otp_data(code, short_code, company_name, date, date)
 
     # STEP 02: download
-    down_url = 'http://file.krx.co.kr/download.jspx'
-    down_data = {
-        'code': request_code,
-    }
+    csv_str = get_krx_client().download(gen_otp_data, otp_method='get').text
+
+    stock_trend_values = _parse_stock_trend_values(csv_str)
+
+    # Return empty DataFrame if stock_trends are empty.
+    if stock_trend_values is None:
+        return pd.DataFrame()
 
-    csv_str = requests.post(down_url, down_data).text
+    return _to_stock_trends(stock_trend_values.reshape(1, -1), [code], [date])
 
+
+def _read_stock_trend_csv(csv_str, usecols):
+    """
+    :return trends: (DataFrame) None if the csv is empty.
+    """
     # Remove the last row, which has sum.
     csv_str = '\n'.join(csv_str.split('\n')[:-1])
 
+    if csv_str == '':
+        return None
+
+    return pd.read_csv(StringIO(csv_str), thousands=',', engine='python', usecols=usecols)
+
+
+def _get_investor_positions(trends):
+    """
+    :return positions: (ndarray of int64) The position of the investor of each row in stock_trend_investor_names.
+        -1 if the investor is not one of them, like a subtotal of other investors.
+    :return volumes: (ndarray of int64) Buy and sell volumes of each row.
+    """
+    positions = stock_trend_investor_names.get_indexer(trends[stock_trend_investor_column].values)
+    volumes = trends[stock_trend_volume_columns].fillna(0).values.astype(np.int64)
+    return positions, volumes
+
+
+def _parse_stock_trend_values(csv_str):
+    """
+    :return values: (ndarray of int64) Volumes in the order of stock_trend_result_columns.
+        Volumes of missing investors are 0. None if the csv is empty.
+    """
+    trend = _read_stock_trend_csv(csv_str, stock_trend_columns)
+    if trend is None:
+        return None
+
+    positions, volumes = _get_investor_positions(trend)
+    is_investor = positions >= 0
+
+    # A row per investor becomes (buy, sell) pairs in a row.
+    values = np.zeros((len(stock_trend_investor_names), len(stock_trend_volume_columns)), dtype=np.int64)
+    values[positions[is_investor]] = volumes[is_investor]
+    return values.ravel()
+
+
+def _to_stock_trends(values, codes, dates):
+    """
+    :param values: (ndarray of int64) A row per stock and date in the order of stock_trend_result_columns.
+    :param codes: (array-like)
+    :param dates: (array-like)
+
+    :return stock_trends: (DataFrame)
+    """
+    index = pd.MultiIndex.from_arrays([codes, pd.DatetimeIndex(dates)], names=stock_trend_index)
+    return pd.DataFrame(values, index=index, columns=stock_trend_result_columns)
+
+
+def _split_range(from_date, to_date, window_days):
+    """
+    :return windows: (list of tuple) (from_date, to_date) of each window. Both dates are inclusive.
+    """
+    to_date = pd.Timestamp(to_date).normalize()
+    return [(window_from_date, min(window_from_date + timedelta(days=window_days - 1), to_date))
+            for window_from_date in pd.date_range(pd.Timestamp(from_date).normalize(), to_date,
+                                                  freq='{}D'.format(window_days))]
+
+
+def get_stock_trend_range(code, short_code, company_name, from_date, to_date,
+                          window_days=DEFAULT_TREND_WINDOW_DAYS):
+    """
+    Get trends of a stock from from_date to to_date by scrapping KRX.
+    It downloads a file per window of dates instead of a file per date, and splits each file into rows of dates.
+
+    :param code: (string)
+    :param short_code: (string)
+    :param company_name: (string)
+    :param from_date: (datetime) Inclusive.
+    :param to_date: (datetime) Inclusive.
+    :param window_days: (int, default=DEFAULT_TREND_WINDOW_DAYS) The number of days of a file.
+
+    :return stock_trends: (DataFrame) The same columns as get_stock_trends. Empty if the stock has no trend.
+        index       code                            | (string)
+                    date                            | (datetime)
+    """
+    windows = _split_range(from_date, to_date, window_days)
+    gen_otp_data_list = [_get_stock_trend_otp_data(code, short_code, company_name, window_from_date, window_to_date)
+                         for window_from_date, window_to_date in windows]
+    responses = get_krx_client().download_all(gen_otp_data_list, otp_method='get')
+
+    results = [_parse_stock_trend_window(response.text, code, window_from_date, window_to_date)
+               for response, (window_from_date, window_to_date) in zip(responses, windows)]
+    results = [result for result in results if len(result) > 0]
+    if len(results) == 0:
+        return pd.DataFrame()
+
+    return pd.concat(results)
+
+
+def _parse_stock_trend_window(csv_str, code, from_date, to_date):
+    # KRX serves a file of a day without the date column, so parse it as a file of get_stock_trend.
+    if from_date == to_date:
+        stock_trend_values = _parse_stock_trend_values(csv_str)
+        if stock_trend_values is None:
+            return pd.DataFrame()
+        return _to_stock_trends(stock_trend_values.reshape(1, -1), [code], [from_date])
+
+    return _parse_stock_trend_range(csv_str, code)
+
+
+def _parse_stock_trend_range(csv_str, code):
+    trends = _read_stock_trend_csv(csv_str, [stock_trend_date_column] + stock_trend_columns)
+
     # Return empty DataFrame if stock_trends are empty.
-    if csv_str is "":
+    if trends is None:
         return pd.DataFrame()
 
-    one_company_trend = pd.read_csv(StringIO(csv_str), thousands=',', engine='python')
-
-    one_company_trend = one_company_trend[stock_trend_columns]
-    # Change column names.
-    one_company_trend.rename(columns=stock_trend_usecols, inplace=True)
-    investing_organization_buy = one_company_trend[one_company_trend['investor'] == '금융투자']['buy'].iloc[0]
-    investing_organization_sell = one_company_trend[one_company_trend['investor'] == '금융투자']['sell'].iloc[0]
-    insurance_buy = one_company_trend[one_company_trend['investor'] == '보험']['buy'].iloc[0]
-    insurance_sell = one_company_trend[one_company_trend['investor'] == '보험']['sell'].iloc[0]
-    investment_trust_buy = one_company_trend[one_company_trend['investor'] == '투신']['buy'].iloc[0]
-    investment_trust_sell = one_company_trend[one_company_trend['investor'] == '투신']['sell'].iloc[0]
-    private_equity_fund_buy = one_company_trend[one_company_trend['investor'] == '사모']['buy'].iloc[0]
-    private_equity_fund_sell = one_company_trend[one_company_trend['investor'] == '사모']['sell'].iloc[0]
-    bank_buy = one_company_trend[one_company_trend['investor'] == '은행']['buy'].iloc[0]
-    bank_sell = one_company_trend[one_company_trend['investor'] == '은행']['sell'].iloc[0]
-    other_finance_buy = one_company_trend[one_company_trend['investor'] == '기타금융']['buy'].iloc[0]
-    other_finance_sell = one_company_trend[one_company_trend['investor'] == '기타금융']['sell'].iloc[0]
-    pension_fund_buy = one_company_trend[one_company_trend['investor'] == '연기금']['buy'].iloc[0]
-    pension_fund_sell = one_company_trend[one_company_trend['investor'] == '연기금']['sell'].iloc[0]
-    government_buy = one_company_trend[one_company_trend['investor'] == '국가.지자체']['buy'].iloc[0]
-    government_sell = one_company_trend[one_company_trend['investor'] == '국가.지자체']['sell'].iloc[0]
-    other_corporation_buy = one_company_trend[one_company_trend['investor'] == '기타법인']['buy'].iloc[0]
-    other_corporation_sell = one_company_trend[one_company_trend['investor'] == '기타법인']['sell'].iloc[0]
-    individual_buy = one_company_trend[one_company_trend['investor'] == '개인']['buy'].iloc[0]
-    individual_sell = one_company_trend[one_company_trend['investor'] == '개인']['sell'].iloc[0]
-    foreigner_buy = one_company_trend[one_company_trend['investor'] == '외국인']['buy'].iloc[0]
-    foreigner_sell = one_company_trend[one_company_trend['investor'] == '외국인']['sell'].iloc[0]
-    other_foreigner_buy = one_company_trend[one_company_trend['investor'] == '기타외국인']['buy'].iloc[0]
-    other_foreigner_sell = one_company_trend[one_company_trend['investor'] == '기타외국인']['sell'].iloc[0]
-
-    stock_trend = pd.DataFrame(data={
-        'investing_organization_buy': [investing_organization_buy],
-        'investing_organization_sell': [investing_organization_sell],
-        'insurance_buy': [insurance_buy],
-        'insurance_sell': [insurance_sell],
-        'investment_trust_buy': [investment_trust_buy],
-        'investment_trust_sell': [investment_trust_sell],
-        'private_equity_fund_buy': [private_equity_fund_buy],
-        'private_equity_fund_sell': [private_equity_fund_sell],
-        'bank_buy': [bank_buy],
-        'bank_sell': [bank_sell],
-        'other_finance_buy': [other_finance_buy],
-        'other_finance_sell': [other_finance_sell],
-        'pension_fund_buy': [pension_fund_buy],
-        'pension_fund_sell': [pension_fund_sell],
-        'government_buy': [government_buy],
-        'government_sell': [government_sell],
-        'other_corporation_buy': [other_corporation_buy],
-        'other_corporation_sell': [other_corporation_sell],
-        'individual_buy': [individual_buy],
-        'individual_sell': [individual_sell],
-        'foreigner_buy': [foreigner_buy],
-        'foreigner_sell': [foreigner_sell],
-        'other_foreigner_buy': [other_foreigner_buy],
-        'other_foreigner_sell': [other_foreigner_sell],
-    })
-
-    # Set a code of the company.
-    stock_trend['code'] = code
-
-    # Set date.
-    stock_trend['date'] = date
-
-    # Set index.
-    stock_trend = stock_trend.set_index(['code', 'date'])
-
-    return stock_trend
+    positions, volumes = _get_investor_positions(trends)
+    is_investor = positions >= 0
+    date_positions, dates = pd.factorize(pd.to_datetime(trends[stock_trend_date_column].values[is_investor]),
+                                         sort=True)
+
+    # A row per (date, investor) becomes (buy, sell) pairs in a row per date.
+    values = np.zeros((len(dates), len(stock_trend_investor_names), len(stock_trend_volume_columns)),
+                      dtype=np.int64)
+    values[date_positions, positions[is_investor]] = volumes[is_investor]
+
+    return _to_stock_trends(values.reshape(len(dates), -1), [code] * len(dates), dates)
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 26.
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrapper.rate_limiter import DEFAULT_STATE_FILE_DIR, RateLimiter
+from scrapper.response_cache import DEFAULT_RESPONSE_CACHE_DIR, ResponseCache, get_max_age, get_request_key
+
+DEFAULT_MARKETDATA_URL = 'http://marketdata.krx.co.kr'
+DEFAULT_FILE_URL = 'http://file.krx.co.kr'
+GENERATE_OTP_PATH = '/contents/COM/GenerateOTP.jspx'
+DOWNLOAD_PATH = '/download.jspx'
+GENERATE_OTP_URL = DEFAULT_MARKETDATA_URL + GENERATE_OTP_PATH
+DOWNLOAD_URL = DEFAULT_FILE_URL + DOWNLOAD_PATH
+
+# The max number of requests in flight. It is also the max number of kept-alive connections per host.
+DEFAULT_CONCURRENCY = 16
+
+# Seconds to wait for a response.
+DEFAULT_TIMEOUT = 30
+
+# Seconds to wait before checking the concurrency of the rate limiter again.
+CONCURRENCY_POLL_INTERVAL = 0.05
+
+
+class KrxClient:
+    """
+    A KRX client which keeps connections alive in a pool and downloads many files at the same time.
+    Every KRX download is two requests: generate an OTP, and download the file of the OTP.
+
+    Example
+    -------
+    with KrxClient(concurrency=32, rate_limiter=RateLimiter()) as client:
+        responses = client.download_all([otp_data_of_samsung, otp_data_of_hynix])
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, rate_limiter=None,
+                 response_cache=None, replay=False, marketdata_url=DEFAULT_MARKETDATA_URL, file_url=DEFAULT_FILE_URL):
+        """
+        :param concurrency: (int, default=DEFAULT_CONCURRENCY) The max number of downloads at the same time.
+        :param timeout: (int, default=DEFAULT_TIMEOUT) Seconds to wait for a response.
+        :param rate_limiter: (RateLimiter, default=None) If it is given, every request waits for it,
+            and downloads at the same time are bounded by its concurrency too.
+        :param response_cache: (ResponseCache, default=None) If it is given, downloads are served from it,
+            and new downloads are put in it. See get_max_age() for how long each file is served.
+        :param replay: (boolean, default=False) If it is True, never access the network.
+            A download which is not in the response cache raises KeyError.
+        :param marketdata_url: (string, default=DEFAULT_MARKETDATA_URL) The host which generates OTPs.
+        :param file_url: (string, default=DEFAULT_FILE_URL) The host which serves files.
+        """
+        if replay and response_cache is None:
+            raise ValueError('A response cache is required to replay.')
+
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.response_cache = response_cache
+        self.replay = replay
+        self.marketdata_url = marketdata_url
+        self.file_url = file_url
+        # Downloads in flight. Only the event loop of download_all() changes it.
+        self.__in_flight = 0
+
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+
+        # requests blocks, so asyncio runs it in threads which share the session.
+        self.__executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def request(self, method, url, **kwargs):
+        """
+        :return response: (Response)
+        """
+        if self.rate_limiter is None:
+            response = self.__session.request(method, url, timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+            return response
+
+        self.rate_limiter.acquire()
+        start_time = time.time()
+        try:
+            response = self.__session.request(method, url, timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+        except requests.RequestException:
+            self.rate_limiter.report(time.time() - start_time, is_error=True)
+            raise
+        self.rate_limiter.report(time.time() - start_time)
+        return response
+
+    def generate_otp(self, otp_data, otp_method='post'):
+        """
+        :param otp_data: (dict) The form of the file to download.
+        :param otp_method: (string, default='post') Some pages generate an OTP by 'get'.
+
+        :return otp: (bytes)
+        """
+        generate_otp_url = self.marketdata_url + GENERATE_OTP_PATH
+        if otp_method == 'get':
+            return self.request('get', generate_otp_url, params=otp_data).content
+        return self.request('post', generate_otp_url, data=otp_data).content
+
+    def download(self, otp_data, down_url=None, down_data=None, otp_method='post', headers=None):
+        """
+        Generate an OTP and download the file of it.
+
+        :param otp_data: (dict) The form of the file to download.
+        :param down_url: (string, default=None) If it is None, download from DOWNLOAD_PATH of file_url.
+        :param down_data: (dict, default=None) Other fields to post with the OTP.
+        :param otp_method: (string, default='post')
+        :param headers: (dict, default=None)
+
+        :return response: (Response or CachedResponse)
+        """
+        if down_url is None:
+            down_url = self.file_url + DOWNLOAD_PATH
+
+        if self.response_cache is not None:
+            key = get_request_key(otp_data, down_url, down_data=down_data, otp_method=otp_method)
+            max_age = get_max_age(otp_data)
+            # Replay serves files of any age, because there is no newer one.
+            response = self.response_cache.get(key, max_age=None if self.replay else max_age)
+            if response is not None and (self.replay or max_age != 0):
+                return response
+            if self.replay:
+                raise KeyError('{} is not in the response cache. otp_data: {}'.format(key, otp_data))
+
+        otp = self.generate_otp(otp_data, otp_method=otp_method)
+
+        data = dict(down_data or {})
+        data['code'] = otp
+        response = self.request('post', down_url, data=data, headers=headers)
+
+        if self.response_cache is not None and max_age != 0:
+            self.response_cache.put(key, response)
+        return response
+
+    async def download_async(self, otp_data, semaphore, **kwargs):
+        """
+        :param semaphore: (asyncio.Semaphore) It bounds the number of downloads at the same time.
+        See download() for the other parameters.
+        """
+        async with semaphore:
+            if self.rate_limiter is not None:
+                while self.__in_flight >= self.rate_limiter.get_concurrency():
+                    await asyncio.sleep(CONCURRENCY_POLL_INTERVAL)
+
+            self.__in_flight += 1
+            try:
+                loop = asyncio.get_event_loop()
+                return await loop.run_in_executor(self.__executor, partial(self.download, otp_data, **kwargs))
+            finally:
+                self.__in_flight -= 1
+
+    def download_all(self, otp_data_list, **kwargs):
+        """
+        Download files of many OTP forms at the same time.
+
+        :param otp_data_list: (list of dict)
+        See download() for the other parameters, which are shared by all downloads.
+
+        :return responses: (list of Response) Responses in the order of otp_data_list.
+        """
+        async def gather():
+            semaphore = asyncio.Semaphore(self.concurrency)
+            return await asyncio.gather(*[self.download_async(otp_data, semaphore, **kwargs)
+                                          for otp_data in otp_data_list])
+
+        # Run a new event loop, so it works in threads and processes which have no event loop.
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(gather())
+        finally:
+            loop.close()
+
+    def close(self):
+        self.__executor.shutdown(wait=True)
+        self.__session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_krx_client():
+    """
+    Get the client which all scrappers of this process share.
+    Its rate limiter is shared with all scrappers of other processes too.
+    Script parameters --krx_cache, --krx_cache_dir and --krx_replay set its response cache,
+    --krx_marketdata_url and --krx_file_url set its hosts, and --krx_rate_limiter_file sets its rate limiter.
+
+    :return client: (KrxClient)
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            flags = _get_krx_flags()
+            response_cache = None
+            if flags.krx_cache or flags.krx_replay:
+                response_cache = ResponseCache(flags.krx_cache_dir)
+            _client = KrxClient(rate_limiter=RateLimiter(flags.krx_rate_limiter_file), response_cache=response_cache,
+                                replay=flags.krx_replay, marketdata_url=flags.krx_marketdata_url,
+                                file_url=flags.krx_file_url)
+    return _client
+
+
+def set_krx_client(client):
+    """
+    Replace the client which all scrappers of this process share.
+
+    :param client: (KrxClient) If it is None, get_krx_client() makes a new one by script parameters.
+
+    :return client: (KrxClient) The client which is replaced. It is not closed.
+    """
+    global _client
+    with _client_lock:
+        old_client = _client
+        _client = client
+    return old_client
+
+
+def _get_krx_flags():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--krx_cache',
+        action='store_true',
+        help='Keep KRX responses on disk, and serve them again.'
+    )
+    parser.add_argument(
+        '--krx_cache_dir',
+        type=str,
+        default=DEFAULT_RESPONSE_CACHE_DIR,
+        help='Directory to keep KRX responses.'
+    )
+    parser.add_argument(
+        '--krx_replay',
+        action='store_true',
+        help='Serve KRX responses only from the cache without the network.'
+    )
+    parser.add_argument(
+        '--krx_marketdata_url',
+        type=str,
+        default=DEFAULT_MARKETDATA_URL,
+        help='The host which generates OTPs. Set it to a stand-in server to benchmark.'
+    )
+    parser.add_argument(
+        '--krx_file_url',
+        type=str,
+        default=DEFAULT_FILE_URL,
+        help='The host which serves files. Set it to a stand-in server to benchmark.'
+    )
+    parser.add_argument(
+        '--krx_rate_limiter_file',
+        type=str,
+        default=DEFAULT_STATE_FILE_DIR,
+        help='The state file of the rate limiter which all scrapping processes share.'
+    )
+
+    flags, unparsed = parser.parse_known_args()
+    return flags
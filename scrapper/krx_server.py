@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 3. 1.
+"""
+import json
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+from scrapper.krx import stock_master_path, stock_trend_investors
+from scrapper.krx_client import DOWNLOAD_PATH, GENERATE_OTP_PATH
+from scrapper.response_cache import get_request_key
+
+DEFAULT_STOCK_COUNT = 2300
+
+STOCK_TREND_URL = 'MKD/10/1002/10020101/mkd10020101'
+STOCK_DAILY_PRICE_URL = 'MKD/04/0404/04040200/mkd04040200_01'
+
+# The status of throttled requests.
+ERROR_STATUS = 503
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _KrxRequestHandler(BaseHTTPRequestHandler):
+    # Keep connections alive like KRX, so connection pools of clients are used.
+    protocol_version = 'HTTP/1.1'
+    # Headers and bodies are written separately, so send them without waiting for acks of each other.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.krx_server.handle(self, url.path, dict(parse_qsl(url.query)), 'get')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.krx_server.handle(self, urlparse(self.path).path, dict(parse_qsl(body.decode('utf-8'))), 'post')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class KrxServer:
+    """
+    A local stand-in of marketdata.krx.co.kr and file.krx.co.kr, which serves both hosts at one port.
+    It issues OTPs, and serves synthetic stock masters, daily prices and investor trends of any stock and dates.
+    Payloads in a response cache are served instead of synthetic ones, so recorded responses can be replayed.
+    Latency and errors are injected to test and benchmark scrappers under load.
+
+    Example
+    -------
+    with KrxServer(latency=0.05, error_rate=0.01) as krx_server:
+        client = KrxClient(marketdata_url=krx_server.url, file_url=krx_server.url)
+        set_krx_client(client)
+        stock_daily_prices = krx.get_stock_daily_prices(datetime(2018, 1, 10))
+        print(krx_server.get_stats())
+    """
+
+    def __init__(self, stock_count=DEFAULT_STOCK_COUNT, latency=0.0, jitter=0.0, error_rate=0.0, response_cache=None,
+                 host='127.0.0.1', port=0, seed=0):
+        """
+        :param stock_count: (int, default=DEFAULT_STOCK_COUNT) The number of synthetic stocks.
+        :param latency: (float, default=0.0) Seconds to wait before each response.
+        :param jitter: (float, default=0.0) Max seconds to wait randomly in addition to latency.
+        :param error_rate: (float, default=0.0) The probability that a request fails with ERROR_STATUS.
+        :param response_cache: (ResponseCache, default=None) Recorded responses to serve.
+        :param host: (string, default='127.0.0.1')
+        :param port: (int, default=0) If it is 0, a free port is used.
+        :param seed: (int, default=0) The seed of synthetic payloads, latency and errors.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.response_cache = response_cache
+        self.seed = seed
+        self.stock_masters = _make_stock_masters(stock_count)
+
+        self.__random = np.random.RandomState(seed)
+        self.__lock = threading.Lock()
+        self.__otps = {}
+        self.reset_stats()
+
+        self.__server = _ThreadingHTTPServer((host, port), _KrxRequestHandler)
+        self.__server.krx_server = self
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.__server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def reset_stats(self):
+        with self.__lock:
+            self.__started_at = time.time()
+            self.__latencies = []
+            self.__errors = 0
+            self.__rows = 0
+
+    def get_stats(self):
+        """
+        :return stats: (dict)
+            requests        | (int) The number of requests since the last reset.
+            errors          | (int) The number of injected errors.
+            rows            | (int) The number of rows of tables which synthetic payloads become.
+            seconds         | (float) Seconds since the last reset.
+            request_rate    | (float) Requests per second.
+            row_rate        | (float) Rows per second.
+            p50_latency     | (float) The median of seconds which requests took in the server.
+            p99_latency     | (float) The 99th percentile of seconds which requests took in the server.
+        """
+        with self.__lock:
+            seconds = max(time.time() - self.__started_at, 1e-6)
+            latencies = np.array(self.__latencies)
+            errors = self.__errors
+            rows = self.__rows
+
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'rows': rows,
+            'seconds': seconds,
+            'request_rate': len(latencies) / seconds,
+            'row_rate': rows / seconds,
+            'p50_latency': float(np.percentile(latencies, 50)) if len(latencies) > 0 else 0.0,
+            'p99_latency': float(np.percentile(latencies, 99)) if len(latencies) > 0 else 0.0,
+        }
+
+    def handle(self, handler, path, form, method):
+        start_time = time.time()
+        with self.__lock:
+            wait = self.latency + self.jitter * self.__random.random_sample()
+            is_error = self.__random.random_sample() < self.error_rate
+        time.sleep(wait)
+
+        rows = 0
+        if is_error:
+            status, content = ERROR_STATUS, b''
+        elif path == GENERATE_OTP_PATH:
+            status, content = 200, self.__generate_otp(form, method)
+        elif path == DOWNLOAD_PATH or path == stock_master_path:
+            status, content, rows = self.__download(path, form)
+        else:
+            status, content = 404, b''
+
+        # Count the request before the response, so a client which has the response always sees it in stats.
+        with self.__lock:
+            self.__latencies.append(time.time() - start_time)
+            self.__errors += int(is_error)
+            self.__rows += rows
+
+        handler.send_response(status)
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def __generate_otp(self, form, method):
+        otp = uuid.uuid4().hex
+        with self.__lock:
+            self.__otps[otp] = (form, method)
+        return otp.encode('ascii')
+
+    def __download(self, path, down_data):
+        """
+        :return status: (int)
+        :return content: (bytes)
+        :return rows: (int)
+        """
+        with self.__lock:
+            form, method = self.__otps.pop(down_data.get('code'), (None, None))
+        if form is None:
+            return 400, b'', 0
+
+        if self.response_cache is not None:
+            response = self.response_cache.get(get_request_key(form, path, down_data=down_data, otp_method=method))
+            if response is not None:
+                return 200, response.content, 0
+
+        if path == stock_master_path:
+            return (200,) + _make_stock_master_json(self.stock_masters, down_data)
+
+        # Seed by the form, so the same request gets the same payload.
+        random = np.random.RandomState(zlib.crc32(json.dumps(form, sort_keys=True).encode('utf-8')) ^ self.seed)
+        if form.get('url') == STOCK_TREND_URL:
+            return (200,) + _make_stock_trend_csv(form, random)
+        if form.get('url') == STOCK_DAILY_PRICE_URL:
+            return (200,) + _make_stock_daily_price_xlsx(self.stock_masters, form, random)
+        return 404, b'', 0
+
+
+def _make_stock_masters(stock_count):
+    short_codes = ['{:06d}'.format(number * 10) for number in range(1, stock_count + 1)]
+    return pd.DataFrame({
+        'code': ['KR7{}003'.format(short_code) for short_code in short_codes],
+        'short_code': ['A' + short_code for short_code in short_codes],
+        'company_name': ['종목{}'.format(short_code) for short_code in short_codes],
+        'market_name': ['KOSPI'] * stock_count,
+    })
+
+
+def _get_business_days(form, from_field, to_field):
+    return pd.bdate_range(pd.Timestamp(form[from_field]), pd.Timestamp(form[to_field]))
+
+
+def _make_stock_master_json(stock_masters, down_data):
+    # Listed stocks are in block1, and a delisted stock is in result.
+    if down_data.get('pagePath') == '/contents/COM/FinderDelListIsu.jsp':
+        result = [{'isu_cd': 'KR7999990003', 'shrt_isu_cd': 'A999990', 'isu_nm': '상장폐지종목', 'market_name': 'KOSPI'}]
+        return json.dumps({'result': result}, ensure_ascii=False).encode('utf-8'), len(result)
+
+    block1 = [{'full_code': code, 'short_code': short_code, 'codeName': company_name, 'marketName': market_name}
+              for code, short_code, company_name, market_name in stock_masters.values]
+    return json.dumps({'block1': block1}, ensure_ascii=False).encode('utf-8'), len(block1)
+
+
+def _make_stock_trend_csv(form, random):
+    dates = _get_business_days(form, 'fromdate', 'todate')
+    is_range = form['fromdate'] != form['todate']
+    investors = list(stock_trend_investors) + ['기관합계']
+
+    header = ['투자자명', '거래량_매도', '거래량_매수', '거래량_순매수']
+    lines = [','.join((['일자'] if is_range else []) + header)]
+    volumes = random.randint(0, 10 ** 7, size=(len(dates), len(investors), 2))
+    for date, date_volumes in zip(dates, volumes):
+        for investor, (sell, buy) in zip(investors, date_volumes):
+            fields = [investor, '"{:,}"'.format(sell), '"{:,}"'.format(buy), '"{:,}"'.format(buy - sell)]
+            lines.append(','.join(([date.strftime('%Y/%m/%d')] if is_range else []) + fields))
+
+    # The last row has sum. A file without dates has only the header.
+    if len(dates) > 0:
+        sell, buy = volumes.sum(axis=(0, 1))
+        lines.append(','.join(([''] if is_range else []) + ['전체', str(sell), str(buy), str(buy - sell)]))
+
+    return '\n'.join(lines).encode('utf-8'), len(dates)
+
+
+def _make_stock_daily_price_xlsx(stock_masters, form, random):
+    if len(_get_business_days(form, 'schdate', 'schdate')) == 0:
+        stock_masters = stock_masters.iloc[:0]
+
+    stock_count = len(stock_masters)
+    closes = random.randint(1000, 1000000, size=stock_count)
+    opens = closes + random.randint(-500, 500, size=stock_count)
+    volumes = random.randint(0, 10 ** 7, size=stock_count)
+    listed_stocks_numbers = random.randint(10 ** 6, 10 ** 9, size=stock_count)
+    stock_daily_prices = pd.DataFrame({
+        '종목코드': stock_masters['short_code'].str[1:].values,
+        '종목명': stock_masters['company_name'].values,
+        '현재가': closes,
+        '시가': opens,
+        '고가': np.maximum(opens, closes) + random.randint(0, 500, size=stock_count),
+        '저가': np.minimum(opens, closes) - random.randint(0, 500, size=stock_count),
+        '거래량': volumes,
+        '시가총액': closes * listed_stocks_numbers,
+        '상장주식수': listed_stocks_numbers,
+    })
+
+    content = BytesIO()
+    with pd.ExcelWriter(content, engine='openpyxl') as writer:
+        stock_daily_prices.to_excel(writer, index=False)
+    return content.getvalue(), stock_count
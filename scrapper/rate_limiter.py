@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 27.
+"""
+import math
+import threading
+import time
+
+from table.base import DATA_DIR
+from table.file_lock import FileLock
+from table.metadata import read_metadata, write_metadata
+
+# The state is kept with other data of the working directory, like cached responses, not in the source package.
+DEFAULT_STATE_FILE_DIR = DATA_DIR + 'krx_rate_limiter.json'
+
+# Requests per second at the first start.
+DEFAULT_RATE = 10.0
+DEFAULT_MIN_RATE = 1.0
+DEFAULT_MAX_RATE = 200.0
+
+# Requests per second added for each second without errors.
+DEFAULT_INCREASE = 1.0
+
+# The rate is multiplied by it on errors or slow responses.
+DEFAULT_DECREASE_FACTOR = 0.5
+
+# Seconds. Responses slower than it on average mean the server is overloaded.
+DEFAULT_TARGET_LATENCY = 2.0
+
+DEFAULT_MAX_CONCURRENCY = 64
+
+# The weight of the newest response in moving averages of latency and errors.
+SMOOTHING = 0.1
+
+# Seconds between decreases, so a burst of errors from one overload decreases the rate only once.
+DECREASE_INTERVAL = 1.0
+
+# Seconds over which the request rate is measured.
+RATE_WINDOW = 5.0
+
+# The max seconds to sleep before checking tokens again.
+MAX_WAIT = 1.0
+
+# Seconds without any request after which the state is dropped, so a rate decreased by old errors is not kept.
+STALE_STATE_SECONDS = 10 * 60
+
+
+class RateLimiter:
+    """
+    A token bucket whose rate is controlled by AIMD, additive increase and multiplicative decrease.
+    The state is kept in a file under a FileLock, so all scrapping processes share one rate.
+
+    The rate increases by `increase` every second while responses succeed in time,
+    and is halved when a request fails or the average latency exceeds the target latency.
+    The concurrency follows the rate by Little's law, which is the rate times the average latency.
+    Reports are kept in memory and written with the next acquire, so a request reads and writes the file once.
+    A state which no process has used for STALE_STATE_SECONDS starts again from initial_rate.
+
+    Example
+    -------
+    rate_limiter = RateLimiter()
+    rate_limiter.acquire()
+    start_time = time.time()
+    response = requests.get(url)
+    rate_limiter.report(time.time() - start_time, is_error=not response.ok)
+    print(rate_limiter.get_stats()['request_rate'])
+    """
+
+    def __init__(self, state_file_dir=DEFAULT_STATE_FILE_DIR, initial_rate=DEFAULT_RATE, min_rate=DEFAULT_MIN_RATE,
+                 max_rate=DEFAULT_MAX_RATE, increase=DEFAULT_INCREASE, decrease_factor=DEFAULT_DECREASE_FACTOR,
+                 target_latency=DEFAULT_TARGET_LATENCY, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        :param state_file_dir: (string, default=DEFAULT_STATE_FILE_DIR) The file shared by processes.
+        :param initial_rate: (float, default=DEFAULT_RATE) Requests per second if there is no state file yet,
+            or the state is stale.
+        :param min_rate: (float, default=DEFAULT_MIN_RATE)
+        :param max_rate: (float, default=DEFAULT_MAX_RATE)
+        :param increase: (float, default=DEFAULT_INCREASE) Requests per second added for each second without errors.
+        :param decrease_factor: (float, default=DEFAULT_DECREASE_FACTOR)
+        :param target_latency: (float, default=DEFAULT_TARGET_LATENCY) Seconds.
+        :param max_concurrency: (int, default=DEFAULT_MAX_CONCURRENCY)
+        """
+        self.state_file_dir = state_file_dir
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.target_latency = target_latency
+        self.max_concurrency = max_concurrency
+
+        self.__lock = FileLock(state_file_dir + '.lock')
+        # The last state this process has seen. get_concurrency() reads it without the file.
+        self.__state = None
+        # (reported_at, latency, is_error) of responses which are not written yet.
+        self.__reports = []
+        self.__reports_lock = threading.Lock()
+
+    def __read_state(self, now):
+        state = read_metadata(self.state_file_dir)
+        if state is None or now - state['updated_at'] > STALE_STATE_SECONDS:
+            state = {
+                'rate': self.initial_rate,
+                'tokens': 1.0,
+                'updated_at': now,
+                'latency': 0.0,
+                'error_rate': 0.0,
+                'decreased_at': 0.0,
+                'request_count': 0,
+                'window_started_at': now,
+                # None until the first window ends.
+                'request_rate': None,
+            }
+
+        # Refill tokens. The bucket holds tokens of a second at most.
+        elapsed = max(now - state['updated_at'], 0.0)
+        state['tokens'] = min(state['tokens'] + elapsed * state['rate'], max(state['rate'], 1.0))
+        state['updated_at'] = now
+
+        # Measure the request rate of the last window.
+        window = now - state['window_started_at']
+        if window >= RATE_WINDOW:
+            state['request_rate'] = state['request_count'] / window
+            state['request_count'] = 0
+            state['window_started_at'] = now
+
+        self.__apply_reports(state)
+        return state
+
+    def __apply_reports(self, state):
+        with self.__reports_lock:
+            reports, self.__reports = self.__reports, []
+
+        for reported_at, latency, is_error in reports:
+            state['latency'] += SMOOTHING * (latency - state['latency'])
+            state['error_rate'] += SMOOTHING * (float(is_error) - state['error_rate'])
+
+            if is_error or state['latency'] > self.target_latency:
+                if reported_at - state['decreased_at'] >= DECREASE_INTERVAL:
+                    state['rate'] = max(state['rate'] * self.decrease_factor, self.min_rate)
+                    state['tokens'] = min(state['tokens'], 0.0)
+                    state['decreased_at'] = reported_at
+            else:
+                # Each of rate responses in a second adds increase / rate, so the rate grows by increase a second.
+                state['rate'] = min(state['rate'] + self.increase / state['rate'], self.max_rate)
+
+    def __write_state(self, state):
+        write_metadata(self.state_file_dir, state)
+        self.__state = state
+
+    def acquire(self):
+        """
+        Wait until all processes together send fewer requests than the rate.
+        """
+        while True:
+            with self.__lock:
+                state = self.__read_state(time.time())
+                if state['tokens'] >= 1.0:
+                    state['tokens'] -= 1.0
+                    state['request_count'] += 1
+                    self.__write_state(state)
+                    return
+
+                self.__write_state(state)
+                wait = (1.0 - state['tokens']) / state['rate']
+
+            time.sleep(min(wait, MAX_WAIT))
+
+    def report(self, latency, is_error=False):
+        """
+        Control the rate by a response. It is written to the file with the next acquire() or get_stats().
+
+        :param latency: (float) Seconds from the request to the response.
+        :param is_error: (boolean, default=False) True if the request failed or was throttled.
+        """
+        with self.__reports_lock:
+            self.__reports.append((time.time(), latency, is_error))
+
+    def get_concurrency(self):
+        """
+        :return concurrency: (int) The number of requests which this process may keep in flight.
+            It is calculated from the last state which this process has seen, so it needs no file access.
+        """
+        if self.__state is None or self.__state['latency'] == 0.0:
+            return self.max_concurrency
+
+        return max(1, min(int(math.ceil(self.__state['rate'] * self.__state['latency'])) + 1, self.max_concurrency))
+
+    def get_stats(self):
+        """
+        :return stats: (dict)
+            rate            | (float) Requests per second which all processes may send.
+            request_rate    | (float) Requests per second which all processes sent in the last window.
+            latency         | (float) The moving average of latency in seconds.
+            error_rate      | (float) The moving average of the ratio of errors.
+            concurrency     | (int) See get_concurrency().
+        """
+        with self.__lock:
+            now = time.time()
+            state = self.__read_state(now)
+            self.__write_state(state)
+
+        request_rate = state['request_rate']
+        if request_rate is None:
+            request_rate = state['request_count'] / max(now - state['window_started_at'], 1.0)
+
+        return {
+            'rate': state['rate'],
+            'request_rate': request_rate,
+            'latency': state['latency'],
+            'error_rate': state['error_rate'],
+            'concurrency': self.get_concurrency(),
+        }
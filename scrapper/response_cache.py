@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 28.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+from table.atomic_file import atomic_write
+from table.base import DATA_DIR
+
+DEFAULT_RESPONSE_CACHE_DIR = DATA_DIR + 'krx_responses/'
+
+# Form fields which change on every request without changing the response.
+VOLATILE_FIELDS = {'_', 'code'}
+
+# Form fields of the last date of a file.
+DATE_FIELDS = ['todate', 'schdate']
+
+# Seconds to serve a file of no date, like stock masters, which changes every day.
+UNDATED_MAX_AGE = 24 * 60 * 60
+
+
+def get_max_age(otp_data, today=None):
+    """
+    :param otp_data: (dict) The form of the file to download.
+    :param today: (datetime, default=None) If it is None, use datetime.today().
+
+    :return max_age: (float) Seconds to serve the cached file of the form. None if the file never changes.
+        0 if the file is not to be cached, because its last date is today or later and it can still change.
+    """
+    dates = [otp_data[field] for field in DATE_FIELDS if field in otp_data]
+    if len(dates) == 0:
+        return UNDATED_MAX_AGE
+
+    today = (today or datetime.today()).strftime('%Y%m%d')
+    return None if max(dates) < today else 0
+
+
+def get_request_key(otp_data, down_url, down_data=None, otp_method='post'):
+    """
+    :param otp_data: (dict) The form of the file to download.
+    :param down_url: (string)
+    :param down_data: (dict, default=None)
+    :param otp_method: (string, default='post')
+
+    :return key: (string) The sha1 hex digest of the normalized request.
+        The OTP, which is issued again on every download, and the host of down_url are not parts of it,
+        so responses of a stand-in server and of KRX share keys.
+    """
+    request = {
+        'otp_method': otp_method,
+        'otp_data': {key: value for key, value in otp_data.items() if key not in VOLATILE_FIELDS},
+        'down_path': urlparse(down_url).path,
+        'down_data': {key: value for key, value in (down_data or {}).items() if key not in VOLATILE_FIELDS},
+    }
+    return hashlib.sha1(json.dumps(request, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CachedResponse:
+    """
+    A response read from a ResponseCache. It has content and text like a requests.Response.
+    """
+
+    def __init__(self, content, encoding=None):
+        self.content = content
+        self.encoding = encoding
+        self.status_code = 200
+        self.ok = True
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class ResponseCache:
+    """
+    Raw KRX responses kept as gzip files whose names are the keys of their requests.
+    A file is written once and never changed, so processes can share a cache without locks.
+
+    Example
+    -------
+    response_cache = ResponseCache()
+    key = get_request_key(otp_data, DOWNLOAD_URL)
+    response = response_cache.get(key)
+    if response is None:
+        response_cache.put(key, download(otp_data))
+    """
+
+    def __init__(self, cache_dir=DEFAULT_RESPONSE_CACHE_DIR):
+        """
+        :param cache_dir: (string, default=DEFAULT_RESPONSE_CACHE_DIR)
+        """
+        self.cache_dir = cache_dir
+
+    def __get_file_dir(self, key):
+        # Split files into directories by the first 2 letters, so no directory has too many files.
+        return '{}{}/{}.gz'.format(self.cache_dir, key[:2], key)
+
+    def __contains__(self, key):
+        return os.path.exists(self.__get_file_dir(key))
+
+    def get(self, key, max_age=None):
+        """
+        :param key: (string) A key which get_request_key() made.
+        :param max_age: (float, default=None) Seconds to serve a file after it is put. If None, serve it forever.
+
+        :return response: (CachedResponse) None if the key is not in the cache or the file is older than max_age.
+        """
+        file_dir = self.__get_file_dir(key)
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(file_dir) > max_age:
+                return None
+            with gzip.open(file_dir, 'rb') as f:
+                encoding, content = f.read().split(b'\n', 1)
+        except FileNotFoundError:
+            return None
+
+        return CachedResponse(content, encoding.decode('ascii') or None)
+
+    def put(self, key, response):
+        """
+        :param key: (string) A key which get_request_key() made.
+        :param response: (Response) A successful response. An empty one, which KRX also gives to throttled
+            requests, is not put.
+        """
+        if len(response.content) == 0:
+            return
+
+        # Keep the encoding which requests guesses, so the text of the cached response is the same.
+        encoding = response.encoding or getattr(response, 'apparent_encoding', None) or ''
+
+        file_dir = self.__get_file_dir(key)
+        os.makedirs(os.path.dirname(file_dir), exist_ok=True)
+
+        with atomic_write(file_dir) as temp_file_dir:
+            with gzip.open(temp_file_dir, 'wb') as f:
+                f.write(encoding.encode('ascii') + b'\n' + response.content)
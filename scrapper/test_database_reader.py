@@ -31,7 +31,7 @@ class TestStockDailyPrices(TestCase):
         self.assertEqual(5598, len(stock_daily_prices))
         testing.assert_array_equal(['code', 'date'], stock_daily_prices.index.names)
         testing.assert_array_equal(
-            ['volume', 'open', 'high', 'low', 'close', 'market_capitalization', 'listed_stocks_number', 'adj_close'],
+            ['volume', 'open', 'high', 'low', 'close', 'market_capitalization', 'listed_stocks_number'],
             stock_daily_prices.columns.values)
 
 
@@ -62,3 +62,18 @@ class TestGetStockTrend(TestCase):
              'other_foreigner_sell', 'pension_fund_buy', 'pension_fund_sell',
              'private_equity_fund_buy', 'private_equity_fund_sell'],
             stock_trend.columns.values)
+
+
+class TestGetStockTrendRange(TestCase):
+    def test_get_stock_trend_range(self):
+        stock_trends = get_stock_trend_range('KR7005930003', 'A005930', '삼성전자',
+                                             datetime(2017, 12, 1), datetime(2018, 1, 10), window_days=30)
+        self.assertIsNotNone(stock_trends)
+        self.assertEqual(26, len(stock_trends))
+        self.assertFalse(np.any(stock_trends.index.duplicated()))
+        testing.assert_array_equal(['code', 'date'], stock_trends.index.names)
+        self.assertEqual(datetime(2018, 1, 10), stock_trends.index.get_level_values('date').max())
+
+        stock_trend = get_stock_trend(datetime(2018, 1, 10), 'KR7005930003', 'A005930', '삼성전자')
+        testing.assert_array_equal(stock_trend.columns.values, stock_trends.columns.values)
+        testing.assert_array_equal(stock_trend.values[0], stock_trends.values[-1])
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 3. 1.
+"""
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import requests
+from numpy import testing
+
+from scrapper import krx
+from scrapper.krx_client import DOWNLOAD_URL, KrxClient, get_krx_client, set_krx_client
+from scrapper.krx_server import KrxServer
+from scrapper.response_cache import CachedResponse, ResponseCache, get_request_key
+
+
+class TestKrxServer(TestCase):
+    def setUp(self):
+        self.krx_server = KrxServer(stock_count=20).start()
+        self.client = KrxClient(marketdata_url=self.krx_server.url, file_url=self.krx_server.url)
+        self.old_client = set_krx_client(self.client)
+
+    def tearDown(self):
+        set_krx_client(self.old_client)
+        self.client.close()
+        self.krx_server.stop()
+
+    def test_get_stock_trend(self):
+        stock_trend = krx.get_stock_trend(datetime(2018, 1, 10), 'KR7005930003', 'A005930', '삼성전자')
+        self.assertEqual(1, len(stock_trend))
+        testing.assert_array_equal(krx.stock_trend_result_columns, stock_trend.columns.values)
+
+        # A holiday has no trend.
+        self.assertEqual(0, len(krx.get_stock_trend(datetime(2018, 1, 13), 'KR7005930003', 'A005930', '삼성전자')))
+
+    def test_get_stock_trend_range(self):
+        stock_trends = krx.get_stock_trend_range('KR7005930003', 'A005930', '삼성전자',
+                                                 datetime(2017, 12, 1), datetime(2018, 1, 10), window_days=30)
+        self.assertEqual(29, len(stock_trends))
+        testing.assert_array_equal(['code', 'date'], stock_trends.index.names)
+
+    def test_get_stock_trend_range_with_a_day_window(self):
+        # The last window is 2017-01-12 only, whose file has no date column.
+        stock_trends = krx.get_stock_trend_range('KR7005930003', 'A005930', '삼성전자',
+                                                 datetime(2017, 1, 2), datetime(2017, 1, 12), window_days=5)
+        self.assertEqual(9, len(stock_trends))
+        self.assertFalse(stock_trends.index.duplicated().any())
+        self.assertEqual(datetime(2017, 1, 12), stock_trends.index.get_level_values('date')[-1])
+
+    def test_get_stock_trends_of_codes(self):
+        stock_masters = self.krx_server.stock_masters
+        stock_trends = krx.get_stock_trends_of_codes(datetime(2018, 1, 10), stock_masters['code'],
+                                                     stock_masters['short_code'], stock_masters['company_name'])
+        testing.assert_array_equal(stock_masters['code'], stock_trends.index.get_level_values('code'))
+
+        stats = self.krx_server.get_stats()
+        self.assertEqual(40, stats['requests'])
+        self.assertEqual(20, stats['rows'])
+
+    def test_get_stock_trends_of_unknown_codes(self):
+        stock_masters = self.krx_server.stock_masters
+        short_codes = stock_masters['short_code'].where(stock_masters.index != 0)
+        with self.assertWarns(UserWarning):
+            stock_trends = krx.get_stock_trends_of_codes(datetime(2018, 1, 10), stock_masters['code'], short_codes,
+                                                         stock_masters['company_name'])
+        testing.assert_array_equal(stock_masters['code'][1:], stock_trends.index.get_level_values('code'))
+
+    def test_get_stock_daily_prices(self):
+        stock_daily_prices = krx.get_stock_daily_prices(datetime(2018, 1, 10))
+        self.assertEqual(20, len(stock_daily_prices))
+        testing.assert_array_equal(['날짜', '종목코드'], stock_daily_prices.index.names)
+
+    def test_get_stock_masters(self):
+        stock_masters = krx.get_stock_masters()
+        self.assertEqual(21, len(stock_masters))
+        testing.assert_array_equal(['code'], stock_masters.index.names)
+
+    def test_error(self):
+        self.krx_server.error_rate = 1.0
+        with self.assertRaises(requests.HTTPError):
+            krx.get_stock_trend(datetime(2018, 1, 10), 'KR7005930003', 'A005930', '삼성전자')
+        self.assertEqual(1, self.krx_server.get_stats()['errors'])
+
+    def test_recorded_response(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            response_cache = ResponseCache(temp_dir + '/')
+            otp_data = krx._get_stock_trend_otp_data('KR7005930003', 'A005930', '삼성전자',
+                                                     datetime(2018, 1, 10), datetime(2018, 1, 10))
+            response_cache.put(get_request_key(otp_data, DOWNLOAD_URL, otp_method='get'),
+                               CachedResponse(b'recorded'))
+
+            self.krx_server.response_cache = response_cache
+            self.assertEqual(b'recorded', get_krx_client().download(otp_data, otp_method='get').content)
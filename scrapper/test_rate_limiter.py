@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 27.
+"""
+import tempfile
+import time
+from multiprocessing import Pool
+from unittest import TestCase
+
+from scrapper.rate_limiter import STALE_STATE_SECONDS, RateLimiter
+from table.metadata import read_metadata, write_metadata
+
+
+def acquire(state_file_dir):
+    rate_limiter = RateLimiter(state_file_dir, initial_rate=40.0)
+    for _ in range(10):
+        rate_limiter.acquire()
+
+
+class TestRateLimiter(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_file_dir = self.temp_dir.name + '/rate_limiter.json'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_acquire(self):
+        rate_limiter = RateLimiter(self.state_file_dir, initial_rate=50.0)
+        start_time = time.time()
+        for _ in range(26):
+            rate_limiter.acquire()
+        # The first token is given at once, and the others are refilled at 50 a second.
+        self.assertGreaterEqual(time.time() - start_time, 0.45)
+        self.assertGreater(rate_limiter.get_stats()['request_rate'], 0.0)
+
+    def test_processes_share_rate(self):
+        start_time = time.time()
+        with Pool(4) as pool:
+            pool.map(acquire, [self.state_file_dir] * 4)
+        self.assertGreaterEqual(time.time() - start_time, 0.9)
+
+    def test_increase_and_decrease(self):
+        rate_limiter = RateLimiter(self.state_file_dir, initial_rate=10.0, target_latency=1.0)
+        for _ in range(10):
+            rate_limiter.report(0.1)
+        self.assertAlmostEqual(11.0, rate_limiter.get_stats()['rate'], delta=0.1)
+
+        # A burst of errors decreases the rate only once.
+        rate_limiter.report(0.1, is_error=True)
+        rate_limiter.report(0.1, is_error=True)
+        stats = rate_limiter.get_stats()
+        self.assertAlmostEqual(5.5, stats['rate'], delta=0.1)
+        self.assertGreater(stats['error_rate'], 0.0)
+
+        # Slow responses decrease the rate too.
+        rate_limiter = RateLimiter(self.temp_dir.name + '/slow.json', initial_rate=10.0, target_latency=1.0)
+        rate_limiter.report(20.0)
+        self.assertEqual(5.0, rate_limiter.get_stats()['rate'])
+
+    def test_concurrency(self):
+        rate_limiter = RateLimiter(self.state_file_dir, initial_rate=10.0, max_concurrency=8)
+        self.assertEqual(8, rate_limiter.get_concurrency())
+
+        rate_limiter.report(0.01)
+        rate_limiter.acquire()
+        self.assertEqual(2, rate_limiter.get_concurrency())
+
+    def test_reports_are_written_with_acquire(self):
+        rate_limiter = RateLimiter(self.state_file_dir, initial_rate=10.0, target_latency=1.0)
+        rate_limiter.acquire()
+        rate_limiter.report(0.1, is_error=True)
+        self.assertEqual(10.0, read_metadata(self.state_file_dir)['rate'])
+
+        rate_limiter.acquire()
+        self.assertEqual(5.0, read_metadata(self.state_file_dir)['rate'])
+
+    def test_stale_state(self):
+        rate_limiter = RateLimiter(self.state_file_dir, initial_rate=10.0)
+        rate_limiter.report(0.1, is_error=True)
+        self.assertEqual(5.0, rate_limiter.get_stats()['rate'])
+
+        # The rate which old errors decreased is dropped.
+        state = read_metadata(self.state_file_dir)
+        state['updated_at'] -= STALE_STATE_SECONDS + 1
+        write_metadata(self.state_file_dir, state)
+        self.assertEqual(10.0, rate_limiter.get_stats()['rate'])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 28.
+"""
+import os
+import tempfile
+import time
+from datetime import datetime
+from unittest import TestCase
+
+from scrapper.krx_client import DOWNLOAD_URL, KrxClient
+from scrapper.response_cache import UNDATED_MAX_AGE, CachedResponse, ResponseCache, get_max_age, get_request_key
+
+otp_data = {
+    'name': 'fileDown',
+    'filetype': 'csv',
+    'isu_cd': 'KR7005930003',
+    'fromdate': '20180110',
+    'todate': '20180110',
+}
+
+
+class TestResponseCache(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.response_cache = ResponseCache(self.temp_dir.name + '/')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_request_key(self):
+        key = get_request_key(otp_data, DOWNLOAD_URL)
+        self.assertEqual(key, get_request_key(dict(reversed(list(otp_data.items()))), DOWNLOAD_URL))
+        self.assertEqual(key, get_request_key(dict(otp_data, _='1515578494324'), DOWNLOAD_URL))
+        self.assertNotEqual(key, get_request_key(dict(otp_data, todate='20180111'), DOWNLOAD_URL))
+        self.assertNotEqual(key, get_request_key(otp_data, DOWNLOAD_URL, otp_method='get'))
+
+    def test_put_and_get(self):
+        key = get_request_key(otp_data, DOWNLOAD_URL)
+        self.assertIsNone(self.response_cache.get(key))
+        self.assertNotIn(key, self.response_cache)
+
+        self.response_cache.put(key, CachedResponse('투자자명,거래량_매도\n개인,1\n'.encode('euc-kr'), 'euc-kr'))
+        self.assertIn(key, self.response_cache)
+        self.assertEqual('투자자명,거래량_매도\n개인,1\n', self.response_cache.get(key).text)
+
+    def test_get_max_age(self):
+        today = datetime(2018, 1, 11)
+        self.assertIsNone(get_max_age(otp_data, today=today))
+        self.assertEqual(0, get_max_age(dict(otp_data, todate='20180111'), today=today))
+        self.assertEqual(0, get_max_age({'schdate': '20180111'}, today=today))
+        self.assertEqual(UNDATED_MAX_AGE, get_max_age({'bld': 'COM/finder_stkisu'}, today=today))
+
+    def test_empty_and_old_responses(self):
+        key = get_request_key(otp_data, DOWNLOAD_URL)
+        self.response_cache.put(key, CachedResponse(b''))
+        self.assertNotIn(key, self.response_cache)
+
+        self.response_cache.put(key, CachedResponse(b'content'))
+        self.assertIsNotNone(self.response_cache.get(key, max_age=60))
+
+        file_dir = '{}/{}/{}.gz'.format(self.temp_dir.name, key[:2], key)
+        os.utime(file_dir, (time.time() - 120, time.time() - 120))
+        self.assertIsNone(self.response_cache.get(key, max_age=60))
+        self.assertIsNotNone(self.response_cache.get(key))
+
+    def test_replay(self):
+        with KrxClient(response_cache=self.response_cache, replay=True) as client:
+            with self.assertRaises(KeyError):
+                client.download(otp_data)
+
+            self.response_cache.put(get_request_key(otp_data, DOWNLOAD_URL), CachedResponse(b'content'))
+            self.assertEqual(b'content', client.download(otp_data).content)
+            self.assertEqual([b'content'] * 3, [response.content for response in client.download_all([otp_data] * 3)])
+
+        with self.assertRaises(ValueError):
+            KrxClient(replay=True)
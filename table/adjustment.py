@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 17.
+"""
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+ADJUSTMENT_FACTOR = 'adj_factor'
+LISTED_STOCKS_NUMBER = 'listed_stocks_number'
+EVENT_FACTOR = 'event_factor'
+
+# The smallest ratio of listed stocks before and after an event. Smaller changes are issues or buybacks.
+MIN_EVENT_RATIO = 1.05
+
+# The version of adjust_prices(). A cache which is adjusted by another version is rebuilt.
+ADJUSTMENT_VERSION = 3
+
+
+def get_factor_column(column):
+    """
+    :param column: (string) A price column.
+
+    :return factor_column: (string) The column of factors of the price column.
+        Bars can have one for each price column, because their prices can come from rows of different factors.
+    """
+    return '{}_{}'.format(column, ADJUSTMENT_FACTOR)
+
+
+def is_factor_column(column):
+    return column == ADJUSTMENT_FACTOR or column in [get_factor_column(price_column) for price_column in PRICE_COLUMNS]
+
+
+def get_factors(table, column):
+    """
+    :return factors: (Series) The factors of the price column, or adj_factor if the column has no factors of its own.
+        None if the table has no adjustment factors.
+    """
+    for factor_column in [get_factor_column(column), ADJUSTMENT_FACTOR]:
+        if factor_column in table.columns:
+            return table[factor_column]
+    return None
+
+
+def is_adjustment_column(column):
+    """
+    :return is_adjustment_column: (boolean) True if the column is kept only to adjust prices,
+        so it is not selected like price columns.
+    """
+    return is_factor_column(column) or column in [LISTED_STOCKS_NUMBER, EVENT_FACTOR]
+
+
+def has_market_capitalization(table):
+    return 'market_capitalization' in table.columns and LISTED_STOCKS_NUMBER in table.columns
+
+
+def get_last_rows(table, last_rows=None):
+    """
+    :param table: (DataFrame) A table sorted by (code, date).
+    :param last_rows: (DataFrame, default=None) The last rows of codes before the table.
+
+    :return last_rows: (DataFrame) The last row of each code in last_rows and the table.
+    """
+    rows = table.loc[~table.index.get_level_values('code').duplicated(keep='last')]
+    if last_rows is None or len(last_rows) == 0:
+        return rows
+
+    rows = pd.concat([last_rows[rows.columns.intersection(last_rows.columns)], rows])
+    return rows.loc[~rows.index.get_level_values('code').duplicated(keep='last')]
+
+
+def find_events(table, last_rows=None):
+    """
+    If the table has market_capitalization and listed_stocks_number, find corporate actions which change prices
+    by the ratio of listed stocks, like splits, reverse splits and bonus issues. A change of listed_stocks_number
+    is such an event only if it is at least MIN_EVENT_RATIO and the previous close over the close is nearer to
+    the ratio than to 1. Rights issues, conversions and buybacks change listed stocks without changing prices
+    by the ratio, so they are not events.
+
+    :param table: (DataFrame) A table of raw prices whose index is (code, date).
+    :param last_rows: (DataFrame, default=None) The last row of each code before the table, adjusted or not.
+        Events between them and the first rows of codes in the table are found too.
+
+    :return table: (DataFrame) The table sorted by its index without market_capitalization.
+        columns     listed_stocks_number    | (int)
+                    event_factor            | (float) The previous listed_stocks_number over listed_stocks_number
+                                                if the row has an event, otherwise 1.
+    """
+    if not has_market_capitalization(table):
+        return table
+
+    if not table.index.is_monotonic_increasing:
+        table = table.sort_index()
+
+    codes = table.index.get_level_values('code')
+    listed_stocks_numbers = table[LISTED_STOCKS_NUMBER].values.astype(np.float64)
+    closes = table['close'].values.astype(np.float64)
+
+    previous_listed_stocks_numbers = np.roll(listed_stocks_numbers, 1)
+    previous_closes = np.roll(closes, 1)
+    is_first = np.ones(len(table), dtype=bool)
+    is_first[1:] = codes[1:] != codes[:-1]
+    previous_listed_stocks_numbers[is_first] = np.nan
+    previous_closes[is_first] = np.nan
+
+    # The first row of a code follows the last row of the code before the table.
+    if last_rows is not None and len(last_rows) > 0:
+        last_closes = last_rows['close'].astype(np.float64)
+        if ADJUSTMENT_FACTOR in last_rows.columns:
+            last_closes = last_closes / last_rows[ADJUSTMENT_FACTOR]
+        last_codes = last_rows.index.get_level_values('code')
+        first_codes = codes[is_first]
+        previous_listed_stocks_numbers[is_first] = pd.Series(
+            last_rows[LISTED_STOCKS_NUMBER].values.astype(np.float64), index=last_codes).reindex(first_codes).values
+        previous_closes[is_first] = pd.Series(last_closes.values, index=last_codes).reindex(first_codes).values
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.log(listed_stocks_numbers / previous_listed_stocks_numbers)
+        price_ratios = np.log(previous_closes / closes)
+        is_event = (np.abs(ratios) >= np.log(MIN_EVENT_RATIO)) & (np.abs(price_ratios - ratios) < np.abs(price_ratios))
+
+    table = table.drop('market_capitalization', axis=1)
+    table[EVENT_FACTOR] = np.where(is_event, previous_listed_stocks_numbers / listed_stocks_numbers, 1.0)
+    return table
+
+
+def get_event_products(table):
+    """
+    :param table: (DataFrame) A table which find_events() made.
+
+    :return event_products: (dict) The product of factors of events of each code which has events in the table.
+        Prices of earlier rows of the code are multiplied by it to be continuous with the table.
+    """
+    if EVENT_FACTOR not in table.columns:
+        return {}
+
+    events = table[EVENT_FACTOR].loc[table[EVENT_FACTOR].values != 1.0]
+    return events.groupby(level='code').prod().to_dict()
+
+
+def apply_factors(table, later_factors=None):
+    """
+    Adjust prices by the product of factors of later events of each code. The last row of each code keeps
+    its traded prices, and prices before an event are continuous with prices after it.
+    The factor is kept in adj_factor, so raw prices can be restored on request without the csv file.
+
+    :param table: (DataFrame) A table which find_events() made.
+    :param later_factors: (dict, default=None) The product of factors of events after the table for each code,
+        if later rows of codes are not in the table, like rows in later partitions.
+
+    :return adjusted_table: (DataFrame)
+        columns     open, high, low, close  | (float) Adjusted prices.
+                    listed_stocks_number    | (int)
+                    adj_factor              | (float) The product of factors of events after the row.
+    """
+    if EVENT_FACTOR not in table.columns:
+        return table
+
+    # The product of factors after a row is the product of all factors of its code over those until the row.
+    codes = table.index.get_level_values('code')
+    event_factors = pd.Series(table[EVENT_FACTOR].values, index=codes)
+    groups = event_factors.groupby(level='code', sort=False)
+    adj_factors = groups.transform('prod').values / groups.cumprod().values
+    if later_factors is not None and len(later_factors) > 0:
+        adj_factors = adj_factors * pd.Series(later_factors, dtype=np.float64).reindex(codes).fillna(1.0).values
+
+    table = table.drop(EVENT_FACTOR, axis=1)
+    for column in PRICE_COLUMNS:
+        table[column] = adj_factors * table[column]
+    table[ADJUSTMENT_FACTOR] = adj_factors
+    return table
+
+
+def adjust_prices(table, last_rows=None):
+    """
+    Adjust prices of the table by events of corporate actions. See find_events and apply_factors.
+
+    :param table: (DataFrame) A table whose index is (code, date).
+    :param last_rows: (DataFrame, default=None) The last row of each code before the table.
+
+    :return adjusted_table: (DataFrame) The table sorted by its index.
+    """
+    return apply_factors(find_events(table, last_rows))
+
+
+def rescale_prices(table, factors, before):
+    """
+    Multiply prices and adj_factor of rows of codes before a date by factors,
+    like old rows of codes which have events in appended rows.
+
+    :param table: (DataFrame) A table which adjust_prices() made.
+    :param factors: (dict) The factor of each code. See get_event_products.
+    :param before: (datetime) Only rows before it are multiplied.
+
+    :return rescaled_table: (DataFrame) None if no row of the table is multiplied.
+    """
+    dates = pd.to_datetime(table.index.get_level_values('date'))
+    row_factors = pd.Series(factors, dtype=np.float64).reindex(table.index.get_level_values('code')).values
+    row_factors[np.isnan(row_factors) | (dates >= before)] = 1.0
+    if np.all(row_factors == 1.0):
+        return None
+
+    table = table.copy()
+    for column in PRICE_COLUMNS + [ADJUSTMENT_FACTOR]:
+        table[column] = row_factors * table[column]
+    return table
+
+
+def select_prices(table, adjusted=True):
+    """
+    Get adjusted or raw prices from a table which adjust_prices() made.
+    A table without adjustment factors is returned as it is.
+
+    :param table: (DataFrame)
+    :param adjusted: (boolean, default=True) If it is False, restore raw prices of the table.
+
+    :return prices: (DataFrame) The table without adj_factor, factors of price columns and listed_stocks_number.
+    """
+    if ADJUSTMENT_FACTOR not in table.columns:
+        return table
+
+    # Select columns without copying them, like a table without adjustment factors.
+    columns = [column for column in table.columns if not is_adjustment_column(column)]
+    prices = {column: table[column] for column in columns}
+
+    if not adjusted:
+        for column in PRICE_COLUMNS:
+            if column in prices:
+                prices[column] = table[column] / get_factors(table, column)
+
+    return pd.DataFrame(prices, index=table.index, columns=columns, copy=False)
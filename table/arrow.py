@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 24.
+"""
+import pandas as pd
+
+from table.atomic_file import atomic_write
+
+# The number of rows of a row group of Parquet files, which is the default of pyarrow.
+ROW_GROUP_SIZE = 1024 * 1024
+
+
+def _import_pyarrow():
+    # pyarrow is only needed to use Arrow and Parquet, so import it when they are used.
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('pyarrow is required to use Arrow and Parquet. Install it by `pip install pyarrow`.')
+    return pyarrow, pyarrow.parquet
+
+
+def _parse_date_level(table):
+    # The date level can be strings when the table is loaded without parse_dates.
+    # Parse it, so Parquet keeps min and max dates of each row group.
+    if 'date' not in table.index.names or table.index.get_level_values('date').dtype != object:
+        return table
+
+    table = table.copy(deep=False)
+    if isinstance(table.index, pd.MultiIndex):
+        level = table.index.names.index('date')
+        table.index = table.index.set_levels(pd.to_datetime(table.index.levels[level]), level=level)
+    else:
+        table.index = pd.DatetimeIndex(pd.to_datetime(table.index), name='date')
+    return table
+
+
+def to_arrow(table):
+    """
+    :param table: (DataFrame)
+
+    :return arrow_table: (pyarrow.Table) The table with its index as columns.
+        Numeric columns without missing values are not copied.
+    """
+    pyarrow, _ = _import_pyarrow()
+    return pyarrow.Table.from_pandas(_parse_date_level(table), preserve_index=True)
+
+
+def from_arrow(arrow_table):
+    """
+    :param arrow_table: (pyarrow.Table) A table which to_arrow() made.
+
+    :return table: (DataFrame) The table whose index is restored.
+    """
+    return arrow_table.to_pandas(split_blocks=True)
+
+
+def _get_schema(pyarrow, table):
+    """
+    :param table: (DataFrame) A table which has the dtypes of all partitions. Its rows are not used.
+
+    :return schema: (pyarrow.Schema) The schema which all partitions are cast to.
+        Object columns are strings even if they have no values, and categories are dictionaries of int32 indices,
+        so partitions whose columns are all missing or which have fewer categories have the same schema.
+    """
+    schema = to_arrow(table.iloc[:0]).schema
+    fields = []
+    for field in schema:
+        field_type = field.type
+        if pyarrow.types.is_null(field_type):
+            field_type = pyarrow.string()
+        elif pyarrow.types.is_dictionary(field_type):
+            value_type = pyarrow.string() if pyarrow.types.is_null(field_type.value_type) else field_type.value_type
+            field_type = pyarrow.dictionary(pyarrow.int32(), value_type)
+        fields.append(pyarrow.field(field.name, field_type))
+    return pyarrow.schema(fields, metadata=schema.metadata)
+
+
+def _write(partitions, file_dir, open_writer, schema=None, row_group_size=None):
+    pyarrow, _ = _import_pyarrow()
+
+    arrow_schema = _get_schema(pyarrow, schema) if schema is not None else None
+    writer = None
+
+    # Rows of partitions which are not written yet, because they are fewer than row_group_size.
+    arrow_tables = []
+    rows = 0
+    with atomic_write(file_dir) as temp_file_dir:
+        try:
+            for partition in partitions:
+                if arrow_schema is None:
+                    arrow_schema = _get_schema(pyarrow, partition)
+                arrow_table = to_arrow(partition)
+                arrow_table = arrow_table.select(arrow_schema.names).cast(arrow_schema)
+                if writer is None:
+                    writer = open_writer(temp_file_dir, arrow_schema)
+                if row_group_size is None:
+                    writer.write_table(arrow_table)
+                    continue
+
+                # Small partitions are merged and large ones are split, so each row group has row_group_size rows.
+                arrow_tables.append(arrow_table)
+                rows += arrow_table.num_rows
+                if rows >= row_group_size:
+                    arrow_table = pyarrow.concat_tables(arrow_tables)
+                    written_rows = rows - rows % row_group_size
+                    writer.write_table(arrow_table.slice(0, written_rows), row_group_size=row_group_size)
+                    arrow_tables = [arrow_table.slice(written_rows)]
+                    rows -= written_rows
+
+            if rows > 0:
+                writer.write_table(pyarrow.concat_tables(arrow_tables), row_group_size=row_group_size)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            raise ValueError('There is no partition to write to {}.'.format(file_dir))
+
+
+def write_parquet(partitions, file_dir, schema=None, row_group_size=ROW_GROUP_SIZE):
+    """
+    Write partitions as row groups of row_group_size rows in a Parquet file, merging small partitions and splitting
+    large ones. Partitions are split by the period of date, so min and max statistics of a row group
+    let readers skip row groups out of dates.
+
+    :param partitions: (iterable of DataFrame) Partitions whose index is (code, date), each sorted by code and date.
+    :param file_dir: (string)
+    :param schema: (DataFrame, default=None) A table which has the dtypes of the whole table, like an empty one.
+        Every partition is cast to its dtypes. If it is None, use the dtypes of the first partition.
+    :param row_group_size: (int, default=ROW_GROUP_SIZE) The number of rows of a row group. The last one can be less.
+    """
+    _, parquet = _import_pyarrow()
+    _write(partitions, file_dir, lambda temp_file_dir, arrow_schema: parquet.ParquetWriter(temp_file_dir, arrow_schema),
+           schema, row_group_size)
+
+
+def write_ipc(partitions, file_dir, schema=None):
+    """
+    Write partitions as record batches of an Arrow IPC file, which can be memory-mapped without deserialization.
+
+    :param partitions: (iterable of DataFrame)
+    :param file_dir: (string)
+    :param schema: (DataFrame, default=None) See write_parquet.
+    """
+    pyarrow, _ = _import_pyarrow()
+    _write(partitions, file_dir, lambda temp_file_dir, arrow_schema: pyarrow.ipc.new_file(temp_file_dir, arrow_schema),
+           schema)
+
+
+def _get_filters(codes=None, from_date=None, to_date=None):
+    filters = []
+    if codes is not None:
+        filters.append(('code', 'in', list(codes)))
+    if from_date is not None:
+        filters.append(('date', '>=', pd.Timestamp(from_date)))
+    if to_date is not None:
+        filters.append(('date', '<=', pd.Timestamp(to_date)))
+    return filters if len(filters) > 0 else None
+
+
+def read_parquet(file_dir, columns=None, codes=None, from_date=None, to_date=None, as_arrow=False):
+    """
+    Read only the columns and the row groups which can have rows of the codes from from_date to to_date.
+    The file is memory-mapped, so skipped columns and row groups are never read.
+
+    Example
+    -------
+    closes = read_parquet(DATA_DIR + 'stock_daily_price.parquet', columns=['close'],
+                          from_date=datetime(2017, 1, 1), to_date=datetime(2017, 12, 31))
+
+    :param file_dir: (string)
+    :param columns: (list of string, default=None) Columns to read besides the index. If None, read all columns.
+    :param codes: (array-like, default=None)
+    :param from_date: (datetime, default=None) Inclusive.
+    :param to_date: (datetime, default=None) Inclusive.
+    :param as_arrow: (boolean, default=False) If it is True, return a pyarrow.Table without converting it.
+
+    :return table: (DataFrame)
+    """
+    _, parquet = _import_pyarrow()
+    arrow_table = parquet.read_table(file_dir, columns=columns, filters=_get_filters(codes, from_date, to_date),
+                                     memory_map=True, use_pandas_metadata=True)
+    return arrow_table if as_arrow else from_arrow(arrow_table)
+
+
+def read_ipc(file_dir, columns=None, as_arrow=False):
+    """
+    Memory-map an Arrow IPC file. Record batches refer to the mapped file without copying it.
+
+    :param file_dir: (string)
+    :param columns: (list of string, default=None) Columns to read besides the index. If None, read all columns.
+    :param as_arrow: (boolean, default=False) If it is True, return a pyarrow.Table without converting it.
+
+    :return table: (DataFrame)
+    """
+    pyarrow, _ = _import_pyarrow()
+    with pyarrow.memory_map(file_dir, 'r') as source:
+        arrow_table = pyarrow.ipc.open_file(source).read_all()
+
+    if columns is not None:
+        index_columns = [name for name in arrow_table.schema.pandas_metadata['index_columns']
+                         if isinstance(name, str)]
+        arrow_table = arrow_table.select(index_columns + list(columns))
+
+    return arrow_table if as_arrow else from_arrow(arrow_table)
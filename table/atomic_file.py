@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 3. 2.
+"""
+import os
+import uuid
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(file_dir):
+    """
+    Write a file through a temporary file beside it, which is moved to the file only when the block succeeds.
+    Other processes never read a half-written file, and a broken write never looks like a complete file.
+    The temporary file has a unique name, so processes and threads which write the same file do not share it.
+
+    Example
+    -------
+    with atomic_write(metadata_file_dir) as temp_file_dir:
+        with open(temp_file_dir, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+
+    :param file_dir: (string)
+
+    :return temp_file_dir: (string) The path to write instead of file_dir.
+    """
+    temp_file_dir = '{}.{}.{}.tmp'.format(file_dir, os.getpid(), uuid.uuid4().hex)
+    try:
+        yield temp_file_dir
+        os.replace(temp_file_dir, file_dir)
+    finally:
+        if os.path.exists(temp_file_dir):
+            os.remove(temp_file_dir)
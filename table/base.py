@@ -4,24 +4,40 @@
 :Date: 2018. 1. 1.
 """
 import os
-from datetime import datetime
+import shutil
+import threading
+import weakref
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
+from table.ingestion import ingest_csv, download_csv, DEFAULT_MEMORY_BUDGET
+from table.adjustment import adjust_prices, find_events, apply_factors, get_event_products, get_last_rows, \
+    rescale_prices, has_market_capitalization, select_prices, ADJUSTMENT_VERSION, EVENT_FACTOR
+from table.arrow import write_parquet, write_ipc
+from table.cache import CacheManager, cache_manager, DEFAULT_RESULT_CACHE_MEMORY_BUDGET
+from table.dtypes import compact_table, get_compact_dtypes, cast_table, get_memory_usage, MEGA_BYTES
+from table.file_lock import FileLock
+from table.hash_index import HashIndex
+from table.integrity import validate_index
+from table.metadata import get_file_metadata, read_metadata, write_metadata, is_fresh
+from table.offset_index import OffsetIndex
+from table.partition import PartitionedStore
+from table.query import Query, QueryPlan, take_windows, MEMORY, HDF, PARTITIONS, CSV
+from table.resample import resample_bars, get_rule_nanoseconds, DAY
+from table.shared import publish, attach, is_published, unpublish
+
 idx = pd.IndexSlice
 
 # Set the root directory to your working directory.
 # For example, /Users/willbe/PycharmProjects/willbe
 DATA_DIR = os.getcwd().replace(chr(92), '/') + '/data/'
 
-# Datetime format
-DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
-
 
 class SingletonInstance:
     __instance = None
+    __instance_lock = threading.Lock()
 
     @classmethod
     def __get_instance(cls):
@@ -29,9 +45,12 @@ class SingletonInstance:
 
     @classmethod
     def instance(cls, *args, **kwargs):
-        # noinspection PyArgumentList
-        cls.__instance = cls(*args, **kwargs)
-        cls.instance = cls.__get_instance
+        with SingletonInstance.__instance_lock:
+            # Another thread can create the instance while this thread waits for the lock.
+            if cls.__instance is None:
+                # noinspection PyArgumentList
+                cls.__instance = cls(*args, **kwargs)
+                cls.instance = cls.__get_instance
         return cls.__instance
 
 
@@ -44,24 +63,62 @@ class Table(SingletonInstance):
                                                 .where(from_date=datetime(2016, 1, 1), to_date=datetime(2016, 12, 31))
                                                 .values()
 
+    # Each select() returns its own Query, so threads can run queries on the shared table at the same time.
+    # Record where() and execute it at once in values().
+    stock_minute_price = stock_minute_price_table.select(lazy=True)
+                                                .where(stock_masters=stock_masters)
+                                                .where(from_date=datetime(2016, 1, 1), to_date=datetime(2016, 12, 31))
+                                                .values()
+
     """
     __table_name = None
     __csv_file_remote_address = None
     __csv_file_dir = None
     __hdf_file_dir = None
-    __table = None
-    __selected_table = None
+    __offset_index_file_dir = None
+    __bars_dir = None
+    __metadata_file_dir = None
+    __shared_dir = None
+    __load_lock = None
+    __is_validated = False
     __index = None
     __parse_dates = None
+    __partitioned_store = None
+    __compact = False
+    __memory_budget = DEFAULT_MEMORY_BUDGET
+    __memory_report = None
+    __hash_index_columns = None
+    __result_cache = None
+    __results_version = None
 
     @classmethod
-    def __init__(cls, table_name, csv_file_remote_address, index=None, parse_dates=None):
+    def __init__(cls, table_name, csv_file_remote_address, index=None, parse_dates=None, partition_freq=None,
+                 compact=False, memory_budget=DEFAULT_MEMORY_BUDGET, hash_index_columns=None):
         cls.__table_name = table_name
         cls.__csv_file_remote_address = csv_file_remote_address
         cls.__index = index
         cls.__parse_dates = parse_dates
         cls.__csv_file_dir = DATA_DIR + cls.__table_name + '.csv'
         cls.__hdf_file_dir = DATA_DIR + cls.__table_name + '.h5'
+        cls.__offset_index_file_dir = DATA_DIR + cls.__table_name + '.idx.npz'
+        cls.__bars_dir = DATA_DIR + cls.__table_name + '.bars/'
+        cls.__metadata_file_dir = DATA_DIR + cls.__table_name + '.meta.json'
+        cls.__shared_dir = DATA_DIR + cls.__table_name + '.shared/'
+
+        # Only one thread of one process builds the cache, and the others wait for it and load the result.
+        cls.__load_lock = FileLock(DATA_DIR + cls.__table_name + '.lock')
+
+        # If compact is True, keep the table and its cache in compact dtypes. See table.dtypes.compact_table.
+        cls.__compact = compact
+
+        # If partition_freq is not None, cache the table as partitions split by the period of date.
+        # The partitions are built from a csv file in chunks which fit in memory_budget bytes.
+        if partition_freq is not None:
+            cls.__partitioned_store = PartitionedStore(DATA_DIR + cls.__table_name + '/', partition_freq)
+        cls.__memory_budget = memory_budget
+
+        # Key columns which where() and lookup() resolve by hash tables instead of scans.
+        cls.__hash_index_columns = hash_index_columns
 
     @classmethod
     def __download_csv(cls, parse_dates=None):
@@ -92,11 +149,12 @@ class Table(SingletonInstance):
 
         # Set index.
         if index is not None:
-            # Check the table has duplicated elements.
-            if np.any(table.duplicated()):
-                raise KeyError("{} has some duplicated elements.".format(cls.__table_name))
             table = table.set_index(index)
-            table = table.sort_index()
+
+            # Check the table has duplicated keys, and sort it only if it is not sorted.
+            report = validate_index(table.index, cls.__table_name)
+            if not report['is_monotonic']:
+                table = table.sort_index()
 
         return table
 
@@ -110,80 +168,768 @@ class Table(SingletonInstance):
         return table
 
     @classmethod
-    def select(cls):
-        assert cls.__table_name is not None
+    def __load(cls):
+        """
+        If the cache manager did not cache this table, load the table and cache it.
+        Only one thread loads the table, and the others wait for it and share the result.
+
+        :return table: (DataFrame)
+        :return offset_index: (OffsetIndex) It is None if the table has no date level.
+        """
+        loaded_table = cache_manager.get(cls.__table_name)
+        if loaded_table is None:
+            with cls.__load_lock:
+                loaded_table = cache_manager.peek(cls.__table_name)
+                if loaded_table is None:
+                    # Attach the table which another process shared instead of loading a copy of it.
+                    cls.__validate_cache()
+                    loaded_table = cls.__attach()
+                    if loaded_table is None:
+                        table = cls.__build()
+                        loaded_table = table, cls.__load_offset_index(table)
+                    cls.__cache(*loaded_table)
+
+        return loaded_table
+
+    @classmethod
+    def __attach(cls):
+        table, arrays = attach(cls.__shared_dir)
+        if table is None:
+            return None
+
+        offset_index = None
+        if len(arrays) > 0:
+            offset_index = OffsetIndex(arrays['codes'], arrays['starts'], arrays['ends'], arrays['dates'])
+        print('Attach {}.'.format(cls.__shared_dir))
 
-        # If this class did not cache a table, load the table and cache it.
-        if cls.__table is None:
+        return table, offset_index
+
+    @classmethod
+    def __get_hash_index(cls, table):
+        """
+        :return hash_index: (HashIndex) The hash index of the table. It is None if this table has no hash index.
+        """
+        if cls.__hash_index_columns is None:
+            return None
+
+        # Rebuild the hash index when the loaded table is replaced.
+        key = cls.__table_name + '.hash_index'
+        cached = cache_manager.get(key)
+        if cached is not None and cached[0]() is table:
+            return cached[1]
+
+        hash_index = HashIndex(table, cls.__hash_index_columns)
+        memory_usage = len(table) * len(cls.__hash_index_columns) * np.dtype(np.int64).itemsize
+        cache_manager.put(key, (weakref.ref(table), hash_index), memory_usage)
+        return hash_index
 
-            # Before try csv format, try hdf format first because of speed issue.
-            if Path(cls.__hdf_file_dir).exists():
-                cls.__table = cls.__load_hdf()
+    @classmethod
+    def __cache(cls, table, offset_index):
+        memory_usage = get_memory_usage(table)
+        if offset_index is not None:
+            memory_usage += offset_index.nbytes
+        cache_manager.put(cls.__table_name, (table, offset_index), memory_usage)
+
+    @classmethod
+    def __load_offset_index(cls, table):
+        # Only a (code, date) index has date ranges per code.
+        if table.index.nlevels != 2:
+            return None
+
+        offset_index = OffsetIndex.load(cls.__offset_index_file_dir)
+
+        # Rebuild the offset index if the table is changed.
+        if offset_index is None or len(offset_index) != len(table):
+            offset_index = OffsetIndex.from_index(table.index)
+            offset_index.save(cls.__offset_index_file_dir)
+            print('Create {}.'.format(cls.__offset_index_file_dir))
+
+        return offset_index
+
+    @classmethod
+    def __validate_cache(cls):
+        """
+        If the csv file is changed after the cache is built, remove the cache to rebuild it.
+        Call it with the load lock.
+        """
+        if cls.__has_cache() and Path(cls.__csv_file_dir).exists():
+            metadata = read_metadata(cls.__metadata_file_dir)
+
+            # Prices of a cache which is adjusted by another version can not be restored, so it is rebuilt.
+            is_old_adjustment = (metadata is None or metadata.get('adjustment_version') != ADJUSTMENT_VERSION) \
+                and has_market_capitalization(pd.read_csv(cls.__csv_file_dir, nrows=0, encoding='utf-8'))
+
+            if is_old_adjustment:
+                print('{} is adjusted by an old version. Rebuild {}.'.format(cls.__table_name, cls.__table_name))
+                cls.__remove_cache()
+            # A cache built before metadata is trusted as it is, but its integrity is checked when it is loaded.
+            elif metadata is None:
+                cls.__write_metadata(integrity_checked=False, compact=False)
+            elif not is_fresh(metadata, cls.__csv_file_dir):
+                print('{} is changed. Rebuild {}.'.format(cls.__csv_file_dir, cls.__table_name))
+                cls.__remove_cache()
+            elif os.stat(cls.__csv_file_dir).st_mtime != metadata['mtime']:
+                # The contents are the same, so only remember the new modified time.
+                cls.__write_metadata(integrity_checked=metadata.get('integrity_checked', False),
+                                     compact=metadata.get('compact', False))
+
+        # Partitions of an old version are split by code, which makes a query of dates open a file per code.
+        if cls.__partitioned_store is not None and cls.__partitioned_store.exists() \
+                and cls.__partitioned_store.is_split_by_code():
+            cls.__partitioned_store.split_by_period()
+            print('Split {} by period.'.format(cls.__partitioned_store.root_dir))
+
+        # A cache which is not stored in compact dtypes is compacted once, so it is never compacted on reads.
+        if cls.__compact and cls.__has_cache() and not cls.__is_stored_compact():
+            cls.__compact_cache()
+
+        cls.__is_validated = True
+
+    @classmethod
+    def __has_cache(cls):
+        return Path(cls.__hdf_file_dir).exists() or (cls.__partitioned_store is not None
+                                                     and cls.__partitioned_store.exists())
+
+    @classmethod
+    def __is_stored_compact(cls):
+        metadata = read_metadata(cls.__metadata_file_dir)
+        return metadata is not None and metadata.get('compact', False)
+
+    @classmethod
+    def __compact_cache(cls):
+        if Path(cls.__hdf_file_dir).exists():
+            cls.__write_hdf(cls.__compact_table(cls.__load_hdf()))
+        if cls.__partitioned_store is not None and cls.__partitioned_store.exists():
+            dtypes = {}
+            for partition in cls.__partitioned_store.iterate():
+                dtypes = get_compact_dtypes(partition, dtypes, categories=False)
+            cls.__report_memory(*cls.__partitioned_store.cast(dtypes))
+
+        metadata = read_metadata(cls.__metadata_file_dir) or {}
+        cls.__write_metadata(integrity_checked=metadata.get('integrity_checked', False),
+                             adjustment_version=metadata.get('adjustment_version'), compact=True)
+
+    @classmethod
+    def __write_hdf(cls, table):
+        # Only the table format can store categorical columns.
+        hdf_format = 'table' if cls.__compact else 'fixed'
+        table.to_hdf(cls.__hdf_file_dir, 'table', encoding='utf-8', format=hdf_format)
 
+    @classmethod
+    def __write_metadata(cls, integrity_checked=True, adjustment_version=ADJUSTMENT_VERSION, compact=None):
+        """
+        :param integrity_checked: (boolean, default=True) If it is True, loading the cache skips integrity checks.
+        :param adjustment_version: (int, default=ADJUSTMENT_VERSION) The version which adjusted prices of the cache.
+        :param compact: (boolean, default=None) If it is True, the cache is stored in compact dtypes,
+            so it is loaded as it is. If it is None, it is whether this table is compact.
+        """
+        metadata = get_file_metadata(cls.__csv_file_dir) if Path(cls.__csv_file_dir).exists() else {}
+        metadata['integrity_checked'] = integrity_checked
+        metadata['adjustment_version'] = adjustment_version
+        metadata['compact'] = cls.__compact if compact is None else compact
+        write_metadata(cls.__metadata_file_dir, metadata)
+
+    @classmethod
+    def __check_integrity(cls, table):
+        # Check a cache which is not built by this version once, and skip it after that.
+        metadata = read_metadata(cls.__metadata_file_dir)
+        if metadata is not None and metadata.get('integrity_checked', False):
+            return table
+
+        report = validate_index(table.index, cls.__table_name)
+        if not report['is_monotonic']:
+            table = table.sort_index()
+        cls.__write_metadata()
+
+        return table
+
+    @classmethod
+    def __remove_cache(cls):
+        for file_dir in [cls.__hdf_file_dir, cls.__offset_index_file_dir, cls.__metadata_file_dir]:
+            if Path(file_dir).exists():
+                os.remove(file_dir)
+        if cls.__partitioned_store is not None:
+            cls.__partitioned_store.clear()
+        cls.__clear_bars()
+        cls.__clear_results()
+        unpublish(cls.__shared_dir)
+        cache_manager.invalidate(cls.__table_name)
+
+    @classmethod
+    def __build(cls):
+        cls.__validate_cache()
+
+        # Before try csv format, try hdf format first because of speed issue.
+        if Path(cls.__hdf_file_dir).exists():
+            table = cls.__check_integrity(cls.__load_hdf())
+
+            # Split the old hdf cache into partitions.
+            if cls.__partitioned_store is not None and not cls.__partitioned_store.exists():
+                cls.__partitioned_store.write(table)
+                print('Create {}.'.format(cls.__partitioned_store.root_dir))
+
+        elif cls.__partitioned_store is not None and cls.__partitioned_store.exists():
+            table = cls.__check_integrity(cls.__partitioned_store.read())
+
+        else:
+            table = cls.__load_csv(index=cls.__index, parse_dates=cls.__parse_dates)
+            table = adjust_prices(table)
+            table = cls.__compact_table(table)
+            cls.__clear_bars()
+            cls.__clear_results()
+
+            # Save partitions or a hdf file.
+            if cls.__partitioned_store is not None:
+                cls.__partitioned_store.write(table)
+                print('Create {}.'.format(cls.__partitioned_store.root_dir))
             else:
-                cls.__table = cls.__load_csv(index=cls.__index, parse_dates=cls.__parse_dates)
-
-                # If the table has market_capitalization and listed_stocks_number,
-                # adjust open, high, low, close fields.
-                if 'market_capitalization' in cls.__table.columns and 'listed_stocks_number' in cls.__table.columns:
-                    cls.__table['adj_close'] = cls.__table['market_capitalization'] / cls.__table[
-                        'listed_stocks_number']
-                    cls.__table['open'] = cls.__table['adj_close'] / cls.__table['close'] * cls.__table['open']
-                    cls.__table['high'] = cls.__table['adj_close'] / cls.__table['close'] * cls.__table['high']
-                    cls.__table['low'] = cls.__table['adj_close'] / cls.__table['close'] * cls.__table['low']
-                    cls.__table['close'] = cls.__table['adj_close']
-                    cls.__table = cls.__table.drop('adj_close', axis=1)
-                    cls.__table = cls.__table.drop('market_capitalization', axis=1)
-                    cls.__table = cls.__table.drop('listed_stocks_number', axis=1)
-
-                # Save a hdf file.
-                cls.__table.to_hdf(cls.__hdf_file_dir, 'table', encoding='utf-8')
+                cls.__write_hdf(table)
                 print('Create {}.'.format(cls.__hdf_file_dir))
+            cls.__write_metadata()
+
+        return table
+
+    @classmethod
+    def __build_partitions(cls):
+        # A hdf file is split into partitions when it is loaded.
+        if cls.__is_validated and (cls.__partitioned_store.exists() or Path(cls.__hdf_file_dir).exists()):
+            return
+
+        with cls.__load_lock:
+            cls.__validate_cache()
+            if cls.__partitioned_store.exists() or Path(cls.__hdf_file_dir).exists():
+                return
+
+            if not Path(cls.__csv_file_dir).exists():
+                if cls.__csv_file_remote_address is None:
+                    raise FileNotFoundError('Both {} and {} is not exist.'.format(cls.__hdf_file_dir,
+                                                                                  cls.__csv_file_dir))
+                download_csv(cls.__csv_file_remote_address, cls.__csv_file_dir)
+
+            # Events of partitions are found in the order of periods, carrying the last rows of codes.
+            last_rows = None
+            dtypes = {}
+
+            def find_partition_events(partition):
+                nonlocal last_rows
+                partition = find_events(partition, last_rows)
+                last_rows = get_last_rows(partition, last_rows)
+                if cls.__compact and EVENT_FACTOR not in partition.columns:
+                    dtypes.update(get_compact_dtypes(partition, dtypes, categories=False))
+                return partition
+
+            ingest_csv(cls.__csv_file_dir, cls.__partitioned_store, cls.__index,
+                       memory_budget=cls.__memory_budget, parse_dates=cls.__parse_dates,
+                       partition_transform=find_partition_events)
+
+            # Prices are adjusted by events of later partitions too, so partitions are adjusted at last
+            # in the reverse order of periods, carrying the products of factors of later events of codes.
+            later_factors = {}
+
+            def adjust_partition(partition):
+                event_products = get_event_products(partition)
+                partition = apply_factors(partition, later_factors)
+                for code, event_product in event_products.items():
+                    later_factors[code] = later_factors.get(code, 1.0) * event_product
+                if cls.__compact:
+                    dtypes.update(get_compact_dtypes(partition, dtypes, categories=False))
+                return partition
+
+            schema = cls.__partitioned_store.read(codes=[])
+            if EVENT_FACTOR in schema.columns:
+                cls.__partitioned_store.rewrite(adjust_partition, reverse=True)
+                cls.__partitioned_store.write_schema(apply_factors(schema))
+
+            # The dtypes fit all partitions only after all of them are adjusted, so they are cast at last.
+            if cls.__compact:
+                cls.__report_memory(*cls.__partitioned_store.cast(dtypes))
+            cls.__clear_bars()
+            cls.__clear_results()
+            cls.__write_metadata()
+            print('Create {}.'.format(cls.__partitioned_store.root_dir))
+
+    @classmethod
+    def __compact_table(cls, table):
+        if not cls.__compact:
+            return table
+
+        memory_usage = get_memory_usage(table)
+        table = compact_table(table)
+        cls.__report_memory(memory_usage, get_memory_usage(table))
+
+        return table
+
+    @classmethod
+    def __report_memory(cls, memory_usage, compact_memory_usage):
+        cls.__memory_report = {
+            'memory_usage': memory_usage,
+            'compact_memory_usage': compact_memory_usage,
+            'saved_memory_usage': memory_usage - compact_memory_usage,
+        }
+        print('Compact {} from {:.1f}MB to {:.1f}MB, saving {:.1f}MB.'.format(
+            cls.__table_name, memory_usage / MEGA_BYTES, compact_memory_usage / MEGA_BYTES,
+            (memory_usage - compact_memory_usage) / MEGA_BYTES))
+
+    @classmethod
+    def append(cls, table):
+        """
+        Append new rows to the cache of this table instead of rebuilding it.
+        Rows replace old rows which have the same keys, and they should not be earlier than the other old rows
+        of their codes. If the table is partitioned, only the partitions which the new rows belong to are rewritten,
+        unless the new rows have events of corporate actions which change adjusted prices of the old rows.
+        If this table has no cache yet or the table has no rows, do nothing.
+        The cache will be built from the csv file if it has no cache yet.
+        The csv file is remembered as the source of the appended cache, so write the new rows to it before append().
+
+        :param table: (DataFrame) New rows which have the columns of the csv file.
+            Its index can be already set or not.
+        """
+        assert cls.__table_name is not None
+
+        # A table which failed to be read has no rows and no index.
+        if len(table) == 0:
+            return
+
+        table = table.copy()
+        if list(table.index.names) != cls.__index:
+            table = table.reset_index(drop=table.index.names == [None]).set_index(cls.__index)
+
+        with cls.__load_lock:
+            is_partitioned = cls.__partitioned_store is not None and cls.__partitioned_store.exists()
+            if not is_partitioned and not Path(cls.__hdf_file_dir).exists():
+                return
 
-        cls.__selected_table = cls.__table
-        return cls
+            # New rows follow old rows of their codes, so events between them are found from the last old rows.
+            before = pd.to_datetime(table.index.get_level_values('date')).min()
+            loaded_table = None
+            if is_partitioned:
+                last_rows = cls.__partitioned_store.last_rows(table.index.get_level_values('code'), before)
+            else:
+                loaded_table = cache_manager.peek(cls.__table_name)
+                old_table = loaded_table[0] if loaded_table is not None else cls.__load_hdf()
+                last_rows = get_last_rows(old_table.loc[pd.to_datetime(old_table.index.get_level_values('date'))
+                                                        < before])
+
+            # Prices of new rows are traded prices until new events, and old rows of codes which have new events
+            # are multiplied by the factors of the events.
+            table = find_events(table, last_rows)
+            event_products = get_event_products(table)
+            table = apply_factors(table)
+
+            # The offset index is rebuilt when the table is loaded.
+            if Path(cls.__offset_index_file_dir).exists():
+                os.remove(cls.__offset_index_file_dir)
+            cls.__clear_bars()
+            cls.__clear_results()
+
+            # Processes which attached the shared table keep the old one until it is shared again.
+            unpublish(cls.__shared_dir)
+
+            metadata = read_metadata(cls.__metadata_file_dir) or {}
+            is_compact = cls.__compact and metadata.get('compact', False)
+
+            if is_partitioned:
+                schema = cls.__partitioned_store.read(codes=[])
+                table = table[schema.columns]
+                dtypes = dict(schema.dtypes)
+                new_dtypes = dict(dtypes)
+
+                def rescale_partition(partition):
+                    partition = rescale_prices(partition, event_products, before)
+                    if partition is not None and is_compact:
+                        new_dtypes.update(get_compact_dtypes(partition, new_dtypes, categories=False))
+                    return partition
+
+                if len(event_products) > 0:
+                    cls.__partitioned_store.rewrite(rescale_partition, to_date=before)
+
+                # New rows are stored in the dtypes of the partitions, which are widened if the rows do not fit them.
+                if is_compact:
+                    new_dtypes = get_compact_dtypes(table, new_dtypes, categories=False)
+                    if new_dtypes != dtypes or len(event_products) > 0:
+                        cls.__partitioned_store.cast(new_dtypes)
+                    table = cast_table(table, new_dtypes)
+
+                cls.__partitioned_store.merge(table)
+                print('Append {} rows to {}.'.format(len(table), cls.__partitioned_store.root_dir))
+
+                # Reload the whole table on the next select() instead of merging it in memory.
+                cache_manager.invalidate(cls.__table_name)
+
+            else:
+                if len(event_products) > 0:
+                    rescaled_table = rescale_prices(old_table, event_products, before)
+                    old_table = old_table if rescaled_table is None else rescaled_table
+                new_table = pd.concat([old_table, table[old_table.columns]])
+                new_table = new_table.loc[~new_table.index.duplicated(keep='last')].sort_index()
+
+                # The whole table is written again, so it is stored in compact dtypes.
+                new_table = cls.__compact_table(new_table)
+                is_compact = cls.__compact
+                cls.__write_hdf(new_table)
+                print('Append {} rows to {}.'.format(len(table), cls.__hdf_file_dir))
+
+                # Replace the shared table at once, so running queries keep the old one.
+                if loaded_table is not None:
+                    cls.__cache(new_table, cls.__load_offset_index(new_table))
+
+            # The cache has the rows of the csv file now, so the next process does not rebuild it.
+            cls.__write_metadata(integrity_checked=metadata.get('integrity_checked', False),
+                                 adjustment_version=metadata.get('adjustment_version'), compact=is_compact)
+
+    @classmethod
+    def __clear_bars(cls):
+        # Bars are derived from the table, so they are resampled again after the table is changed.
+        if Path(cls.__bars_dir).exists():
+            shutil.rmtree(cls.__bars_dir)
+        cache_manager.invalidate_prefix(cls.__bars_dir)
+
+    @classmethod
+    def __clear_results(cls):
+        if cls.__result_cache is not None:
+            cls.__result_cache.clear()
+
+    @classmethod
+    def __get_version(cls):
+        """
+        :return version: (tuple) It changes on every write to the hdf file or the partitions,
+            whether the write is done by this table, by the partitioned store directly or by another process.
+        """
+        try:
+            stat = os.stat(cls.__hdf_file_dir)
+            hdf_version = stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            hdf_version = None
+
+        store_version = cls.__partitioned_store.version() if cls.__partitioned_store is not None else None
+        return hdf_version, store_version
 
     @classmethod
-    def where(cls,
-              code=None, short_code=None, company_name=None,  # For StockMaster
-              stock_masters=None, from_date=None, to_date=None  # For StockMinutePrice, StockDailyPrice
-              ):
+    def __validate_results(cls):
+        # Results of an old version of the table are never served.
+        if cls.__result_cache is None:
+            return
+
+        version = cls.__get_version()
+        if version != cls.__results_version:
+            cls.__result_cache.clear()
+            cls.__results_version = version
+
+    @classmethod
+    def enable_result_cache(cls, memory_budget=DEFAULT_RESULT_CACHE_MEMORY_BUDGET):
+        """
+        Cache results of where() and values() of this table by their merged predicates and columns.
+        The least recently used results are evicted beyond the memory budget,
+        and all results are invalidated when the cache files of the table are written in any way.
+
+        Example
+        -------
+        StockDailyPrice.instance().enable_result_cache()
+        print(StockDailyPrice.instance().result_cache_stats())
+
+        :param memory_budget: (int, default=DEFAULT_RESULT_CACHE_MEMORY_BUDGET) Bytes which results can use.
+        """
+        cls.__result_cache = CacheManager(memory_budget)
+
+    @classmethod
+    def disable_result_cache(cls):
+        cls.__result_cache = None
+
+    @classmethod
+    def result_cache_stats(cls):
+        """
+        :return stats: (dict) See table.cache.CacheManager.stats. It is None if the result cache is disabled.
+        """
+        if cls.__result_cache is None:
+            return None
+        return cls.__result_cache.stats()
+
+    @classmethod
+    def __resample(cls, rule):
+        # Partitions are split by periods longer than a day, so a bar not longer than a day is in one partition.
+        if cls.__partitioned_store is not None and get_rule_nanoseconds(rule) <= DAY:
+            cls.__build_partitions()
+            if cls.__table_name not in cache_manager and cls.__partitioned_store.exists():
+                # Partitions of periods are sorted by code in each of them, so their bars are sorted again.
+                bars = [resample_bars(partition, rule) for partition in cls.__partitioned_store.iterate()]
+                if len(bars) == 0:
+                    return resample_bars(cls.__partitioned_store.read(codes=[]), rule)
+                return pd.concat(bars).sort_index()
+
+        table, _ = cls.__load()
+        return resample_bars(table, rule)
+
+    @classmethod
+    def resample(cls, rule):
+        """
+        Resample this table to bars of the rule. See table.resample.resample_bars.
+        The bars are cached on the disk and in the cache manager as their own table,
+        so repeated requests do not resample again until new rows are appended.
+
+        Example
+        -------
+        stock_5_minute_prices = StockMinutePrice.instance().resample('5min')
+                                                            .where(stock_masters=stock_masters)
+                                                            .values()
+
+        :param rule: (string) The length of a bar. '5min', '30min', '1H', '1D'
+
+        :return query: (Query) A new query of the bars.
+        """
+        assert cls.__table_name is not None
+        assert cls.__index is not None and len(cls.__index) == 2
+
+        bars_file_dir = cls.__bars_dir + rule + '.h5'
+        loaded_bars = cache_manager.get(bars_file_dir)
+        if loaded_bars is None:
+            with cls.__load_lock:
+                loaded_bars = cache_manager.peek(bars_file_dir)
+                if loaded_bars is None:
+                    if Path(bars_file_dir).exists():
+                        bars = pd.read_hdf(bars_file_dir, 'table', encoding='utf-8')
+                    else:
+                        bars = cls.__resample(rule)
+                        os.makedirs(cls.__bars_dir, exist_ok=True)
+                        bars.to_hdf(bars_file_dir, 'table', encoding='utf-8', format='table')
+                        print('Create {}.'.format(bars_file_dir))
+
+                    offset_index = OffsetIndex.from_index(bars.index)
+                    loaded_bars = bars, offset_index
+                    cache_manager.put(bars_file_dir, loaded_bars, get_memory_usage(bars) + offset_index.nbytes)
+
+        bars, offset_index = loaded_bars
+        return Query(cls.__table_name + '_' + rule, lambda plan: plan.execute(bars, offset_index),
+                     selected_table=bars, offset_index=offset_index)
+
+    @classmethod
+    def share(cls):
+        """
+        Share the loaded table with other processes through memory-mapped files.
+        select() of other processes attaches the shared table without copying it, instead of loading its own copy.
+        The shared table is read-only and has the same dtypes. Strings of a compact table are shared without copies,
+        because they are categories. See table.shared.attach.
+
+        Example
+        -------
+        StockDailyPrice.instance().share()
+        parallel_process(make_features, stock_masters.index.values)
+        """
         assert cls.__table_name is not None
 
-        if cls.__table is None:
-            raise ValueError('__table of {} is None. Call select() first.'.format(cls.__table_name))
+        with cls.__load_lock:
+            table, offset_index = cls.__load()
 
-        # For StockMaster
-        if code is not None:
-            cls.__selected_table = cls.__selected_table.loc[idx[[code]], :]
+            arrays = None
+            if offset_index is not None:
+                arrays = {'codes': offset_index.codes, 'starts': offset_index.starts, 'ends': offset_index.ends,
+                          'dates': offset_index.dates}
+            publish(cls.__shared_dir, table, arrays)
+            print('Share {}.'.format(cls.__shared_dir))
 
-        if short_code is not None:
-            cls.__selected_table = cls.__selected_table.loc[cls.__selected_table['short_code'] == short_code]
+            # Use the shared table in this process too, so only one copy is in memory.
+            cls.__cache(*cls.__attach())
 
-        if company_name is not None:
-            cls.__selected_table = cls.__selected_table.loc[cls.__selected_table['company_name'] == company_name]
+    @classmethod
+    def unshare(cls):
+        with cls.__load_lock:
+            unpublish(cls.__shared_dir)
 
-        # For StockMinutePrice, StockDailyPrice
-        if stock_masters is not None:
-            cls.__selected_table = cls.__selected_table.loc[idx[stock_masters.index.values, :], :]
+    @classmethod
+    def pin(cls):
+        """
+        Never evict this table from the cache manager.
+        """
+        cache_manager.pin(cls.__table_name)
 
-        if from_date is not None:
-            cls.__selected_table = cls.__selected_table.loc[idx[:, from_date.strftime(DATETIME_FORMAT):], :]
+    @classmethod
+    def unpin(cls):
+        cache_manager.unpin(cls.__table_name)
 
-        if to_date is not None:
-            _to_date = datetime(to_date.year, to_date.month, to_date.day, 23, 59, 59)
-            cls.__selected_table = cls.__selected_table.loc[idx[:, :_to_date.strftime(DATETIME_FORMAT)], :]
+    @classmethod
+    def memory_report(cls):
+        """
+        :return memory_report: (dict) The bytes of the table before and after compact, and the saved bytes.
+            It is None if the table is not compact or not compacted by this process yet,
+            because a cache stored in compact dtypes is loaded as it is.
+                memory_usage            | (int)
+                compact_memory_usage    | (int)
+                saved_memory_usage      | (int)
+        """
+        return cls.__memory_report
 
-        return cls
+    @classmethod
+    def __sources(cls):
+        sources = [CSV]
+        if cls.__table_name in cache_manager or is_published(cls.__shared_dir):
+            sources.append(MEMORY)
+        if Path(cls.__hdf_file_dir).exists():
+            sources.append(HDF)
+        if cls.__partitioned_store is not None and cls.__partitioned_store.exists():
+            sources.append(PARTITIONS)
+        return sources
 
     @classmethod
-    def values(cls):
+    def __execute(cls, plan):
+        source = plan.choose_source(cls.__sources())
+
+        if source == PARTITIONS and (plan.has_index_predicates() or plan.columns is not None):
+            # Push the code and date predicates and the columns down to the partitions.
+            columns = plan.read_columns(list(cls.__partitioned_store.read(codes=[]).columns))
+            table = cls.__partitioned_store.read(codes=plan.codes, from_date=plan.from_date, to_date=plan.to_date,
+                                                 columns=columns)
+            return plan.execute(table)
+
+        table, offset_index = cls.__load()
+        return plan.execute(table, offset_index, cls.__get_hash_index(table))
+
+    @classmethod
+    def select(cls, lazy=False, columns=None):
+        """
+        The loaded table is shared by all queries. Do not modify the result of values() in place.
+
+        :param lazy: (boolean, default=False) If lazy is True, select() and where() only record a query plan,
+            and values() optimizes and executes it at once. It avoids an intermediate copy for each where().
+        :param columns: (list of string, default=None) Columns to select. If columns is None, select all columns.
+            If the table is partitioned and not loaded, only the columns are read from the partitions.
+
+        :return query: (Query) A new query of this table.
+        """
+        assert cls.__table_name is not None
+
+        if cls.__partitioned_store is not None:
+            cls.__build_partitions()
+        cls.__validate_results()
+
+        # If the table is partitioned, read only the partitions where() needs.
+        if lazy or (cls.__table_name not in cache_manager and not is_published(cls.__shared_dir)
+                    and cls.__partitioned_store is not None and cls.__partitioned_store.exists()):
+            return Query(cls.__table_name, cls.__execute, lazy=lazy, result_cache=cls.__result_cache,
+                         columns=columns)
+
+        table, offset_index = cls.__load()
+        return Query(cls.__table_name, cls.__execute, selected_table=table, offset_index=offset_index,
+                     hash_index=cls.__get_hash_index(table), result_cache=cls.__result_cache, columns=columns)
+
+    @classmethod
+    def select_windows(cls, windows, adjusted=True):
+        """
+        Select rows of many (code, from_date, to_date) windows in one pass. See table.query.take_windows.
+        If the table is partitioned and not loaded, only the partitions of the windows are read.
+
+        Example
+        -------
+        windows = pd.DataFrame({'code': ['KR7005930003', 'KR7000660001'],
+                                'from_date': [datetime(2017, 1, 2), datetime(2017, 3, 2)],
+                                'to_date': [datetime(2017, 1, 9), datetime(2017, 3, 9)]},
+                               index=pd.Index(['samsung_earnings', 'hynix_earnings'], name='event'))
+        stock_daily_prices = StockDailyPrice.instance().select_windows(windows)
+
+        :param windows: (DataFrame) Windows whose index is the id of each window.
+            columns     code        | (string)
+                        from_date   | (datetime)
+                        to_date     | (datetime)
+        :param adjusted: (boolean, default=True) If it is False, return raw prices instead of adjusted prices.
+
+        :return selected_table: (DataFrame) Rows of all windows indexed by (query_id, code, date).
+        """
+        assert cls.__table_name is not None
+        assert cls.__index is not None and len(cls.__index) == 2
+
+        if cls.__partitioned_store is not None:
+            cls.__build_partitions()
+
+        plan = QueryPlan().add(codes=windows['code'].values)
+        if windows['from_date'].notnull().all():
+            plan.add(from_date=windows['from_date'].min())
+        if windows['to_date'].notnull().all():
+            plan.add(to_date=windows['to_date'].max())
+
+        if not plan.is_empty and plan.choose_source(cls.__sources()) == PARTITIONS:
+            table = cls.__partitioned_store.read(codes=plan.codes, from_date=plan.from_date, to_date=plan.to_date)
+            offset_index = None
+        else:
+            table, offset_index = cls.__load()
+
+        return select_prices(take_windows(table, windows, offset_index), adjusted)
+
+    @classmethod
+    def __iterate_partitions(cls):
+        """
+        :return schema: (DataFrame) An empty table which has the dtypes of the whole table.
+        :return partitions: (iterable of DataFrame)
+        """
+        # Export partitions one by one instead of loading the whole table.
+        if cls.__table_name not in cache_manager and cls.__partitioned_store is not None:
+            cls.__build_partitions()
+            if cls.__partitioned_store.exists():
+                return cls.__partitioned_store.read(codes=[]), cls.__partitioned_store.iterate()
+
+        # The loaded table is written as it is, and write_parquet splits it into row groups.
+        table, _ = cls.__load()
+        return table.iloc[:0], [table]
+
+    @classmethod
+    def export_parquet(cls, file_dir=None):
+        """
+        Export this table as a Parquet file whose row groups have table.arrow.ROW_GROUP_SIZE rows.
+        Other tools can read only some columns and skip row groups by codes and dates. See table.arrow.read_parquet.
+        It needs pyarrow.
+
+        :param file_dir: (string, default=None) If it is None, DATA_DIR/<table name>.parquet
+
+        :return file_dir: (string)
+        """
+        assert cls.__table_name is not None
+
+        file_dir = file_dir or DATA_DIR + cls.__table_name + '.parquet'
+        schema, partitions = cls.__iterate_partitions()
+        write_parquet(partitions, file_dir, schema=schema)
+        print('Export {}.'.format(file_dir))
+        return file_dir
+
+    @classmethod
+    def export_arrow(cls, file_dir=None):
+        """
+        Export this table as an Arrow IPC file, which other processes can memory-map without deserialization.
+        See table.arrow.read_ipc. It needs pyarrow.
+
+        :param file_dir: (string, default=None) If it is None, DATA_DIR/<table name>.arrow
+
+        :return file_dir: (string)
+        """
+        assert cls.__table_name is not None
+
+        file_dir = file_dir or DATA_DIR + cls.__table_name + '.arrow'
+        schema, partitions = cls.__iterate_partitions()
+        write_ipc(partitions, file_dir, schema=schema)
+        print('Export {}.'.format(file_dir))
+        return file_dir
+
+    @classmethod
+    def lookup(cls, keys, by=None, columns=None):
+        """
+        Find rows of thousands of keys in one vectorized call.
+
+        Example
+        -------
+        stock_masters = StockMaster.instance().lookup(['005930', '000660'], by='short_code',
+                                                      columns=['code', 'company_name'])
+
+        :param keys: (array-like)
+        :param by: (string, default=None) A hash index column of the keys. If by is None, use the index.
+        :param columns: (list of string, default=None) Columns to get. If columns is None, get all columns.
+
+        :return rows: (DataFrame) The first row of each key in the order of the keys.
+            Columns of missing keys are NaN.
+        """
         assert cls.__table_name is not None
 
-        if cls.__selected_table is None:
-            raise ValueError('{}.__selected_table is None. Call select() first.'.format(cls.__table_name))
+        if by is None:
+            by = cls.__index[0]
+
+        table, _ = cls.__load()
+        hash_index = cls.__get_hash_index(table)
+        if hash_index is None or by not in hash_index:
+            raise ValueError("{} doesn't have a hash index of {}.".format(cls.__table_name, by))
 
-        # Reset __where_table to None.
-        where_table = cls.__selected_table
-        cls.__selected_table = None
-        return where_table
+        return hash_index.lookup(table, by, keys, columns)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 14.
+"""
+import threading
+from collections import OrderedDict
+
+# The default bytes which all cached tables and partitions can use together.
+DEFAULT_CACHE_MEMORY_BUDGET = 16 * 1024 * 1024 * 1024
+
+# The default bytes which cached query results of a table can use.
+DEFAULT_RESULT_CACHE_MEMORY_BUDGET = 1024 * 1024 * 1024
+
+
+class CacheManager:
+    """
+    A memory-budgeted LRU cache which is shared by all tables.
+    When the cached values exceed the memory budget, the least recently used values which are not pinned are evicted.
+
+    Example
+    -------
+    cache_manager.set_memory_budget(32 * 1024 * 1024 * 1024)
+    cache_manager.pin('stock_master')
+    print(cache_manager.stats())
+    """
+
+    def __init__(self, memory_budget=DEFAULT_CACHE_MEMORY_BUDGET):
+        self.__memory_budget = memory_budget
+        self.__values = OrderedDict()
+        self.__memory_usages = {}
+        self.__memory_usage = 0
+        self.__pinned_keys = set()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__lock = threading.RLock()
+
+    def get(self, key):
+        """
+        :return value: (object) The cached value of the key. If the key is not cached, None.
+        """
+        with self.__lock:
+            if key not in self.__values:
+                self.__misses += 1
+                return None
+
+            self.__hits += 1
+            self.__values.move_to_end(key)
+            return self.__values[key]
+
+    def peek(self, key):
+        """
+        Get the cached value without touching its recency and the counters.
+        """
+        with self.__lock:
+            return self.__values.get(key)
+
+    def __contains__(self, key):
+        with self.__lock:
+            return key in self.__values
+
+    def put(self, key, value, memory_usage):
+        """
+        Cache the value and evict values until they fit in the memory budget.
+        A value larger than the memory budget is not cached unless its key is pinned.
+
+        :param key: (hashable)
+        :param value: (object)
+        :param memory_usage: (int) The bytes of the value.
+        """
+        with self.__lock:
+            self.invalidate(key)
+
+            if memory_usage > self.__memory_budget and key not in self.__pinned_keys:
+                return
+
+            self.__values[key] = value
+            self.__memory_usages[key] = memory_usage
+            self.__memory_usage += memory_usage
+            self.__evict()
+
+    def invalidate(self, key):
+        with self.__lock:
+            if key in self.__values:
+                del self.__values[key]
+                self.__memory_usage -= self.__memory_usages.pop(key)
+
+    def invalidate_prefix(self, prefix):
+        """
+        Invalidate all string keys which start with the prefix.
+        """
+        with self.__lock:
+            for key in list(self.__values.keys()):
+                if isinstance(key, str) and key.startswith(prefix):
+                    self.invalidate(key)
+
+    def pin(self, key):
+        """
+        Never evict the value of the key. The key can be pinned before its value is cached.
+        """
+        with self.__lock:
+            self.__pinned_keys.add(key)
+
+    def unpin(self, key):
+        with self.__lock:
+            self.__pinned_keys.discard(key)
+            self.__evict()
+
+    def set_memory_budget(self, memory_budget):
+        with self.__lock:
+            self.__memory_budget = memory_budget
+            self.__evict()
+
+    def clear(self):
+        with self.__lock:
+            self.__values.clear()
+            self.__memory_usages.clear()
+            self.__memory_usage = 0
+
+    def stats(self):
+        """
+        :return stats: (dict)
+            hits            | (int) The number of get() which found a value.
+            misses          | (int) The number of get() which found no value.
+            evictions       | (int) The number of values evicted for the memory budget.
+            entries         | (int) The number of cached values.
+            memory_usage    | (int) The bytes of cached values.
+            memory_budget   | (int)
+            pinned_keys     | (list)
+        """
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'entries': len(self.__values),
+                'memory_usage': self.__memory_usage,
+                'memory_budget': self.__memory_budget,
+                'pinned_keys': list(self.__pinned_keys),
+            }
+
+    def __evict(self):
+        # Evict from the least recently used value.
+        for key in list(self.__values.keys()):
+            if self.__memory_usage <= self.__memory_budget:
+                break
+            if key in self.__pinned_keys:
+                continue
+
+            self.invalidate(key)
+            self.__evictions += 1
+
+
+# The cache manager which all tables share.
+cache_manager = CacheManager()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 8.
+"""
+import numpy as np
+import pandas as pd
+
+from table.adjustment import PRICE_COLUMNS
+
+VOLUME_COLUMNS = ['volume']
+DATE_LEVELS = ['date']
+
+# Convert string columns to categorical columns if they repeat at least this many times on average.
+CATEGORY_REPEAT_RATIO = 2
+CATEGORY = 'category'
+
+MEGA_BYTES = 1024 * 1024
+
+
+def get_memory_usage(table):
+    """
+    :param table: (DataFrame)
+
+    :return memory_usage: (int) The number of bytes of the table including its index and strings.
+    """
+    return int(table.memory_usage(index=True, deep=True).sum())
+
+
+def compact_table(table):
+    """
+    Convert the table to compact dtypes.
+        dates       | datetime64 instead of strings.
+        strings     | categories which share a dictionary of unique values.
+                      Levels of a MultiIndex already share a dictionary, so they are kept.
+        prices      | int32 if all prices are integers, otherwise float32.
+        volume      | uint32 if it fits, otherwise kept.
+
+    :param table: (DataFrame)
+
+    :return compacted_table: (DataFrame)
+    """
+    return cast_table(table, get_compact_dtypes(table))
+
+
+def get_compact_dtypes(table, dtypes=None, categories=True):
+    """
+    :param table: (DataFrame)
+    :param dtypes: (dict, default=None) Compact dtypes of other rows of the same table, like other partitions.
+        If it is not None, the dtypes fit both the table and the other rows.
+    :param categories: (boolean, default=True) If it is False, strings are kept.
+        Categories of partitions are different, so they are concatenated as strings.
+
+    :return dtypes: (dict) The compact dtype of each column. See compact_table.
+    """
+    compact_dtypes = {}
+    for column in table.columns:
+        if column in PRICE_COLUMNS:
+            dtype = _get_price_dtype(table[column].values)
+        elif column in VOLUME_COLUMNS:
+            dtype = _get_volume_dtype(table[column].values)
+        elif categories and table[column].dtype == object and _is_repeated(table[column]):
+            dtype = CATEGORY
+        else:
+            dtype = table[column].dtype
+
+        if dtypes is not None and column in dtypes:
+            dtype = _merge_dtypes(column, dtypes[column], dtype)
+        compact_dtypes[column] = dtype
+
+    return compact_dtypes
+
+
+def cast_table(table, dtypes):
+    """
+    :param table: (DataFrame)
+    :param dtypes: (dict) The dtype of each column. See get_compact_dtypes. Other columns are kept.
+
+    :return cast_table: (DataFrame) A copy of the table whose columns have the dtypes and whose dates are datetime64.
+    """
+    table = table.copy()
+    table.index = _compact_index(table.index)
+
+    for column, dtype in dtypes.items():
+        if column in table.columns and table[column].dtype != dtype:
+            table[column] = table[column].astype(dtype)
+
+    return table
+
+
+def _compact_index(index):
+    if isinstance(index, pd.MultiIndex):
+        levels = [pd.to_datetime(level) if name in DATE_LEVELS else level
+                  for name, level in zip(index.names, index.levels)]
+        return index.set_levels(levels)
+
+    if index.name in DATE_LEVELS:
+        return pd.DatetimeIndex(pd.to_datetime(index), name=index.name)
+
+    if index.dtype == object and _is_repeated(index):
+        return pd.CategoricalIndex(index, name=index.name)
+
+    return index
+
+
+def _get_price_dtype(values):
+    info = np.iinfo(np.int32)
+    if np.all(np.isfinite(values)) and np.all(np.mod(values, 1) == 0) \
+            and (len(values) == 0 or info.min <= values.min() and values.max() <= info.max):
+        return np.dtype(np.int32)
+    return np.dtype(np.float32)
+
+
+def _get_volume_dtype(values):
+    info = np.iinfo(np.uint32)
+    if not np.all(np.isfinite(values)):
+        return values.dtype
+    if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+        return np.dtype(np.uint32)
+    return values.dtype
+
+
+def _merge_dtypes(column, dtype, other_dtype):
+    if dtype == other_dtype:
+        return dtype
+
+    # Categories of strings are only kept if both of them are categories.
+    if CATEGORY in (dtype, other_dtype):
+        return np.dtype(object)
+
+    # Integer prices of one and float prices of the other are float32, not float64.
+    if column in PRICE_COLUMNS:
+        return np.dtype(np.float32)
+
+    return np.result_type(dtype, other_dtype)
+
+
+def _is_repeated(column):
+    return len(column) >= CATEGORY_REPEAT_RATIO * column.nunique()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 21.
+"""
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Seconds to wait before retrying a lock on Windows.
+RETRY_INTERVAL = 0.1
+
+
+class FileLock:
+    """
+    A re-entrant lock which is shared by threads and by processes.
+    Threads wait for each other on a thread lock, and processes wait for each other on a lock of the file.
+    The operating system releases the file lock when a process dies, so a crashed build never blocks others.
+
+    Example
+    -------
+    with FileLock(DATA_DIR + 'stock_master.lock'):
+        build_stock_master()
+    """
+
+    def __init__(self, file_dir):
+        """
+        :param file_dir: (string) The lock file. It is created if it does not exist, and never removed.
+        """
+        self.file_dir = file_dir
+        self.__thread_lock = threading.RLock()
+        self.__depth = 0
+        self.__file = None
+
+    def acquire(self):
+        self.__thread_lock.acquire()
+        try:
+            if self.__depth == 0:
+                self.__lock_file()
+        except BaseException:
+            self.__thread_lock.release()
+            raise
+        self.__depth += 1
+
+    def release(self):
+        self.__depth -= 1
+        if self.__depth == 0:
+            self.__unlock_file()
+        self.__thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def __lock_file(self):
+        os.makedirs(os.path.dirname(self.file_dir) or '.', exist_ok=True)
+        self.__file = open(self.file_dir, 'a+b')
+
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.__file.fileno(), fcntl.LOCK_EX)
+            else:
+                # msvcrt.locking() gives up after 10 seconds, so retry until the lock is released.
+                self.__file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.__file.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(RETRY_INTERVAL)
+        except BaseException:
+            self.__file.close()
+            self.__file = None
+            raise
+
+    def __unlock_file(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.__file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.__file.seek(0)
+                msvcrt.locking(self.__file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.__file.close()
+            self.__file = None
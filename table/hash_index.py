@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 23.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+
+class HashIndex:
+    """
+    Hash tables from values of key columns to row positions of a table.
+    Each key column is kept as a pandas Index, whose hash table is built at the first lookup and reused.
+
+    Example
+    -------
+    hash_index = HashIndex(stock_masters, ['code', 'short_code', 'company_name'])
+    positions = hash_index.get_positions('short_code', ['005930'])
+    stock_masters = hash_index.lookup(stock_masters, 'short_code', short_codes, columns=['code', 'company_name'])
+    """
+
+    def __init__(self, table, columns):
+        """
+        :param table: (DataFrame)
+        :param columns: (list of string) Key columns or index levels of the table.
+        """
+        self.__length = len(table)
+        self.__indexes = {}
+        self.__first_positions = {}
+        for column in columns:
+            if column in table.index.names:
+                values = table.index.get_level_values(column)
+            else:
+                values = table[column].values
+            self.__indexes[column] = pd.Index(values, name=column)
+
+    def __len__(self):
+        return self.__length
+
+    def __contains__(self, column):
+        return column in self.__indexes
+
+    def get_positions(self, column, keys):
+        """
+        :param column: (string)
+        :param keys: (array-like)
+
+        :return positions: (ndarray of int64) Sorted positions of all rows which have one of the keys.
+        """
+        index = self.__indexes[column]
+        if index.is_unique:
+            positions = index.get_indexer(keys)
+        else:
+            positions, _ = index.get_indexer_non_unique(keys)
+        return np.unique(positions[positions >= 0])
+
+    def get_first_positions(self, column, keys):
+        """
+        :param column: (string)
+        :param keys: (array-like)
+
+        :return positions: (ndarray of int64) The position of the first row of each key. -1 if a key is not found.
+        """
+        index = self.__indexes[column]
+        if index.is_unique:
+            return index.get_indexer(keys)
+
+        if column not in self.__first_positions:
+            is_first = ~index.duplicated()
+            self.__first_positions[column] = np.flatnonzero(is_first), index[is_first]
+        first_positions, unique_index = self.__first_positions[column]
+
+        positions = unique_index.get_indexer(keys)
+        return np.where(positions >= 0, first_positions[positions], -1)
+
+    def lookup(self, table, column, keys, columns=None):
+        """
+        Find the first row of each key at once.
+
+        :param table: (DataFrame) The table which this index is built from.
+        :param column: (string) A key column of this index.
+        :param keys: (array-like)
+        :param columns: (list of string, default=None) Columns or index levels to get.
+            If columns is None, get all of them except the key column.
+
+        :return rows: (DataFrame) Rows in the order of the keys. Columns of missing keys are NaN.
+            index       key column  | The keys.
+        """
+        if len(table) != self.__length:
+            raise ValueError("The table doesn't match the hash index.")
+
+        if columns is None:
+            columns = [name for name in list(table.index.names) + list(table.columns) if name != column]
+
+        positions = self.get_first_positions(column, keys)
+
+        rows = {}
+        for name in columns:
+            if name in table.index.names:
+                values = table.index.get_level_values(name).values
+            else:
+                values = table[name].values
+            rows[name] = take(values, positions, allow_fill=True)
+
+        return pd.DataFrame(rows, index=pd.Index(keys, name=column), columns=columns)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 12.
+"""
+import shutil
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+
+from table.atomic_file import atomic_write
+
+# The default bytes which a chunk of csv can use while it is ingested.
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+
+# Parsing, transforming and splitting a chunk make a few copies of it.
+CHUNK_MEMORY_MULTIPLIER = 4
+
+# The number of rows to estimate the bytes of a row.
+SAMPLE_ROWS = 10000
+
+MIN_CHUNK_SIZE = 1000
+
+
+def download_csv(csv_file_remote_address, csv_file_dir):
+    """
+    Download a csv file to the disk without holding it in memory.
+
+    :param csv_file_remote_address: (string)
+    :param csv_file_dir: (string)
+    """
+    with atomic_write(csv_file_dir) as temp_file_dir:
+        with urlopen(csv_file_remote_address) as response, open(temp_file_dir, 'wb') as f:
+            shutil.copyfileobj(response, f)
+    print('Download {} from {}.'.format(csv_file_dir, csv_file_remote_address))
+
+
+def get_chunk_size(csv_file_dir, memory_budget, parse_dates=None):
+    """
+    Estimate the number of rows in a chunk which fits in the memory budget.
+
+    :param csv_file_dir: (string)
+    :param memory_budget: (int) Bytes.
+    :param parse_dates: (list of string, default=None)
+
+    :return chunk_size: (int)
+    """
+    sample = pd.read_csv(csv_file_dir, parse_dates=parse_dates, nrows=SAMPLE_ROWS, encoding='utf-8')
+    if len(sample) == 0:
+        return MIN_CHUNK_SIZE
+
+    row_memory_usage = sample.memory_usage(index=True, deep=True).sum() / len(sample)
+    return max(MIN_CHUNK_SIZE, int(memory_budget / (row_memory_usage * CHUNK_MEMORY_MULTIPLIER)))
+
+
+def get_common_dtypes(dtypes, table):
+    """
+    :param dtypes: (dict) The dtypes of columns of other rows. If it is None, use the dtypes of the table.
+    :param table: (DataFrame)
+
+    :return common_dtypes: (dict) The dtype of each column which can have both the rows and the table.
+    """
+    if dtypes is None:
+        return dict(table.dtypes)
+
+    common_dtypes = {}
+    for column, dtype in table.dtypes.items():
+        try:
+            common_dtypes[column] = np.result_type(dtypes[column], dtype)
+        except TypeError:
+            # Dates and numbers of a column which is blank in some rows are kept as objects.
+            common_dtypes[column] = np.dtype(object)
+    return common_dtypes
+
+
+def ingest_csv(csv_file_dir, partitioned_store, index, memory_budget=DEFAULT_MEMORY_BUDGET, parse_dates=None,
+               transform=None, partition_transform=None):
+    """
+    Stream a csv file into a partitioned store in chunks which fit in the memory budget.
+    Each chunk is appended to partitions, and each partition is sorted and checked for duplicated keys at last.
+    So the peak memory is about a chunk or a partition, not the whole table.
+
+    :param csv_file_dir: (string)
+    :param partitioned_store: (PartitionedStore)
+    :param index: (list of string) Columns to set as the index. ['code', 'date']
+    :param memory_budget: (int, default=DEFAULT_MEMORY_BUDGET) Bytes which a chunk can use.
+    :param parse_dates: (list of string, default=None)
+    :param transform: (function, default=None) A function which is applied to each chunk before setting index.
+    :param partition_transform: (function, default=None) A function which is applied to each sorted partition
+        in the order of code and date, for a transform which needs all earlier rows of a code.
+    """
+    chunk_size = get_chunk_size(csv_file_dir, memory_budget, parse_dates=parse_dates)
+
+    # Remove partitions of a broken ingestion.
+    partitioned_store.clear()
+
+    partition_dirs = set()
+    dtypes = None
+    chunk = None
+    for chunk in pd.read_csv(csv_file_dir, parse_dates=parse_dates, encoding='utf-8', chunksize=chunk_size):
+        if transform is not None:
+            chunk = transform(chunk)
+        chunk = chunk.set_index(index)
+
+        # Dtypes of each chunk are inferred from its own rows, but rows of a partition should have the same ones.
+        # So a chunk is cast to the dtypes of earlier chunks, which are widened if the chunk does not fit them,
+        # like integers of a column which has a blank in the chunk.
+        chunk_dtypes = get_common_dtypes(dtypes, chunk)
+        if dtypes is not None and chunk_dtypes != dtypes:
+            partitioned_store.rewrite(lambda partition: partition.astype(chunk_dtypes))
+        dtypes = chunk_dtypes
+        partition_dirs.update(partitioned_store.append(chunk.astype(dtypes)))
+
+    if chunk is None:
+        raise ValueError('{} is empty.'.format(csv_file_dir))
+
+    partitioned_store.sort_partitions(partition_dirs, transform=partition_transform)
+
+    # The schema marks that the store is complete.
+    schema = chunk.iloc[:0]
+    if partition_transform is not None:
+        schema = partition_transform(schema)
+    partitioned_store.write_schema(schema)
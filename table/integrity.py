@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 25.
+"""
+import numpy as np
+import pandas as pd
+
+# The number of offending keys in a report.
+MAX_REPORTED_KEYS = 10
+
+
+def _get_ranks(index):
+    """
+    :return ranks: (list of ndarray) The rank of the value of each row in each level.
+        Comparing ranks is the same as comparing values, but it needs no python objects.
+    """
+    if not isinstance(index, pd.MultiIndex):
+        ranks, _ = pd.factorize(index, sort=True)
+        return [ranks]
+
+    ranks = []
+    for level, codes in zip(index.levels, index.codes):
+        level_ranks = np.empty(len(level), dtype=np.int64)
+        level_ranks[np.argsort(np.asarray(level), kind='mergesort')] = np.arange(len(level))
+        ranks.append(level_ranks[np.asarray(codes)])
+    return ranks
+
+
+def check_index(index, max_keys=MAX_REPORTED_KEYS):
+    """
+    Check the index of a table is sorted and unique by comparing adjacent keys.
+    If the index is sorted, duplicated keys are adjacent, so no hash table is needed.
+
+    :param index: (Index or MultiIndex)
+    :param max_keys: (int, default=MAX_REPORTED_KEYS) The max number of offending keys to report.
+
+    :return report: (dict)
+        is_monotonic        | (boolean) True if keys are sorted in ascending order.
+        is_unique           | (boolean) True if there is no duplicated key.
+        unsorted_keys       | (list) Keys which are smaller than their previous keys.
+        duplicated_keys     | (list) Keys which are the same as one of their previous keys.
+    """
+    ranks = _get_ranks(index)
+
+    is_less = np.zeros(max(len(index) - 1, 0), dtype=bool)
+    is_equal = np.ones(max(len(index) - 1, 0), dtype=bool)
+    for level_ranks in ranks:
+        is_less |= is_equal & (level_ranks[1:] < level_ranks[:-1])
+        is_equal &= level_ranks[1:] == level_ranks[:-1]
+
+    unsorted_positions = np.flatnonzero(is_less) + 1
+    is_monotonic = len(unsorted_positions) == 0
+    if is_monotonic:
+        duplicated_positions = np.flatnonzero(is_equal) + 1
+    else:
+        duplicated_positions = np.flatnonzero(index.duplicated())
+
+    return {
+        'is_monotonic': is_monotonic,
+        'is_unique': len(duplicated_positions) == 0,
+        'unsorted_keys': list(index[unsorted_positions[:max_keys]]),
+        'duplicated_keys': list(index[duplicated_positions[:max_keys]]),
+    }
+
+
+def validate_index(index, name):
+    """
+    :param index: (Index or MultiIndex)
+    :param name: (string) The name of the table to report.
+
+    :return report: (dict) See check_index.
+    """
+    report = check_index(index)
+    if not report['is_unique']:
+        raise KeyError("{} has some duplicated keys. {}".format(name, report['duplicated_keys']))
+    return report
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 21.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from table.atomic_file import atomic_write
+
+# Bytes to read at once when a checksum is calculated.
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def get_checksum(file_dir):
+    """
+    :return checksum: (string) The md5 hex digest of the file, which is read in blocks.
+    """
+    md5 = hashlib.md5()
+    with open(file_dir, 'rb') as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK_SIZE), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def get_file_metadata(file_dir):
+    """
+    :param file_dir: (string) A source file of a cache.
+
+    :return metadata: (dict)
+        mtime       | (float) The modified time of the file.
+        size        | (int) The bytes of the file.
+        checksum    | (string) The md5 hex digest of the file.
+    """
+    stat = os.stat(file_dir)
+    return {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'checksum': get_checksum(file_dir),
+    }
+
+
+def read_metadata(metadata_file_dir):
+    """
+    :return metadata: (dict) It is None if the metadata file does not exist or is broken.
+    """
+    if not Path(metadata_file_dir).exists():
+        return None
+
+    try:
+        with open(metadata_file_dir, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def write_metadata(metadata_file_dir, metadata):
+    with atomic_write(metadata_file_dir) as temp_file_dir:
+        with open(temp_file_dir, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+
+
+def is_fresh(metadata, file_dir):
+    """
+    Check the file is the source which the metadata is made from.
+    The checksum is calculated only when the modified time or the size is changed,
+    so a file which is downloaded again with the same contents is still fresh.
+
+    :param metadata: (dict) The metadata which get_file_metadata() made.
+    :param file_dir: (string)
+
+    :return fresh: (boolean)
+    """
+    stat = os.stat(file_dir)
+    if stat.st_mtime == metadata.get('mtime') and stat.st_size == metadata.get('size'):
+        return True
+
+    return stat.st_size == metadata.get('size') and get_checksum(file_dir) == metadata.get('checksum')
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 10.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def to_nanoseconds(date):
+    return pd.Timestamp(date).value
+
+
+class OffsetIndex:
+    """
+    Row offsets of each code and sorted dates of a table sorted by (code, date).
+    It finds the rows of codes from a date to a date by binary search without scanning the index.
+
+    Example
+    -------
+    offset_index = OffsetIndex.from_index(stock_minute_prices.index)
+    ranges = offset_index.locate(['KR7005930003'], datetime(2017, 1, 1), datetime(2017, 1, 8, 23, 59, 59))
+    """
+
+    def __init__(self, codes, starts, ends, dates):
+        """
+        :param codes: (ndarray of string) Sorted unique codes.
+        :param starts: (ndarray of int64) The first row of each code.
+        :param ends: (ndarray of int64) The next row of the last row of each code.
+        :param dates: (ndarray of int64) Nanoseconds of the date of each row.
+        """
+        self.codes = codes
+        self.starts = starts
+        self.ends = ends
+        self.dates = dates
+        self.__positions = {code: i for i, code in enumerate(codes)}
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.starts.nbytes + self.ends.nbytes + self.dates.nbytes
+
+    @classmethod
+    def from_index(cls, index):
+        """
+        :param index: (MultiIndex) A (code, date) index sorted by code and date.
+
+        :return offset_index: (OffsetIndex)
+        """
+        code_labels = np.asarray(index.codes[0])
+        dates = pd.to_datetime(index.levels[1]).values.astype(np.int64)[np.asarray(index.codes[1])]
+
+        # Rows of a code are contiguous because the index is sorted.
+        starts = np.flatnonzero(np.diff(code_labels, prepend=-1)).astype(np.int64)
+        ends = np.append(starts[1:], len(code_labels)).astype(np.int64)
+        codes = np.asarray(index.levels[0][code_labels[starts]], dtype=str)
+
+        return cls(codes, starts, ends, dates)
+
+    def save(self, file_dir):
+        # np.savez adds .npz to a file name without it.
+        with open(file_dir, 'wb') as f:
+            np.savez(f, codes=self.codes, starts=self.starts, ends=self.ends, dates=self.dates)
+
+    @classmethod
+    def load(cls, file_dir):
+        if not Path(file_dir).exists():
+            return None
+
+        with np.load(file_dir) as arrays:
+            return cls(arrays['codes'], arrays['starts'], arrays['ends'], arrays['dates'])
+
+    def locate(self, codes=None, from_date=None, to_date=None):
+        """
+        Find rows of codes from from_date to to_date.
+
+        :param codes: (array-like, default=None) If codes is None, use all codes.
+        :param from_date: (datetime, default=None) Inclusive.
+        :param to_date: (datetime, default=None) Inclusive.
+
+        :return ranges: (list of tuple) Sorted and contiguous (start, stop) row ranges.
+        """
+        if codes is None:
+            positions = range(len(self.codes))
+        else:
+            positions = sorted(self.__positions[code] for code in set(codes) if code in self.__positions)
+
+        from_date = to_nanoseconds(from_date) if from_date is not None else None
+        to_date = to_nanoseconds(to_date) if to_date is not None else None
+
+        ranges = []
+        for position in positions:
+            start, stop = self.starts[position], self.ends[position]
+            code_dates = self.dates[start:stop]
+
+            # Dates of a code are sorted, so binary search them.
+            lower = np.searchsorted(code_dates, from_date, side='left') if from_date is not None else 0
+            upper = np.searchsorted(code_dates, to_date, side='right') if to_date is not None else len(code_dates)
+
+            if lower < upper:
+                ranges.append((int(start + lower), int(start + upper)))
+
+        return ranges
+
+    def locate_windows(self, codes, from_dates, to_dates):
+        """
+        Find rows of many (code, from_date, to_date) windows at once.
+        Windows are grouped by code, and the bounds of each group are searched in the dates of the code in one call.
+
+        :param codes: (array-like)
+        :param from_dates: (array-like of datetime) Inclusive. NaT means no lower bound.
+        :param to_dates: (array-like of datetime) Inclusive. NaT means no upper bound.
+
+        :return starts: (ndarray of int64) The first row of each window.
+        :return stops: (ndarray of int64) The next row of the last row of each window. It is start if it is empty.
+        """
+        positions = pd.Index(self.codes).get_indexer(np.asarray(codes, dtype=str))
+        from_dates = pd.to_datetime(from_dates).values.astype(np.int64)
+        to_dates = pd.DatetimeIndex(pd.to_datetime(to_dates))
+        to_dates = np.where(to_dates.isnull(), np.iinfo(np.int64).max, to_dates.values.astype(np.int64))
+
+        starts = np.zeros(len(positions), dtype=np.int64)
+        stops = np.zeros(len(positions), dtype=np.int64)
+
+        order = np.argsort(positions, kind='mergesort')
+        sorted_positions = positions[order]
+        boundaries = np.flatnonzero(np.diff(sorted_positions)) + 1
+        for group in np.split(order, boundaries):
+            if len(group) == 0 or positions[group[0]] < 0:
+                continue
+
+            position = positions[group[0]]
+
+            start, stop = self.starts[position], self.ends[position]
+            code_dates = self.dates[start:stop]
+            starts[group] = start + np.searchsorted(code_dates, from_dates[group], side='left')
+            stops[group] = start + np.searchsorted(code_dates, to_dates[group], side='right')
+
+        return starts, np.maximum(starts, stops)
+
+    def take(self, table, codes=None, from_date=None, to_date=None):
+        """
+        Get rows of the table which this index is built from.
+        One contiguous range is sliced without copying the index.
+
+        :param table: (DataFrame)
+
+        :return selected_table: (DataFrame)
+        """
+        ranges = self.locate(codes, from_date, to_date)
+
+        if len(ranges) == 0:
+            return table.iloc[:0]
+
+        if len(ranges) == 1:
+            start, stop = ranges[0]
+            return table.iloc[start:stop]
+
+        return table.iloc[np.concatenate([np.arange(start, stop) for start, stop in ranges])]
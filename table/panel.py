@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 20.
+"""
+import numpy as np
+import pandas as pd
+
+from table.adjustment import get_factors, is_adjustment_column, PRICE_COLUMNS, ADJUSTMENT_FACTOR
+
+
+class Panel:
+    """
+    A dense (code, date, field) array of a table whose index is (code, date).
+
+    Example
+    -------
+    panel = StockDailyPrice.instance().select().where(from_date=datetime(2017, 1, 1)).to_panel(['close', 'volume'])
+    closes = panel.values[:, :, panel.fields.index('close')]
+    """
+
+    def __init__(self, values, mask, codes, dates, fields):
+        """
+        :param values: (ndarray of float32) A C-contiguous array whose shape is (n_codes, n_dates, n_fields).
+            Missing (code, date) cells are NaN.
+        :param mask: (ndarray of boolean) True if the table has the (code, date) row. Its shape is (n_codes, n_dates).
+        :param codes: (ndarray of string) Sorted codes of the first axis.
+        :param dates: (DatetimeIndex) Sorted dates of the second axis.
+        :param fields: (list of string) Fields of the third axis.
+        """
+        self.values = values
+        self.mask = mask
+        self.codes = codes
+        self.dates = dates
+        self.fields = fields
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+
+def _get_positions(index, level):
+    """
+    Sort the used values of a level and find the position of each row in them.
+    Only the level values are sorted, so it is linear in the number of rows.
+
+    :return axis: (ndarray) Sorted unique values of the level which the rows use.
+    :return positions: (ndarray of int64) The position of each row in the axis.
+    """
+    level_codes = np.asarray(index.codes[level])
+    level_values = index.levels[level]
+    if level == 1:
+        # The date level can be strings when the table is loaded without parse_dates.
+        level_values = pd.to_datetime(level_values).values
+    else:
+        level_values = np.asarray(level_values, dtype=str)
+
+    is_used = np.bincount(level_codes, minlength=len(level_values)) > 0
+    axis, level_positions = np.unique(level_values[is_used], return_inverse=True)
+
+    positions = np.full(len(level_values), -1, dtype=np.int64)
+    positions[is_used] = level_positions
+    return axis, positions[level_codes]
+
+
+def to_panel(table, fields=None, adjusted=True):
+    """
+    Scatter rows of a table into a dense panel in one pass, without unstack().
+
+    :param table: (DataFrame) A table whose index is (code, date).
+    :param fields: (list of string, default=None) Numeric columns of the panel.
+        If fields is None, use all numeric columns except adj_factor and listed_stocks_number.
+    :param adjusted: (boolean, default=True) If it is False, restore raw prices by adj_factor of the table.
+
+    :return panel: (Panel)
+    """
+    if fields is None:
+        fields = [column for column in table.columns
+                  if not is_adjustment_column(column) and pd.api.types.is_numeric_dtype(table[column])]
+    fields = list(fields)
+
+    codes, code_positions = _get_positions(table.index, 0)
+    dates, date_positions = _get_positions(table.index, 1)
+
+    values = np.full((len(codes), len(dates), len(fields)), np.nan, dtype=np.float32)
+    for i, field in enumerate(fields):
+        field_values = table[field].values
+        if not adjusted and field in PRICE_COLUMNS and ADJUSTMENT_FACTOR in table.columns:
+            field_values = field_values / get_factors(table, field).values
+        values[code_positions, date_positions, i] = field_values
+
+    mask = np.zeros((len(codes), len(dates)), dtype=bool)
+    mask[code_positions, date_positions] = True
+
+    return Panel(values, mask, codes, pd.DatetimeIndex(dates), fields)
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 3.
+"""
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from table.atomic_file import atomic_write
+from table.cache import cache_manager
+from table.dtypes import get_memory_usage, cast_table
+from table.integrity import validate_index
+from table.query import DATE_FORMAT, DATETIME_FORMAT
+
+# The strftime format of a partition name for each partition frequency.
+PARTITION_FORMATS = {
+    'year': '%Y',
+    'month': '%Y-%m',
+}
+
+PARTITION_SUFFIX = '.h5'
+
+# Partitions are in the table format, so rows can be appended to them.
+PARTITION_FORMAT = 'table'
+
+# An empty frame which has the columns and the index of the table.
+# It is written at last, so it also marks that the store is complete.
+SCHEMA_FILE_NAME = '_schema.h5'
+
+# Codes which are queried by where() of a partition. Rows of more codes are filtered after the partition is read.
+MAX_QUERY_CODES = 30
+
+# A random token which is replaced on every write, so readers of any process can tell the store is changed.
+VERSION_FILE_NAME = '_version'
+
+
+class PartitionedStore:
+    """
+    A directory of hdf files which are split by the period of date. A partition has rows of all codes
+    in the period sorted by (code, date), and its code and date are data columns which where() of hdf can query.
+    So a query of a few codes reads only their rows, and a query of dates opens only the partitions of the dates.
+    Partitions which are read as a whole are cached in the cache manager by their paths.
+
+    Example
+    -------
+    data/stock_daily_price/_schema.h5
+    data/stock_daily_price/2016.h5
+    data/stock_daily_price/2017.h5
+    """
+
+    def __init__(self, root_dir, partition_freq):
+        """
+        :param root_dir: (string) The directory of the store. It ends with '/'.
+        :param partition_freq: (string) 'year' or 'month'.
+        """
+        if partition_freq not in PARTITION_FORMATS:
+            raise ValueError('partition_freq should be one of {}, not {}.'.format(list(PARTITION_FORMATS.keys()),
+                                                                                 partition_freq))
+        self.root_dir = root_dir
+        self.partition_format = PARTITION_FORMATS[partition_freq]
+        self.schema_file_dir = root_dir + SCHEMA_FILE_NAME
+        self.version_file_dir = root_dir + VERSION_FILE_NAME
+
+    def exists(self):
+        return Path(self.schema_file_dir).exists()
+
+    def is_split_by_code(self):
+        """
+        :return is_split_by_code: (boolean) True if the store has directories of codes of an old version.
+            See split_by_period.
+        """
+        return Path(self.root_dir).exists() and any(path.is_dir() for path in Path(self.root_dir).iterdir())
+
+    def split_by_period(self):
+        """
+        Move rows of partitions which an old version split by code into partitions of periods.
+        Partitions of a code are moved one by one, so the peak memory is about a partition of a period.
+        The schema is removed first, so the store is built again if the move is broken.
+        """
+        schema = pd.read_hdf(self.schema_file_dir, 'table', encoding='utf-8')
+        os.remove(self.schema_file_dir)
+
+        # Partitions of codes can have different dtypes, but rows of a period should have the same ones.
+        old_partition_dirs = sorted(str(path) for path in Path(self.root_dir).glob('*/*' + PARTITION_SUFFIX))
+        dtypes = dict(schema.dtypes)
+        for partition_dir in old_partition_dirs:
+            first_row = pd.read_hdf(partition_dir, 'table', stop=1, encoding='utf-8')
+            dtypes = {column: np.result_type(dtype, first_row[column].dtype) for column, dtype in dtypes.items()}
+
+        partition_dirs = set()
+        for partition_dir in old_partition_dirs:
+            partition = pd.read_hdf(partition_dir, 'table', encoding='utf-8')
+            partition_dirs.update(self.append(partition.astype(dtypes)))
+        for path in Path(self.root_dir).iterdir():
+            if path.is_dir():
+                shutil.rmtree(str(path))
+        cache_manager.invalidate_prefix(self.root_dir)
+
+        self.sort_partitions(partition_dirs)
+        self.write_schema(schema.astype(dtypes))
+
+    def version(self):
+        """
+        :return version: (string) A token which changes whenever partitions are written. None if the store is empty.
+        """
+        try:
+            with open(self.version_file_dir, 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def __update_version(self):
+        os.makedirs(self.root_dir, exist_ok=True)
+        with atomic_write(self.version_file_dir) as temp_file_dir:
+            with open(temp_file_dir, 'w') as f:
+                f.write(uuid.uuid4().hex)
+
+    def write(self, table):
+        """
+        Split the table by the period of date, and write each piece as a partition.
+
+        :param table: (DataFrame) A table whose index is (code, date).
+        """
+        for partition_dir, partition in self.__split(table):
+            partition.to_hdf(partition_dir, key='table', mode='w', format=PARTITION_FORMAT, encoding='utf-8')
+            cache_manager.invalidate(partition_dir)
+
+        self.write_schema(table)
+
+    def append(self, table):
+        """
+        Append rows of the table to the partitions without sorting them. Call sort_partitions() after all appends.
+
+        :param table: (DataFrame) A table whose index is (code, date).
+
+        :return partition_dirs: (list of string) The paths of partitions which the rows are appended to.
+        """
+        partition_dirs = []
+        for partition_dir, partition in self.__split(table):
+            partition.to_hdf(partition_dir, key='table', mode='a', format=PARTITION_FORMAT, append=True,
+                             encoding='utf-8')
+            cache_manager.invalidate(partition_dir)
+            partition_dirs.append(partition_dir)
+        self.__update_version()
+
+        return partition_dirs
+
+    def merge(self, table):
+        """
+        Merge rows of the table into the partitions. Rows replace old rows which have the same keys.
+        Only the partitions of the periods which the rows belong to are read and rewritten.
+
+        :param table: (DataFrame) A table whose index is (code, date).
+
+        :return partition_dirs: (list of string) The paths of partitions which the rows are merged into.
+        """
+        # Rows of new periods have the dates of the latest partition.
+        paths = self.partition_paths()
+        latest_partition = pd.read_hdf(paths[-1], 'table', encoding='utf-8', start=0, stop=1) if paths else None
+
+        partition_dirs = []
+        for partition_dir, partition in self.__split(table):
+            if Path(partition_dir).exists():
+                old_partition = pd.read_hdf(partition_dir, 'table', encoding='utf-8')
+                partition = pd.concat([old_partition, _match_dates(partition, old_partition)])
+                partition = partition.loc[~partition.index.duplicated(keep='last')]
+            elif latest_partition is not None:
+                partition = _match_dates(partition, latest_partition)
+
+            partition = partition.sort_index()
+            partition.to_hdf(partition_dir, key='table', mode='w', format=PARTITION_FORMAT, encoding='utf-8')
+            cache_manager.invalidate(partition_dir)
+            partition_dirs.append(partition_dir)
+        self.__update_version()
+
+        return partition_dirs
+
+    def sort_partitions(self, partition_dirs, transform=None):
+        """
+        Sort each partition by its index and check it has no duplicated keys.
+        The partition of a key is decided by the key, so checking each partition is enough for the whole store.
+
+        :param partition_dirs: (array-like) The paths of partitions.
+        :param transform: (function, default=None) A function which is applied to each sorted partition
+            in the order of periods, so it gets rows of each code in the order of date.
+        """
+        for partition_dir in sorted(set(partition_dirs)):
+            partition = pd.read_hdf(partition_dir, 'table', encoding='utf-8')
+
+            report = validate_index(partition.index, partition_dir)
+            if not report['is_monotonic'] or transform is not None:
+                partition = partition.sort_index()
+                if transform is not None:
+                    partition = transform(partition)
+                partition.to_hdf(partition_dir, key='table', mode='w', format=PARTITION_FORMAT, encoding='utf-8')
+                cache_manager.invalidate(partition_dir)
+        self.__update_version()
+
+    def rewrite(self, function, to_date=None, reverse=False):
+        """
+        Apply the function to each partition and write the partitions which it changed.
+
+        :param function: (function) A function which gets a partition and returns a new one,
+            or None if the partition is not changed.
+        :param to_date: (datetime, default=None) Only partitions which can have rows until to_date are given.
+        :param reverse: (boolean, default=False) If it is True, give partitions in the reverse order of periods.
+        """
+        partition_dirs = self.partition_paths(to_date=to_date)
+        for partition_dir in reversed(partition_dirs) if reverse else partition_dirs:
+            partition = function(pd.read_hdf(partition_dir, 'table', encoding='utf-8'))
+            if partition is not None:
+                partition.to_hdf(partition_dir, key='table', mode='w', format=PARTITION_FORMAT, encoding='utf-8')
+                cache_manager.invalidate(partition_dir)
+        self.__update_version()
+
+    def cast(self, dtypes):
+        """
+        Cast the columns of every partition and of the schema to the dtypes, so partitions are stored in them
+        and reads do not cast them again. Partitions which already have the dtypes are not rewritten.
+
+        :param dtypes: (dict) The dtype of each column. See table.dtypes.get_compact_dtypes.
+
+        :return memory_usage: (int) The bytes of all partitions before they are cast.
+        :return cast_memory_usage: (int) The bytes of all partitions after they are cast.
+        """
+        memory_usage = 0
+        cast_memory_usage = 0
+
+        def cast_partition(partition):
+            nonlocal memory_usage, cast_memory_usage
+            cast_partition = cast_table(partition, dtypes)
+            memory_usage += get_memory_usage(partition)
+            cast_memory_usage += get_memory_usage(cast_partition)
+            if cast_partition.dtypes.equals(partition.dtypes) \
+                    and cast_partition.index.levels[1].dtype == partition.index.levels[1].dtype:
+                return None
+            return cast_partition
+
+        self.rewrite(cast_partition)
+        self.write_schema(cast_table(pd.read_hdf(self.schema_file_dir, 'table', encoding='utf-8'), dtypes))
+        return memory_usage, cast_memory_usage
+
+    def write_schema(self, table):
+        os.makedirs(self.root_dir, exist_ok=True)
+        table.iloc[:0].to_hdf(self.schema_file_dir, key='table', mode='w', encoding='utf-8')
+        self.__update_version()
+
+    def clear(self):
+        if Path(self.root_dir).exists():
+            shutil.rmtree(self.root_dir)
+        cache_manager.invalidate_prefix(self.root_dir)
+
+    def __split(self, table):
+        os.makedirs(self.root_dir, exist_ok=True)
+
+        # The date level can be strings when the table is loaded without parse_dates.
+        dates = pd.to_datetime(table.index.get_level_values('date'))
+        periods = dates.strftime(self.partition_format)
+        for period, partition in table.groupby(periods, sort=False):
+            yield self.root_dir + period + PARTITION_SUFFIX, partition
+
+    def last_rows(self, codes, before=None):
+        """
+        :param codes: (array-like)
+        :param before: (datetime, default=None) If it is not None, find the last rows before it.
+
+        :return last_rows: (DataFrame) The last row of each code which is in the store, sorted by code.
+        """
+        codes = set(codes)
+        last_rows = []
+        for path in reversed(self.partition_paths(to_date=before)):
+            if len(codes) == 0:
+                break
+
+            rows = self.__read_partition(path, use_cache=False, codes=codes)
+            if before is not None:
+                rows = rows.loc[pd.to_datetime(rows.index.get_level_values('date')) < before]
+            rows = rows.loc[~rows.index.get_level_values('code').duplicated(keep='last')]
+            codes -= set(rows.index.get_level_values('code'))
+            last_rows.append(rows)
+
+        if len(last_rows) == 0:
+            return pd.read_hdf(self.schema_file_dir, 'table', encoding='utf-8')
+        return pd.concat(last_rows).sort_index()
+
+    def partition_paths(self, from_date=None, to_date=None):
+        """
+        Get the paths of partitions which can have rows from from_date to to_date.
+
+        :param from_date: (datetime, default=None)
+        :param to_date: (datetime, default=None)
+
+        :return paths: (list of string) The paths sorted by date.
+        """
+        if not Path(self.root_dir).exists():
+            return []
+
+        from_period = from_date.strftime(self.partition_format) if from_date is not None else None
+        to_period = to_date.strftime(self.partition_format) if to_date is not None else None
+
+        paths = []
+        for period in sorted(path.stem for path in Path(self.root_dir).glob('*' + PARTITION_SUFFIX)
+                             if not path.name.startswith('_')):
+            # Period names are zero-padded, so comparing strings is the same as comparing dates.
+            if from_period is not None and period < from_period:
+                continue
+            if to_period is not None and period > to_period:
+                continue
+            paths.append(self.root_dir + period + PARTITION_SUFFIX)
+
+        return paths
+
+    def read(self, codes=None, from_date=None, to_date=None, columns=None):
+        """
+        Read only the partitions which can have rows from from_date to to_date, and only the rows of the codes.
+        The result can have some rows out of the dates, so filter it by dates again.
+
+        :param codes: (array-like, default=None) If codes is None, read rows of all codes.
+        :param columns: (list of string, default=None) Columns to read. If columns is None, read all columns.
+            Partitions are in the table format, so other columns are not read from the disk.
+
+        :return table: (DataFrame) The rows sorted by code and date.
+        """
+        paths = self.partition_paths(from_date, to_date)
+        codes = set(codes) if codes is not None else None
+
+        if len(paths) == 0 or (codes is not None and len(codes) == 0):
+            schema = pd.read_hdf(self.schema_file_dir, 'table', encoding='utf-8')
+            return schema if columns is None else schema[columns]
+
+        # A full scan is cached as a whole table, so do not cache its partitions again.
+        # Partitions of dates are cached as a whole, so queries of other codes or dates in them are not read again.
+        use_cache = codes is not None or from_date is not None or to_date is not None
+        partitions = [self.__read_partition(path, use_cache, codes, columns) for path in paths]
+
+        # Each partition is sorted by (code, date), so partitions of periods are sorted again.
+        table = pd.concat(partitions)
+        return table if len(partitions) == 1 else table.sort_index()
+
+    def iterate(self, from_date=None, to_date=None):
+        """
+        Read partitions one by one without caching them, so a whole store can be scanned in bounded memory.
+
+        :return partitions: (generator of DataFrame) The partitions sorted by date. Each one is sorted by (code, date).
+        """
+        for path in self.partition_paths(from_date, to_date):
+            yield self.__read_partition(path, use_cache=False)
+
+    @staticmethod
+    def __read_partition(partition_dir, use_cache, codes=None, columns=None):
+        partition = cache_manager.get(partition_dir) if use_cache else None
+        if partition is not None:
+            if codes is not None:
+                partition = partition.loc[partition.index.get_level_values('code').isin(codes)]
+            return partition if columns is None else partition[columns]
+
+        # Rows of a few codes are queried by the code column of the partition without reading the others.
+        if codes is not None and len(codes) <= MAX_QUERY_CODES:
+            codes = sorted(codes)
+            with pd.HDFStore(partition_dir, mode='r') as store:
+                return store.select('table', where='code in codes', columns=columns)
+
+        # Only whole partitions are cached, so a projection never hides columns of a later read.
+        partition = pd.read_hdf(partition_dir, 'table', columns=columns if not use_cache else None,
+                                encoding='utf-8')
+        if use_cache:
+            cache_manager.put(partition_dir, partition, get_memory_usage(partition))
+        if codes is not None:
+            partition = partition.loc[partition.index.get_level_values('code').isin(codes)]
+        return partition if columns is None else partition[columns]
+
+
+def _match_dates(table, other_table):
+    """
+    Convert the date level of the table to the type of the date level of other_table.
+    Dates of a cache built without parse_dates are strings, and they keep the format of the old dates,
+    so comparing strings of a partition is the same as comparing dates.
+    """
+    dates = other_table.index.get_level_values('date')
+    new_dates = pd.to_datetime(table.index.get_level_values('date'))
+    if dates.dtype == object:
+        is_date = len(dates) > 0 and len(dates[0]) == len(datetime(2000, 1, 1).strftime(DATE_FORMAT))
+        new_dates = new_dates.strftime(DATE_FORMAT if is_date else DATETIME_FORMAT)
+
+    table = table.copy()
+    table.index = pd.MultiIndex.from_arrays([table.index.get_level_values('code'), new_dates], names=['code', 'date'])
+    return table
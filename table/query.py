@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 5.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from table.adjustment import get_factor_column, is_adjustment_column, select_prices, ADJUSTMENT_FACTOR, PRICE_COLUMNS
+from table.arrow import to_arrow
+from table.dtypes import get_memory_usage
+from table.offset_index import OffsetIndex
+from table.panel import to_panel
+
+# Datetime format
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+# Sources of a table, from the cheapest to the most expensive one for a full scan.
+MEMORY = 'memory'
+HDF = 'hdf'
+PARTITIONS = 'partitions'
+CSV = 'csv'
+
+
+class QueryPlan:
+    """
+    Predicates of where() which are recorded, merged and executed at once.
+
+    Example
+    -------
+    plan = QueryPlan()
+    plan.add(stock_masters=stock_masters, from_date=datetime(2016, 1, 1))
+    plan.add(to_date=datetime(2016, 12, 31))
+    stock_daily_prices = plan.execute(table)
+    """
+
+    def __init__(self):
+        self.codes = None
+        self.short_code = None
+        self.company_name = None
+        self.from_date = None
+        self.to_date = None
+        self.columns = None
+        self.is_empty = False
+
+    def add(self,
+            code=None, short_code=None, company_name=None,  # For StockMaster
+            stock_masters=None, from_date=None, to_date=None,  # For StockMinutePrice, StockDailyPrice
+            codes=None, columns=None
+            ):
+        """
+        Merge predicates into this plan. Codes are intersected and date bounds are narrowed.
+
+        :param codes: (array-like, default=None) Codes to select, like the index of stock_masters.
+        :param columns: (list of string, default=None) Columns to select. Columns are intersected in the order of them.
+
+        :return self: (QueryPlan)
+        """
+        if code is not None:
+            self.__add_codes([code])
+
+        if stock_masters is not None:
+            self.__add_codes(stock_masters.index.values)
+
+        if codes is not None:
+            self.__add_codes(codes)
+
+        if columns is not None:
+            self.columns = list(columns) if self.columns is None else [column for column in self.columns
+                                                                       if column in columns]
+
+        if short_code is not None:
+            if self.short_code is not None and self.short_code != short_code:
+                self.is_empty = True
+            self.short_code = short_code
+
+        if company_name is not None:
+            if self.company_name is not None and self.company_name != company_name:
+                self.is_empty = True
+            self.company_name = company_name
+
+        if from_date is not None:
+            self.from_date = from_date if self.from_date is None else max(self.from_date, from_date)
+
+        if to_date is not None:
+            # to_date includes the whole day.
+            _to_date = datetime(to_date.year, to_date.month, to_date.day, 23, 59, 59)
+            self.to_date = _to_date if self.to_date is None else min(self.to_date, _to_date)
+
+        if self.from_date is not None and self.to_date is not None and self.from_date > self.to_date:
+            self.is_empty = True
+
+        return self
+
+    def __add_codes(self, codes):
+        codes = set(codes)
+        self.codes = codes if self.codes is None else self.codes & codes
+        if len(self.codes) == 0:
+            self.is_empty = True
+
+    def key(self):
+        """
+        :return key: (tuple) A hashable key of the merged predicates. Plans which select the same rows have the same key.
+            Columns are not a part of it. See Query for the keys of results in other shapes.
+        """
+        if self.is_empty:
+            return True,
+
+        codes = tuple(sorted(self.codes)) if self.codes is not None else None
+        return False, codes, self.short_code, self.company_name, self.from_date, self.to_date
+
+    def read_columns(self, columns):
+        """
+        :param columns: (list of string) All columns of the table.
+
+        :return read_columns: (list of string) Columns to read for this plan.
+            Besides the selected columns, it has columns to scan and adjustment factors to restore raw prices.
+            It is None if all columns are selected.
+        """
+        if self.columns is None:
+            return None
+
+        # Columns which are kept only to adjust prices are not selected.
+        missing_columns = [column for column in self.columns if column not in columns or is_adjustment_column(column)]
+        if len(missing_columns) > 0:
+            raise KeyError('There are no columns {}.'.format(missing_columns))
+
+        extra_columns = self.__factor_columns()
+        if self.short_code is not None:
+            extra_columns.append('short_code')
+        if self.company_name is not None:
+            extra_columns.append('company_name')
+
+        return self.columns + [column for column in extra_columns
+                               if column in columns and column not in self.columns]
+
+    def project(self, table):
+        """
+        :return projected_table: (DataFrame) Selected columns and their adjustment factors of the table.
+        """
+        if self.columns is None:
+            return table
+
+        columns = self.columns + [column for column in self.__factor_columns()
+                                  if column in table.columns and column not in self.columns]
+        if list(table.columns) == columns:
+            return table
+        return table[columns]
+
+    def __factor_columns(self):
+        # Bars can have factors of each price column besides adj_factor.
+        return [ADJUSTMENT_FACTOR] + [get_factor_column(column) for column in self.columns if column in PRICE_COLUMNS]
+
+    def has_index_predicates(self):
+        return self.codes is not None or self.from_date is not None or self.to_date is not None
+
+    def choose_source(self, sources):
+        """
+        Choose the cheapest source to execute this plan.
+
+        :param sources: (list of string) Available sources among MEMORY, HDF, PARTITIONS and CSV.
+
+        :return source: (string)
+        """
+        if MEMORY in sources:
+            return MEMORY
+
+        # Partitions are cheaper than a hdf file only if they can be pruned by codes, dates or columns.
+        if PARTITIONS in sources and (self.has_index_predicates() or self.columns is not None):
+            return PARTITIONS
+
+        for source in [HDF, PARTITIONS, CSV]:
+            if source in sources:
+                return source
+
+        raise ValueError('There is no source in {}.'.format(sources))
+
+    def execute(self, table, offset_index=None, hash_index=None):
+        """
+        Execute this plan on the table.
+        Predicates on the index are the most selective and need no scan, so resolve them first in one lookup.
+        Then scan columns of the remaining rows only.
+
+        :param table: (DataFrame) A table sorted by its index.
+        :param offset_index: (OffsetIndex, default=None) The offset index of the table.
+            If it is given, resolve codes and dates by binary search on it.
+        :param hash_index: (HashIndex, default=None) The hash index of the table.
+            If it is given, resolve codes, short_code and company_name by hash lookups instead of scans.
+
+        :return selected_table: (DataFrame)
+        """
+        if self.is_empty:
+            return table.iloc[:0]
+
+        scans = {'short_code': self.short_code, 'company_name': self.company_name}
+        codes = self.codes
+
+        if hash_index is not None and len(hash_index) == len(table):
+            keys = {column: [key] for column, key in scans.items() if key is not None and column in hash_index}
+            if table.index.nlevels == 1 and codes is not None and table.index.name in hash_index:
+                keys[table.index.name] = list(codes)
+                codes = None
+
+            positions = None
+            for column, column_keys in keys.items():
+                column_positions = hash_index.get_positions(column, column_keys)
+                positions = column_positions if positions is None else np.intersect1d(positions, column_positions)
+                scans.pop(column, None)
+
+            if positions is not None:
+                table = table.iloc[positions]
+                offset_index = None
+
+        if codes is not None or self.from_date is not None or self.to_date is not None:
+            if offset_index is not None and len(offset_index) == len(table):
+                table = offset_index.take(table, codes, self.from_date, self.to_date)
+            else:
+                table = table.iloc[self.__index_positions(table.index, codes)]
+
+        for column, key in scans.items():
+            if key is not None:
+                table = table.loc[table[column] == key]
+
+        return self.project(table)
+
+    def __index_positions(self, index, codes):
+        if index.nlevels == 1:
+            if codes is None:
+                return np.arange(len(index))
+            return np.flatnonzero(index.isin(list(codes)))
+
+        # Drop codes which are not in the table, so one lookup can resolve the rest.
+        if codes is not None:
+            codes = list(index.levels[0].intersection(list(codes)))
+            if len(codes) == 0:
+                return np.array([], dtype=np.int64)
+        else:
+            codes = slice(None)
+
+        # Dates of a table loaded without parse_dates are strings in either format.
+        # A date without time is formatted without time, so its own day is not before it.
+        from_date = None
+        if self.from_date is not None:
+            is_date = self.from_date == datetime(self.from_date.year, self.from_date.month, self.from_date.day)
+            from_date = self.from_date.strftime(DATE_FORMAT if is_date else DATETIME_FORMAT)
+        to_date = self.to_date.strftime(DATETIME_FORMAT) if self.to_date is not None else None
+
+        return index.get_locs([codes, slice(from_date, to_date)])
+
+
+def get_end_of_days(dates):
+    """
+    :param dates: (array-like of datetime)
+
+    :return end_of_days: (DatetimeIndex) 23:59:59 of each date, because to_date includes the whole day.
+    """
+    return pd.DatetimeIndex(pd.to_datetime(dates)).normalize() + pd.Timedelta(hours=23, minutes=59, seconds=59)
+
+
+def take_windows(table, windows, offset_index=None):
+    """
+    Select rows of many windows from a table in one pass, instead of a where() for each window.
+
+    :param table: (DataFrame) A table whose index is (code, date) and which is sorted by the index.
+    :param windows: (DataFrame) Windows to select. Its index is the id of each window.
+        columns     code        | (string)
+                    from_date   | (datetime) Inclusive. NaT means no lower bound.
+                    to_date     | (datetime) Inclusive, including the whole day. NaT means no upper bound.
+    :param offset_index: (OffsetIndex, default=None) The offset index of the table.
+        If it is None, it is built from the table.
+
+    :return selected_table: (DataFrame) Rows of all windows in the order of windows.
+        Rows which are in several windows are repeated for each window.
+        index       query_id    | The id of the window. The name of the index of windows if it has one.
+                    code        | (string)
+                    date        | (datetime)
+    """
+    if offset_index is None or len(offset_index) != len(table):
+        offset_index = OffsetIndex.from_index(table.index)
+
+    starts, stops = offset_index.locate_windows(windows['code'].values, windows['from_date'].values,
+                                                get_end_of_days(windows['to_date'].values))
+
+    # Concatenate the row ranges of windows without a loop.
+    lengths = stops - starts
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+    selected_table = table.iloc[positions]
+    selected_table.index = pd.MultiIndex.from_arrays([np.repeat(windows.index.values, lengths),
+                                                      selected_table.index.get_level_values(0),
+                                                      selected_table.index.get_level_values(1)],
+                                                     names=[windows.index.name or 'query_id'] +
+                                                           list(selected_table.index.names))
+    return selected_table
+
+
+class Query:
+    """
+    A query which select() returns. Each select() returns a new query, so queries of threads never share state.
+    """
+
+    def __init__(self, table_name, execute, selected_table=None, lazy=False, offset_index=None, hash_index=None,
+                 result_cache=None, columns=None):
+        """
+        :param table_name: (string)
+        :param execute: (function) A function which executes a QueryPlan on the table and returns the result.
+        :param selected_table: (DataFrame, default=None) The loaded table.
+            If it is None, the first where() or values() executes a plan to read the table.
+        :param lazy: (boolean, default=False) If lazy is True, where() only records predicates until values().
+        :param offset_index: (OffsetIndex, default=None) The offset index of selected_table.
+        :param hash_index: (HashIndex, default=None) The hash index of selected_table.
+        :param result_cache: (CacheManager, default=None) A cache of results keyed by QueryPlan.key() and their columns.
+            A result of all columns is kept under None, and one read with only the selected columns under the columns,
+            so a query of all columns never gets a projected result.
+            Results of where() and values() are shared through it, so do not modify them in place.
+        :param columns: (list of string, default=None) Columns to select. If columns is None, select all columns.
+        """
+        self.table_name = table_name
+        self.__execute = execute
+        self.__selected_table = selected_table
+        self.__lazy = lazy
+        self.__offset_index = offset_index
+        self.__hash_index = hash_index
+        self.__result_cache = result_cache
+        # The columns which selected_table was read with. None if it has all columns.
+        self.__selected_columns = None
+
+        # All predicates of where(). In lazy mode, values() executes it at once.
+        self.__plan = QueryPlan().add(columns=columns)
+
+    def where(self,
+              code=None, short_code=None, company_name=None,  # For StockMaster
+              stock_masters=None, from_date=None, to_date=None  # For StockMinutePrice, StockDailyPrice
+              ):
+        predicates = dict(code=code, short_code=short_code, company_name=company_name,
+                          stock_masters=stock_masters, from_date=from_date, to_date=to_date)
+        self.__plan.add(**predicates)
+
+        # In lazy mode, values() executes the plan.
+        if self.__lazy:
+            return self
+
+        selected_table, selected_columns = self.__get_cached_result()
+        if selected_table is None:
+            plan = QueryPlan().add(**predicates)
+            if self.__selected_table is None:
+                # Read only the selected columns from the source.
+                selected_table = self.__execute(plan.add(columns=self.__plan.columns))
+                selected_columns = self.__plan.columns
+            else:
+                # Keep all columns for later where(). values() selects columns at last.
+                selected_table = plan.execute(self.__selected_table, self.__offset_index, self.__hash_index)
+                selected_columns = self.__selected_columns
+            self.__cache_result(selected_table, selected_columns)
+        self.__selected_table = selected_table
+        self.__selected_columns = selected_columns
+
+        # The offset index and the hash index are only valid for the whole table.
+        self.__offset_index = None
+        self.__hash_index = None
+
+        return self
+
+    def values(self, adjusted=True):
+        """
+        :param adjusted: (boolean, default=True) If it is False, return raw prices instead of adjusted prices.
+            It only changes tables which have adjustment factors like StockDailyPrice.
+
+        :return selected_table: (DataFrame)
+        """
+        return select_prices(self.__result(), adjusted)
+
+    def to_panel(self, fields=None, adjusted=True):
+        """
+        :param fields: (list of string, default=None) Numeric columns of the panel.
+            If fields is None, use all numeric columns except adj_factor and listed_stocks_number.
+        :param adjusted: (boolean, default=True) If it is False, return raw prices instead of adjusted prices.
+
+        :return panel: (Panel) A dense (code, date, field) array of the selected table. See table.panel.to_panel.
+        """
+        return to_panel(self.__result(), fields, adjusted)
+
+    def to_arrow(self, adjusted=True):
+        """
+        :param adjusted: (boolean, default=True) If it is False, return raw prices instead of adjusted prices.
+
+        :return arrow_table: (pyarrow.Table) The selected table with its index as columns. It needs pyarrow.
+        """
+        return to_arrow(self.values(adjusted))
+
+    def __result(self):
+        if self.__lazy:
+            selected_table, _ = self.__get_cached_result()
+            if selected_table is None:
+                selected_table = self.__execute(self.__plan)
+                self.__cache_result(selected_table, self.__plan.columns)
+            return self.__plan.project(selected_table)
+
+        if self.__selected_table is None:
+            self.__selected_table = self.__execute(QueryPlan().add(columns=self.__plan.columns))
+
+        # A query without where() has the whole table.
+        self.__selected_table = self.__plan.project(self.__selected_table)
+        if self.__plan.columns is not None:
+            self.__selected_columns = self.__plan.columns
+        return self.__selected_table
+
+    def __get_cached_result(self):
+        if self.__result_cache is None:
+            return None, None
+
+        # A result of all columns also serves a projected query, because values() projects it.
+        selected_table = self.__result_cache.get((self.__plan.key(), None))
+        if selected_table is not None:
+            return selected_table, None
+
+        if self.__plan.columns is not None:
+            selected_table = self.__result_cache.get((self.__plan.key(), tuple(self.__plan.columns)))
+            if selected_table is not None:
+                return selected_table, self.__plan.columns
+        return None, None
+
+    def __cache_result(self, selected_table, columns):
+        """
+        :param columns: (list of string) The columns which selected_table was read with. None if it has all columns.
+        """
+        if self.__result_cache is not None:
+            key = self.__plan.key(), tuple(columns) if columns is not None else None
+            self.__result_cache.put(key, selected_table, get_memory_usage(selected_table))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 19.
+"""
+import numpy as np
+import pandas as pd
+
+from table.adjustment import get_factor_column, ADJUSTMENT_FACTOR, PRICE_COLUMNS
+
+# How to reduce each column of rows in a bar. The other columns take the last value.
+BAR_AGGREGATIONS = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
+
+REDUCERS = {
+    'max': np.maximum.reduceat,
+    'min': np.minimum.reduceat,
+    'sum': np.add.reduceat,
+}
+
+# Bars which are not longer than a day never cross partitions, so they can be resampled partition by partition.
+DAY = pd.Timedelta('1D').value
+
+
+def get_rule_nanoseconds(rule):
+    """
+    :param rule: (string) The length of a bar. '5min', '30min', '1H', '1D'
+
+    :return nanoseconds: (int)
+    """
+    nanoseconds = pd.to_timedelta(rule).value
+    if nanoseconds <= 0:
+        raise ValueError('rule should be positive, not {}.'.format(rule))
+    return nanoseconds
+
+
+def get_buckets(dates, rule_nanoseconds):
+    """
+    :param dates: (ndarray of int64) Nanoseconds of dates.
+    :param rule_nanoseconds: (int)
+
+    :return buckets: (ndarray of int64) The start of the bar of each date.
+        Bars which are not longer than a day start at the start of the day and every rule after it,
+        so a bar never crosses days even if the rule does not divide a day.
+        Longer bars start every rule from the epoch.
+    """
+    if rule_nanoseconds <= DAY:
+        return dates - np.mod(np.mod(dates, DAY), rule_nanoseconds)
+    return dates - np.mod(dates, rule_nanoseconds)
+
+
+def _reduce(values, aggregation, starts, ends):
+    if aggregation == 'first':
+        return values[starts]
+    if aggregation == 'last':
+        return values[ends - 1]
+    if aggregation == 'sum' and values.dtype.kind in 'iu':
+        # The sum of compact integers can overflow their dtype.
+        return REDUCERS[aggregation](values, starts, dtype=np.int64)
+    return REDUCERS[aggregation](values, starts)
+
+
+def resample_bars(table, rule):
+    """
+    Resample a table sorted by (code, date) to bars of the rule.
+    Rows of a bar are contiguous in the sorted table, so each column is reduced by one segmented reduction
+    instead of groupby().resample().
+
+    If the table has adj_factor, prices of a bar can come from rows of different factors,
+    like an open before a split and a close after it. So open, high and low get factors of their own,
+    which are the adjusted price over the raw price of the bar, and adj_factor is the factor of close.
+
+    :param table: (DataFrame) A table whose index is (code, date) and which is sorted by the index.
+    :param rule: (string) The length of a bar. '5min', '30min', '1H', '1D'
+
+    :return bars: (DataFrame)
+        index       code    | (string)
+                    date    | (datetime) The start of the bar.
+        columns     open    | (float) The first open in the bar.
+                    high    | (float) The max high in the bar.
+                    low     | (float) The min low in the bar.
+                    close   | (float) The last close in the bar.
+                    volume  | (int) The sum of volume in the bar.
+                    open_adj_factor, high_adj_factor, low_adj_factor    | (float) Only if the table has adj_factor.
+    """
+    rule_nanoseconds = get_rule_nanoseconds(rule)
+
+    if len(table) == 0:
+        empty_index = pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=['code', 'date'])
+        return pd.DataFrame(columns=table.columns, index=empty_index)
+
+    code_labels = np.asarray(table.index.codes[0])
+    dates = pd.to_datetime(table.index.levels[1]).values.astype(np.int64)[np.asarray(table.index.codes[1])]
+    buckets = get_buckets(dates, rule_nanoseconds)
+
+    # A bar starts where the code or the bucket changes.
+    is_start = np.empty(len(table), dtype=bool)
+    is_start[0] = True
+    is_start[1:] = (code_labels[1:] != code_labels[:-1]) | (buckets[1:] != buckets[:-1])
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], len(table))
+
+    columns = {}
+    for column in table.columns:
+        columns[column] = _reduce(table[column].values, BAR_AGGREGATIONS.get(column, 'last'), starts, ends)
+
+    bar_columns = list(table.columns)
+    if ADJUSTMENT_FACTOR in table.columns:
+        factors = table[ADJUSTMENT_FACTOR].values.astype(np.float64)
+        for column in PRICE_COLUMNS:
+            if column in table.columns and column != 'close':
+                raw_values = _reduce(table[column].values / factors, BAR_AGGREGATIONS[column], starts, ends)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    column_factors = columns[column] / raw_values
+                columns[get_factor_column(column)] = np.where(raw_values != 0, column_factors,
+                                                              columns[ADJUSTMENT_FACTOR])
+                bar_columns.append(get_factor_column(column))
+
+    index = pd.MultiIndex.from_arrays([table.index.levels[0][code_labels[starts]],
+                                       pd.DatetimeIndex(buckets[starts])], names=['code', 'date'])
+    return pd.DataFrame(columns, index=index, columns=bar_columns)
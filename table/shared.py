@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 22.
+"""
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from table.atomic_file import atomic_write
+
+MANIFEST_FILE_NAME = 'manifest.json'
+
+# Kinds of shared columns.
+ARRAY = 'array'
+CATEGORY = 'category'
+
+
+def _save(file_dir, values):
+    with open(file_dir, 'wb') as f:
+        np.save(f, values, allow_pickle=values.dtype == object)
+
+
+def _save_column(version_dir, name, values):
+    """
+    Save a column as files which can be memory-mapped. Python objects cannot be memory-mapped,
+    so strings are saved as categories whose codes are memory-mapped.
+
+    :return column: (dict) The kind of the column and its files.
+    """
+    is_object = values.dtype == object
+    if is_object:
+        values = pd.Categorical(values)
+    elif not isinstance(values.dtype, pd.CategoricalDtype):
+        _save(version_dir + name + '.npy', np.asarray(values))
+        return {'kind': ARRAY, 'file': name + '.npy'}
+
+    _save(version_dir + name + '.codes.npy', np.asarray(values.codes))
+    _save(version_dir + name + '.categories.npy', np.asarray(values.categories))
+    return {'kind': CATEGORY, 'file': name + '.codes.npy', 'categories_file': name + '.categories.npy',
+            'is_object': is_object}
+
+
+def _load_column(version_dir, column):
+    values = np.load(version_dir + column['file'], mmap_mode='r')
+    if column['kind'] == ARRAY:
+        return values
+
+    categories = np.load(version_dir + column['categories_file'], allow_pickle=True)
+    values = pd.Categorical.from_codes(values, categories)
+
+    # Strings which were not categories are attached as strings again, so the table has the same dtypes.
+    if column.get('is_object', False):
+        return np.asarray(values.astype(object))
+    return values
+
+
+def publish(shared_dir, table, arrays=None):
+    """
+    Save columns and index of the table as files which other processes can memory-map.
+    A new version is written beside the old one and the manifest is replaced at last,
+    so processes which attached the old version keep reading it.
+
+    :param shared_dir: (string) The directory of shared versions. It ends with '/'.
+    :param table: (DataFrame)
+    :param arrays: (dict of ndarray, default=None) Other arrays to share with the table like an offset index.
+    """
+    version = uuid.uuid4().hex
+    version_dir = shared_dir + version + '/'
+    os.makedirs(version_dir)
+
+    index = table.index if isinstance(table.index, pd.MultiIndex) else pd.MultiIndex.from_arrays([table.index])
+    levels = []
+    for i, (level, codes) in enumerate(zip(index.levels, index.codes)):
+        _save(version_dir + 'level_{}.npy'.format(i), np.asarray(level))
+        _save(version_dir + 'level_{}.codes.npy'.format(i), np.asarray(codes))
+        levels.append({'file': 'level_{}.npy'.format(i), 'codes_file': 'level_{}.codes.npy'.format(i)})
+
+    columns = []
+    for i, name in enumerate(table.columns):
+        column = _save_column(version_dir, 'column_{}'.format(i), table[name].values)
+        column['name'] = name
+        columns.append(column)
+
+    array_files = {}
+    for name, values in (arrays or {}).items():
+        _save(version_dir + 'array_{}.npy'.format(name), values)
+        array_files[name] = 'array_{}.npy'.format(name)
+
+    manifest = {
+        'version': version,
+        'index_names': list(index.names),
+        'is_multi_index': isinstance(table.index, pd.MultiIndex),
+        'levels': levels,
+        'columns': columns,
+        'arrays': array_files,
+    }
+    with atomic_write(shared_dir + MANIFEST_FILE_NAME) as temp_file_dir:
+        with open(temp_file_dir, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+    # Processes which mapped old versions keep their pages after the files are removed.
+    for path in Path(shared_dir).iterdir():
+        if path.is_dir() and path.name != version:
+            shutil.rmtree(str(path), ignore_errors=True)
+
+
+def is_published(shared_dir):
+    return Path(shared_dir + MANIFEST_FILE_NAME).exists()
+
+
+def attach(shared_dir):
+    """
+    Memory-map the published table without copying it. The table is read-only, so do not modify it in place.
+    Columns of strings are made from their shared categories, so they are copied in each process.
+    Columns which were categories stay categories, and only their codes of one or two bytes are copied.
+    So publish a compact table to share strings without copying them.
+
+    :param shared_dir: (string)
+
+    :return table: (DataFrame) It is None if nothing is published.
+    :return arrays: (dict of ndarray)
+    """
+    if not is_published(shared_dir):
+        return None, {}
+
+    with open(shared_dir + MANIFEST_FILE_NAME, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    version_dir = shared_dir + manifest['version'] + '/'
+
+    levels = [np.load(version_dir + level['file'], allow_pickle=True) for level in manifest['levels']]
+    codes = [np.load(version_dir + level['codes_file'], mmap_mode='r') for level in manifest['levels']]
+    if manifest['is_multi_index']:
+        index = pd.MultiIndex(levels=levels, codes=codes, names=manifest['index_names'], verify_integrity=False)
+    else:
+        index = pd.Index(levels[0].take(codes[0]), name=manifest['index_names'][0])
+
+    # A dict of arrays is not consolidated, so each column keeps its memory-mapped array.
+    table = pd.DataFrame({column['name']: _load_column(version_dir, column) for column in manifest['columns']},
+                         index=index, columns=[column['name'] for column in manifest['columns']], copy=False)
+
+    arrays = {name: np.load(version_dir + file, mmap_mode='r') for name, file in manifest['arrays'].items()}
+    return table, arrays
+
+
+def unpublish(shared_dir):
+    if Path(shared_dir).exists():
+        shutil.rmtree(shared_dir, ignore_errors=True)
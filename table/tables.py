@@ -6,29 +6,36 @@
 import pandas as pd
 
 from table.base import Table
+from table.ingestion import DEFAULT_MEMORY_BUDGET
 
 idx = pd.IndexSlice
 
 
 class StockMaster(Table):
-    def __init__(self):
+    def __init__(self, compact=False, memory_budget=DEFAULT_MEMORY_BUDGET):
         table_name = 'stock_master'
         csv_file_remote_address = 'https://www.dropbox.com/s/2m8lc1nirln014g/stock_master.csv?dl=1'
         index = ['code']
-        super().__init__(table_name, csv_file_remote_address, index)
+        hash_index_columns = ['code', 'short_code', 'company_name']
+        super().__init__(table_name, csv_file_remote_address, index, compact=compact,
+                         memory_budget=memory_budget, hash_index_columns=hash_index_columns)
 
 
 class StockDailyPrice(Table):
-    def __init__(self):
+    def __init__(self, compact=False, memory_budget=DEFAULT_MEMORY_BUDGET):
         table_name = 'stock_daily_price'
         csv_file_remote_address = 'https://www.dropbox.com/s/xqcpwavozoyjw4m/stock_daily_price.csv?dl=1'
         index = ['code', 'date']
-        super().__init__(table_name, csv_file_remote_address, index)
+        partition_freq = 'year'
+        super().__init__(table_name, csv_file_remote_address, index, partition_freq=partition_freq, compact=compact,
+                         memory_budget=memory_budget)
 
 
 class StockMinutePrice(Table):
-    def __init__(self):
+    def __init__(self, compact=False, memory_budget=DEFAULT_MEMORY_BUDGET):
         table_name = 'stock_minute_price'
         csv_file_remote_address = 'https://www.dropbox.com/s/x6ledb2y0r4s1tj/stock_minute_price.csv?dl=1'
         index = ['code', 'date']
-        super().__init__(table_name, csv_file_remote_address, index)
+        partition_freq = 'month'
+        super().__init__(table_name, csv_file_remote_address, index, partition_freq=partition_freq, compact=compact,
+                         memory_budget=memory_budget)
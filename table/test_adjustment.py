@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 17.
+"""
+from datetime import datetime
+from unittest import TestCase
+
+import pandas as pd
+from numpy import testing
+
+from table.adjustment import adjust_prices, find_events, get_event_products, get_last_rows, rescale_prices, \
+    select_prices, ADJUSTMENT_FACTOR
+
+
+def get_sample_prices():
+    # KR7005930003 is split 2 for 1 on 2017-01-04.
+    index = pd.MultiIndex.from_tuples([
+        ('KR7000660001', datetime(2017, 1, 3)),
+        ('KR7005930003', datetime(2017, 1, 2)),
+        ('KR7005930003', datetime(2017, 1, 3)),
+        ('KR7005930003', datetime(2017, 1, 4)),
+    ], names=['code', 'date'])
+    return pd.DataFrame({
+        'volume': [10, 10, 20, 40],
+        'open': [30.0, 100.0, 110.0, 52.0],
+        'high': [40.0, 110.0, 120.0, 60.0],
+        'low': [20.0, 90.0, 100.0, 45.0],
+        'close': [30.0, 100.0, 110.0, 50.0],
+        'market_capitalization': [300.0, 10000.0, 11000.0, 10000.0],
+        'listed_stocks_number': [10, 100, 100, 200],
+    }, index=index)
+
+
+class TestAdjustment(TestCase):
+    def test_adjust_prices(self):
+        prices = adjust_prices(get_sample_prices())
+        testing.assert_array_equal(['volume', 'open', 'high', 'low', 'close', 'listed_stocks_number',
+                                    ADJUSTMENT_FACTOR], prices.columns)
+
+        # The last rows keep traded prices, and prices before the split are continuous with them.
+        testing.assert_array_almost_equal([1.0, 0.5, 0.5, 1.0], prices[ADJUSTMENT_FACTOR].values)
+        testing.assert_array_almost_equal([30.0, 50.0, 55.0, 50.0], prices['close'].values)
+        testing.assert_array_almost_equal([30.0, 50.0, 55.0, 52.0], prices['open'].values)
+
+    def test_changes_which_are_not_events(self):
+        # Issues and buybacks change listed stocks without changing prices by the ratio.
+        prices = get_sample_prices()
+        prices['close'] = [30.0, 100.0, 110.0, 108.0]
+        prices['listed_stocks_number'] = [10, 100, 100, 125]
+        testing.assert_array_almost_equal([1.0, 1.0, 1.0, 1.0], adjust_prices(prices)[ADJUSTMENT_FACTOR].values)
+
+    def test_adjust_appended_prices(self):
+        sample_prices = get_sample_prices()
+        old_prices = adjust_prices(sample_prices.iloc[:3].copy())
+        testing.assert_array_almost_equal([1.0, 1.0, 1.0], old_prices[ADJUSTMENT_FACTOR].values)
+
+        # The split is between the last old row and the new row, and old rows are rescaled by it.
+        new_prices = find_events(sample_prices.iloc[3:].copy(), get_last_rows(old_prices))
+        event_products = get_event_products(new_prices)
+        self.assertEqual({'KR7005930003': 0.5}, event_products)
+        old_prices = rescale_prices(old_prices, event_products, datetime(2017, 1, 4))
+        testing.assert_array_almost_equal([30.0, 50.0, 55.0], old_prices['close'].values)
+        testing.assert_array_almost_equal([1.0, 0.5, 0.5], old_prices[ADJUSTMENT_FACTOR].values)
+        self.assertIsNone(rescale_prices(old_prices, {'KR7035420009': 0.5}, datetime(2017, 1, 4)))
+
+    def test_select_raw_prices(self):
+        sample_prices = get_sample_prices()
+        prices = select_prices(adjust_prices(sample_prices.copy()), adjusted=False)
+        testing.assert_array_equal(['volume', 'open', 'high', 'low', 'close'], prices.columns)
+        testing.assert_array_almost_equal(sample_prices['open'].values, prices['open'].values)
+        testing.assert_array_almost_equal(sample_prices['close'].values, prices['close'].values)
+
+    def test_select_prices_without_factors(self):
+        prices = get_sample_prices()[['volume', 'close']]
+        self.assertIs(prices, select_prices(prices, adjusted=False))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 24.
+"""
+import importlib.util
+import tempfile
+from datetime import datetime
+from unittest import TestCase, skipIf
+
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from table.arrow import to_arrow, from_arrow, write_parquet, write_ipc, read_parquet, read_ipc
+
+
+def get_sample_prices():
+    dates = pd.date_range(datetime(2016, 12, 26), datetime(2017, 1, 6), freq='B').strftime('%Y-%m-%d %H:%M:%S')
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    return pd.DataFrame({
+        'close': np.arange(len(index), dtype=float),
+        'volume': np.arange(len(index)),
+    }, index=index, columns=['close', 'volume'])
+
+
+def get_sample_partitions():
+    prices = get_sample_prices()
+    years = pd.to_datetime(prices.index.get_level_values('date')).year
+    return [partition for _, partition in prices.groupby([prices.index.get_level_values('code'), years])]
+
+
+@skipIf(importlib.util.find_spec('pyarrow') is None, 'pyarrow is not installed.')
+class TestArrow(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_to_arrow(self):
+        prices = from_arrow(to_arrow(get_sample_prices()))
+        self.assertEqual(['code', 'date'], list(prices.index.names))
+        testing.assert_array_equal(get_sample_prices()['close'].values, prices['close'].values)
+
+    def test_read_parquet(self):
+        file_dir = self.temp_dir.name + '/prices.parquet'
+        write_parquet(get_sample_partitions(), file_dir)
+
+        closes = read_parquet(file_dir, columns=['close'], codes=['KR7005930003'], from_date=datetime(2017, 1, 1))
+        self.assertEqual(['close'], list(closes.columns))
+        testing.assert_array_equal([15.0, 16.0, 17.0, 18.0, 19.0], closes['close'].values)
+
+    def test_row_groups(self):
+        # Partitions of 5 rows are merged and split into row groups of 8 rows.
+        file_dir = self.temp_dir.name + '/prices.parquet'
+        write_parquet(get_sample_partitions(), file_dir, row_group_size=8)
+
+        import pyarrow.parquet
+        metadata = pyarrow.parquet.ParquetFile(file_dir).metadata
+        self.assertEqual([8, 8, 4], [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+        testing.assert_array_equal(get_sample_prices()['close'].values, read_parquet(file_dir)['close'].values)
+
+    def test_read_ipc(self):
+        file_dir = self.temp_dir.name + '/prices.arrow'
+        write_ipc(get_sample_partitions(), file_dir)
+
+        volumes = read_ipc(file_dir, columns=['volume'])
+        self.assertEqual(['volume'], list(volumes.columns))
+        self.assertEqual(20, len(volumes))
+
+    def test_write_partitions_of_different_dtypes(self):
+        # The first partition has no names and fewer markets than the other one.
+        partitions = [partition.assign(name=name, market=pd.Categorical(markets))
+                      for partition, name, markets in zip(get_sample_partitions(), [None, '삼성전자'],
+                                                          [['KOSPI'] * 5, ['KOSPI', 'KOSDAQ'] * 2 + ['KOSPI']])]
+        schema = pd.concat(partitions).iloc[:0]
+        for write, read in [(write_parquet, read_parquet), (write_ipc, read_ipc)]:
+            file_dir = self.temp_dir.name + '/prices.' + write.__name__
+            write(partitions, file_dir, schema=schema)
+
+            prices = read(file_dir)
+            self.assertEqual([None] * 5 + ['삼성전자'] * 5, list(prices['name']))
+            self.assertEqual(['KOSPI'] * 6 + ['KOSDAQ'], list(prices['market'].iloc[:7]))
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 3. 2.
+"""
+import os
+import tempfile
+from unittest import TestCase
+
+from table.atomic_file import atomic_write
+
+
+class TestAtomicWrite(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_dir = self.temp_dir.name + '/file.txt'
+        with open(self.file_dir, 'w') as f:
+            f.write('old')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_atomic_write(self):
+        with atomic_write(self.file_dir) as temp_file_dir:
+            with open(temp_file_dir, 'w') as f:
+                f.write('new')
+
+            # The file is not changed until the block ends.
+            with open(self.file_dir, 'r') as f:
+                self.assertEqual('old', f.read())
+
+        with open(self.file_dir, 'r') as f:
+            self.assertEqual('new', f.read())
+        self.assertEqual(['file.txt'], os.listdir(self.temp_dir.name))
+
+    def test_broken_write(self):
+        with self.assertRaises(ValueError):
+            with atomic_write(self.file_dir) as temp_file_dir:
+                with open(temp_file_dir, 'w') as f:
+                    f.write('broken')
+                raise ValueError()
+
+        with open(self.file_dir, 'r') as f:
+            self.assertEqual('old', f.read())
+        self.assertEqual(['file.txt'], os.listdir(self.temp_dir.name))
+
+    def test_unique_temp_files(self):
+        # Two writers of the same file write their own temporary files, and the last one wins.
+        with atomic_write(self.file_dir) as temp_file_dir, atomic_write(self.file_dir) as other_temp_file_dir:
+            self.assertNotEqual(temp_file_dir, other_temp_file_dir)
+            with open(temp_file_dir, 'w') as f, open(other_temp_file_dir, 'w') as other_f:
+                f.write('first')
+                other_f.write('second')
+
+        with open(self.file_dir, 'r') as f:
+            self.assertEqual('first', f.read())
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 27.
+"""
+import importlib.util
+import os
+import tempfile
+from datetime import datetime
+from unittest import TestCase, mock, skipIf
+
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from table.arrow import read_parquet, read_ipc
+from table.base import Table
+from table.cache import cache_manager
+
+PRICE_COLUMNS = ['volume', 'open', 'high', 'low', 'close']
+
+
+def get_sample_prices(from_date=datetime(2016, 12, 26), to_date=datetime(2017, 1, 6)):
+    dates = pd.date_range(from_date, to_date, freq='B')
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    closes = np.arange(len(index)) + 100
+    return pd.DataFrame({
+        'volume': np.arange(len(index)) * 10,
+        'open': closes,
+        'high': closes + 1,
+        'low': closes - 1,
+        'close': closes,
+        'market_capitalization': closes * 1000,
+        'listed_stocks_number': 1000,
+    }, index=index)
+
+
+def get_sample_masters():
+    return pd.DataFrame({
+        'code': ['KR7000660001', 'KR7005930003'],
+        'short_code': ['A000660', 'A005930'],
+        'company_name': ['SK hynix', 'Samsung Electronics'],
+        'market_name': ['KOSPI', 'KOSPI'],
+    })
+
+
+def create_table(data_dir, table_name='stock_daily_price', partition_freq='year', compact=False):
+    """
+    :return table: (Table) The instance of a new table class, so tests do not share the state of a table class.
+    """
+    class SampleTable(Table):
+        def __init__(self):
+            index = ['code', 'date'] if table_name == 'stock_daily_price' else ['code']
+            hash_index_columns = ['code', 'short_code'] if table_name == 'stock_master' else None
+            super().__init__(table_name, None, index, partition_freq=partition_freq, compact=compact,
+                             hash_index_columns=hash_index_columns)
+
+    # Paths of a table are decided by DATA_DIR when it is created.
+    with mock.patch('table.base.DATA_DIR', data_dir):
+        return SampleTable.instance()
+
+
+class TestTable(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.temp_dir.name + '/'
+        self.prices = get_sample_prices()
+        self.prices.reset_index().to_csv(self.data_dir + 'stock_daily_price.csv', index=False,
+                                         date_format='%Y-%m-%d')
+        get_sample_masters().to_csv(self.data_dir + 'stock_master.csv', index=False)
+
+    def tearDown(self):
+        cache_manager.clear()
+        self.temp_dir.cleanup()
+
+    def test_select(self):
+        table = create_table(self.data_dir)
+        prices = table.select().values()
+        self.assertTrue(os.path.exists(self.data_dir + 'stock_daily_price/2017.h5'))
+        self.assertEqual(PRICE_COLUMNS, list(prices.columns))
+        testing.assert_array_equal(self.prices['close'].values, prices['close'].values)
+
+        prices = table.select().where(code='KR7005930003', from_date=datetime(2017, 1, 2)).values()
+        self.assertEqual(5, len(prices))
+
+    def test_select_columns(self):
+        closes = create_table(self.data_dir).select(columns=['close']).where(code='KR7000660001').values()
+        self.assertEqual(['close'], list(closes.columns))
+        testing.assert_array_equal(self.prices.loc['KR7000660001', 'close'].values, closes['close'].values)
+
+    def test_append(self):
+        table = create_table(self.data_dir)
+        table.select().values()
+
+        new_prices = get_sample_prices(datetime(2017, 1, 9), datetime(2017, 1, 10))
+        table.append(new_prices)
+        prices = table.select().where(code='KR7005930003').values()
+        self.assertEqual(12, len(prices))
+        testing.assert_array_equal(new_prices.loc['KR7005930003', 'close'].values, prices['close'].values[-2:])
+        testing.assert_array_equal(self.prices.loc['KR7005930003', 'close'].values, prices['close'].values[:-2])
+
+    def test_append_empty_table(self):
+        table = create_table(self.data_dir)
+        table.select().values()
+        table.append(pd.DataFrame())
+        self.assertEqual(len(self.prices), len(table.select().values()))
+
+    def test_result_cache(self):
+        table = create_table(self.data_dir)
+        table.enable_result_cache()
+        for _ in range(2):
+            prices = table.select().where(code='KR7005930003').values()
+        self.assertEqual(10, len(prices))
+        self.assertEqual(1, table.result_cache_stats()['hits'])
+
+        # Results of the old rows are not served after new rows are appended.
+        table.append(get_sample_prices(datetime(2017, 1, 9), datetime(2017, 1, 9)))
+        prices = table.select().where(code='KR7005930003').values()
+        self.assertEqual(11, len(prices))
+
+    def test_compact(self):
+        table = create_table(self.data_dir, compact=True)
+        prices = table.select().values()
+        self.assertEqual(np.int32, prices['close'].dtype)
+        self.assertEqual(np.uint32, prices['volume'].dtype)
+        self.assertLess(table.memory_report()['compact_memory_usage'], table.memory_report()['memory_usage'])
+
+        # New rows are stored in the compact dtypes too.
+        table.append(get_sample_prices(datetime(2017, 1, 9), datetime(2017, 1, 9)))
+        prices = table.select().values()
+        self.assertEqual(np.int32, prices['close'].dtype)
+        self.assertEqual(len(self.prices) + 2, len(prices))
+
+    def test_compact_hdf(self):
+        table = create_table(self.data_dir, partition_freq=None, compact=True)
+        prices = table.select().values()
+        self.assertTrue(os.path.exists(self.data_dir + 'stock_daily_price.h5'))
+        self.assertEqual(np.int32, prices['close'].dtype)
+        self.assertIsNotNone(table.memory_report())
+
+    def test_share(self):
+        table = create_table(self.data_dir, partition_freq=None)
+        table.share()
+
+        # Another process creates its own table and attaches the shared one instead of loading it.
+        cache_manager.clear()
+        prices = create_table(self.data_dir, partition_freq=None).select().values()
+        self.assertFalse(prices['close'].values.flags.writeable)
+        testing.assert_array_equal(self.prices['close'].values, prices['close'].values)
+
+        # The shared table is not attached after new rows are appended.
+        table.append(get_sample_prices(datetime(2017, 1, 9), datetime(2017, 1, 9)))
+        cache_manager.clear()
+        prices = create_table(self.data_dir, partition_freq=None).select().values()
+        self.assertEqual(len(self.prices) + 2, len(prices))
+
+    def test_resample(self):
+        table = create_table(self.data_dir)
+        bars = table.resample('1D').where(code='KR7005930003').values()
+        self.assertEqual(10, len(bars))
+        self.assertTrue(bars.index.is_monotonic_increasing)
+        self.assertTrue(os.path.exists(self.data_dir + 'stock_daily_price.bars/1D.h5'))
+
+    def test_select_windows(self):
+        windows = pd.DataFrame({'code': ['KR7000660001', 'KR7005930003'],
+                                'from_date': [datetime(2016, 12, 27), datetime(2017, 1, 4)],
+                                'to_date': [datetime(2016, 12, 28), datetime(2017, 1, 6)]},
+                               index=pd.Index(['first', 'second'], name='event'))
+        prices = create_table(self.data_dir).select_windows(windows)
+        self.assertEqual(PRICE_COLUMNS, list(prices.columns))
+        self.assertEqual(5, len(prices))
+        self.assertEqual(2, len(prices.loc['first']))
+
+    def test_lookup(self):
+        table = create_table(self.data_dir, table_name='stock_master', partition_freq=None)
+        stock_masters = table.lookup(['A005930', 'A000000'], by='short_code', columns=['company_name'])
+        self.assertEqual('Samsung Electronics', stock_masters['company_name'].iloc[0])
+        self.assertTrue(pd.isnull(stock_masters['company_name'].iloc[1]))
+
+    @skipIf(importlib.util.find_spec('pyarrow') is None, 'pyarrow is not installed.')
+    def test_export(self):
+        table = create_table(self.data_dir)
+        closes = read_parquet(table.export_parquet(self.data_dir + 'prices.parquet'), columns=['close'],
+                              codes=['KR7005930003'])
+        testing.assert_array_equal(self.prices.loc['KR7005930003', 'close'].values, closes['close'].values)
+
+        prices = read_ipc(table.export_arrow(self.data_dir + 'prices.arrow'))
+        self.assertEqual(len(self.prices), len(prices))
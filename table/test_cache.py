@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 14.
+"""
+from unittest import TestCase
+
+from table.cache import CacheManager
+
+
+class TestCacheManager(TestCase):
+    def setUp(self):
+        self.cache_manager = CacheManager(memory_budget=100)
+
+    def test_get(self):
+        self.cache_manager.put('stock_master', 'value', 10)
+        self.assertEqual('value', self.cache_manager.get('stock_master'))
+        self.assertIsNone(self.cache_manager.get('stock_daily_price'))
+        stats = self.cache_manager.stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(10, stats['memory_usage'])
+
+    def test_evict_least_recently_used(self):
+        self.cache_manager.put('a', 'a', 40)
+        self.cache_manager.put('b', 'b', 40)
+        self.cache_manager.get('a')
+        self.cache_manager.put('c', 'c', 40)
+        self.assertIn('a', self.cache_manager)
+        self.assertNotIn('b', self.cache_manager)
+        self.assertEqual(1, self.cache_manager.stats()['evictions'])
+
+    def test_pin(self):
+        self.cache_manager.pin('a')
+        self.cache_manager.put('a', 'a', 60)
+        self.cache_manager.put('b', 'b', 60)
+        self.assertIn('a', self.cache_manager)
+        self.assertNotIn('b', self.cache_manager)
+
+    def test_too_large_value(self):
+        self.cache_manager.put('a', 'a', 200)
+        self.assertNotIn('a', self.cache_manager)
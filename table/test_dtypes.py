@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 8.
+"""
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from table.dtypes import compact_table, get_compact_dtypes, cast_table, get_memory_usage
+
+
+def get_sample_prices():
+    dates = ['2017-01-02 09:00:00', '2017-01-02 09:01:00', '2017-01-02 09:02:00']
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    return pd.DataFrame({
+        'open': [100.0, 101.0, 102.0, 200.0, 201.0, 202.0],
+        'close': [100.5, 101.0, 102.0, 200.0, 201.0, 202.0],
+        'volume': [10, 20, 30, 40, 50, 60],
+    }, index=index)
+
+
+class TestCompactTable(TestCase):
+    def test_compact_table(self):
+        prices = get_sample_prices()
+        compact_prices = compact_table(prices)
+        self.assertEqual(np.int32, compact_prices['open'].dtype)
+        self.assertEqual(np.float32, compact_prices['close'].dtype)
+        self.assertEqual(np.uint32, compact_prices['volume'].dtype)
+        self.assertTrue(pd.api.types.is_datetime64_dtype(compact_prices.index.levels[1]))
+        self.assertLess(get_memory_usage(compact_prices), get_memory_usage(prices))
+
+    def test_keep_large_volume(self):
+        prices = get_sample_prices()
+        prices['volume'] = prices['volume'] * 2 ** 32
+        self.assertEqual(np.int64, compact_table(prices)['volume'].dtype)
+
+    def test_get_compact_dtypes_of_partitions(self):
+        prices = get_sample_prices()
+        dtypes = get_compact_dtypes(prices.iloc[:3])
+        self.assertEqual(np.int32, dtypes['open'])
+
+        # Dtypes of the next partition fit the rows of both partitions.
+        dtypes = get_compact_dtypes(prices.iloc[3:].assign(open=0.5), dtypes)
+        self.assertEqual(np.float32, dtypes['open'])
+        self.assertEqual(np.uint32, dtypes['volume'])
+        dtypes = get_compact_dtypes(prices.iloc[3:].assign(volume=2 ** 32), dtypes)
+        self.assertEqual(np.int64, dtypes['volume'])
+        self.assertEqual(np.float32, dtypes['open'])
+
+        compact_prices = cast_table(prices, dtypes)
+        self.assertEqual(np.float32, compact_prices['open'].dtype)
+        self.assertTrue(pd.api.types.is_datetime64_dtype(compact_prices.index.levels[1]))
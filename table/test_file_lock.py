@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 21.
+"""
+import tempfile
+from multiprocessing import Pool
+from unittest import TestCase
+
+from table.file_lock import FileLock
+
+
+def increase(file_dir):
+    # Read and write the counter slowly, so it loses counts without the lock.
+    lock = FileLock(file_dir + '.lock')
+    with lock:
+        with open(file_dir, 'r') as f:
+            count = int(f.read())
+
+        # The lock is re-entrant.
+        with lock:
+            with open(file_dir, 'w') as f:
+                f.write(str(count + 1))
+
+
+class TestFileLock(TestCase):
+    def test_processes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_dir = temp_dir + '/count'
+            with open(file_dir, 'w') as f:
+                f.write('0')
+
+            with Pool(4) as pool:
+                pool.map(increase, [file_dir] * 40)
+
+            with open(file_dir, 'r') as f:
+                self.assertEqual('40', f.read())
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 23.
+"""
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from table.hash_index import HashIndex
+from table.query import QueryPlan
+
+
+def get_sample_stock_masters():
+    return pd.DataFrame({
+        'code': ['KR7000660001', 'KR7005930003', 'KR7035420009', 'KR7035420009X'],
+        'short_code': ['000660', '005930', '035420', '035420'],
+        'company_name': ['SK하이닉스', '삼성전자', 'NAVER', 'NAVER'],
+    }).set_index('code')
+
+
+class TestHashIndex(TestCase):
+    def setUp(self):
+        self.stock_masters = get_sample_stock_masters()
+        self.hash_index = HashIndex(self.stock_masters, ['code', 'short_code', 'company_name'])
+
+    def test_get_positions(self):
+        testing.assert_array_equal([1], self.hash_index.get_positions('code', ['KR7005930003', 'KR7000000000']))
+        testing.assert_array_equal([2, 3], self.hash_index.get_positions('company_name', ['NAVER']))
+
+    def test_get_first_positions(self):
+        testing.assert_array_equal([2, -1, 0], self.hash_index.get_first_positions('short_code',
+                                                                                   ['035420', '999999', '000660']))
+
+    def test_lookup(self):
+        stock_masters = self.hash_index.lookup(self.stock_masters, 'short_code', ['005930', '999999'])
+        self.assertEqual(['code', 'company_name'], list(stock_masters.columns))
+        self.assertEqual('KR7005930003', stock_masters.loc['005930', 'code'])
+        self.assertTrue(np.all(stock_masters.loc['999999'].isnull()))
+
+    def test_execute_with_hash_index(self):
+        plan = QueryPlan().add(company_name='NAVER', short_code='035420', code='KR7035420009')
+        self.assertEqual(plan.execute(self.stock_masters).index.tolist(),
+                         plan.execute(self.stock_masters, hash_index=self.hash_index).index.tolist())
+        self.assertEqual(['KR7035420009'], plan.execute(self.stock_masters, hash_index=self.hash_index).index.tolist())
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 12.
+"""
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from table.ingestion import ingest_csv
+from table.partition import PartitionedStore
+
+
+def get_sample_prices():
+    dates = pd.date_range(datetime(2016, 12, 26), datetime(2017, 1, 6), freq='B').strftime('%Y-%m-%d %H:%M:%S')
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    return pd.DataFrame({'close': range(len(index))}, index=index, dtype=float)
+
+
+class TestIngestCsv(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_file_dir = self.temp_dir.name + '/prices.csv'
+        self.store = PartitionedStore(self.temp_dir.name + '/prices/', 'month')
+        self.prices = get_sample_prices()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_ingest_shuffled_csv(self):
+        self.prices.sample(frac=1, random_state=0).to_csv(self.csv_file_dir)
+        ingest_csv(self.csv_file_dir, self.store, ['code', 'date'], memory_budget=1)
+        self.assertTrue(self.store.exists())
+        prices = self.store.read()
+        testing.assert_array_equal(self.prices.index.values, prices.index.values)
+        testing.assert_array_equal(self.prices['close'].values, prices['close'].values)
+
+    def test_duplicated_keys(self):
+        pd.concat([self.prices, self.prices.iloc[:1]]).to_csv(self.csv_file_dir)
+        with self.assertRaises(KeyError):
+            ingest_csv(self.csv_file_dir, self.store, ['code', 'date'], memory_budget=1)
+        self.assertFalse(self.store.exists())
+
+    def test_ingest_chunks_of_different_dtypes(self):
+        dates = pd.date_range(datetime(2015, 1, 1), periods=600, freq='B').strftime('%Y-%m-%d %H:%M:%S')
+        index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+        prices = pd.DataFrame({'volume': np.arange(len(index), dtype=float)}, index=index)
+
+        # The volume of the first chunk is integers, and a later chunk has a blank.
+        prices.iloc[-1, 0] = np.nan
+        prices.to_csv(self.csv_file_dir, float_format='%.0f')
+        ingest_csv(self.csv_file_dir, self.store, ['code', 'date'], memory_budget=1)
+        volumes = self.store.read()['volume']
+        self.assertEqual(np.float64, volumes.dtype)
+        testing.assert_array_equal(prices['volume'].values, volumes.values)
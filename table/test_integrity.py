@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 25.
+"""
+from datetime import datetime
+from unittest import TestCase
+
+import pandas as pd
+
+from table.integrity import check_index, validate_index
+
+
+def get_sample_index():
+    dates = pd.date_range(datetime(2017, 1, 2), datetime(2017, 1, 6), freq='B')
+    return pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+
+
+class TestIntegrity(TestCase):
+    def test_sorted_index(self):
+        report = check_index(get_sample_index())
+        self.assertTrue(report['is_monotonic'])
+        self.assertTrue(report['is_unique'])
+
+    def test_duplicated_keys(self):
+        index = get_sample_index()
+        report = check_index(index.append(index[[3]]).sort_values())
+        self.assertTrue(report['is_monotonic'])
+        self.assertEqual([index[3]], report['duplicated_keys'])
+
+        with self.assertRaises(KeyError):
+            validate_index(index[[3, 1, 3]], 'stock_daily_price')
+
+    def test_unsorted_keys(self):
+        index = get_sample_index()
+        report = check_index(index[[0, 5, 1, 6]])
+        self.assertFalse(report['is_monotonic'])
+        self.assertTrue(report['is_unique'])
+        self.assertEqual([index[1]], report['unsorted_keys'])
+
+    def test_single_index(self):
+        report = check_index(pd.Index(['KR7005930003', 'KR7000660001', 'KR7005930003'], name='code'))
+        self.assertEqual(['KR7000660001'], report['unsorted_keys'])
+        self.assertEqual(['KR7005930003'], report['duplicated_keys'])
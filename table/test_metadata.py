@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 21.
+"""
+import os
+import tempfile
+from unittest import TestCase
+
+from table.metadata import get_file_metadata, read_metadata, write_metadata, is_fresh
+
+
+class TestMetadata(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_file_dir = self.temp_dir.name + '/stock_master.csv'
+        self.metadata_file_dir = self.temp_dir.name + '/stock_master.meta.json'
+        with open(self.csv_file_dir, 'w') as f:
+            f.write('code,short_code\nKR7005930003,005930\n')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_write_and_read(self):
+        self.assertIsNone(read_metadata(self.metadata_file_dir))
+        write_metadata(self.metadata_file_dir, get_file_metadata(self.csv_file_dir))
+        self.assertTrue(is_fresh(read_metadata(self.metadata_file_dir), self.csv_file_dir))
+
+    def test_touched_file_is_fresh(self):
+        metadata = get_file_metadata(self.csv_file_dir)
+        os.utime(self.csv_file_dir, (metadata['mtime'] + 10, metadata['mtime'] + 10))
+        self.assertTrue(is_fresh(metadata, self.csv_file_dir))
+
+    def test_changed_file_is_stale(self):
+        metadata = get_file_metadata(self.csv_file_dir)
+        with open(self.csv_file_dir, 'w') as f:
+            f.write('code,short_code\nKR7000660001,000660\n')
+        os.utime(self.csv_file_dir, (metadata['mtime'] + 10, metadata['mtime'] + 10))
+        self.assertFalse(is_fresh(metadata, self.csv_file_dir))
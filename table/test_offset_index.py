@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 10.
+"""
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import pandas as pd
+from numpy import testing
+
+from table.offset_index import OffsetIndex
+
+
+def get_sample_prices():
+    dates = pd.date_range(datetime(2016, 12, 26), datetime(2017, 1, 6), freq='B').strftime('%Y-%m-%d %H:%M:%S')
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    return pd.DataFrame({'close': range(len(index))}, index=index, dtype=float)
+
+
+class TestOffsetIndex(TestCase):
+    def setUp(self):
+        self.prices = get_sample_prices()
+        self.offset_index = OffsetIndex.from_index(self.prices.index)
+
+    def test_from_index(self):
+        testing.assert_array_equal(['KR7000660001', 'KR7005930003'], self.offset_index.codes)
+        testing.assert_array_equal([0, 10], self.offset_index.starts)
+        testing.assert_array_equal([10, 20], self.offset_index.ends)
+
+    def test_locate(self):
+        ranges = self.offset_index.locate(['KR7005930003', 'KR7035420009'], datetime(2017, 1, 2),
+                                          datetime(2017, 1, 4, 23, 59, 59))
+        self.assertEqual([(15, 18)], ranges)
+
+    def test_take(self):
+        prices = self.offset_index.take(self.prices, from_date=datetime(2017, 1, 6))
+        self.assertEqual(2, len(prices))
+        testing.assert_array_equal([9.0, 19.0], prices['close'].values)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.offset_index.save(temp_dir + '/prices.idx.npz')
+            offset_index = OffsetIndex.load(temp_dir + '/prices.idx.npz')
+        testing.assert_array_equal(self.offset_index.dates, offset_index.dates)
+        self.assertEqual(self.offset_index.locate(['KR7000660001']), offset_index.locate(['KR7000660001']))
+
+    def test_locate_windows(self):
+        starts, stops = self.offset_index.locate_windows(
+            ['KR7005930003', 'KR7035420009', 'KR7000660001', 'KR7005930003'],
+            [datetime(2017, 1, 2), datetime(2017, 1, 2), None, datetime(2017, 1, 5)],
+            [datetime(2017, 1, 4, 23, 59, 59), datetime(2017, 1, 4), datetime(2016, 12, 27), None])
+        testing.assert_array_equal([15, 0, 0, 18], starts)
+        testing.assert_array_equal([18, 0, 2, 20], stops)
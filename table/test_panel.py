@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 20.
+"""
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from table.panel import to_panel
+
+
+def get_sample_prices():
+    dates = pd.date_range(datetime(2017, 1, 2), datetime(2017, 1, 6), freq='B').strftime('%Y-%m-%d %H:%M:%S')
+    index = pd.MultiIndex.from_product([['KR7005930003', 'KR7000660001'], dates], names=['code', 'date'])
+    prices = pd.DataFrame({
+        'close': np.arange(len(index), dtype=float),
+        'adj_factor': 0.5,
+    }, index=index, columns=['close', 'adj_factor'])
+
+    # KR7000660001 has no price on 2017-01-04.
+    return prices.drop(('KR7000660001', '2017-01-04 00:00:00')).sort_index()
+
+
+class TestPanel(TestCase):
+    def setUp(self):
+        self.prices = get_sample_prices()
+
+    def test_to_panel(self):
+        panel = to_panel(self.prices)
+        self.assertEqual((2, 5, 1), panel.shape)
+        self.assertEqual(np.float32, panel.values.dtype)
+        self.assertTrue(panel.values.flags['C_CONTIGUOUS'])
+        self.assertEqual(['close'], panel.fields)
+        testing.assert_array_equal(['KR7000660001', 'KR7005930003'], panel.codes)
+        self.assertEqual(pd.Timestamp(2017, 1, 4), panel.dates[2])
+
+        testing.assert_array_equal([True, True, False, True, True], panel.mask[0])
+        self.assertTrue(np.isnan(panel.values[0, 2, 0]))
+        testing.assert_array_equal(self.prices.loc['KR7005930003', 'close'].values, panel.values[1, :, 0])
+
+    def test_to_panel_raw_prices(self):
+        panel = to_panel(self.prices, fields=['close'], adjusted=False)
+        testing.assert_array_equal(self.prices.loc['KR7005930003', 'close'].values * 2, panel.values[1, :, 0])
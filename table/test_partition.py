@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 3.
+"""
+import os
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from table.partition import PartitionedStore
+from table.query import QueryPlan
+
+
+def get_sample_prices():
+    dates = pd.date_range(datetime(2016, 12, 26), datetime(2017, 1, 6), freq='B')
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    return pd.DataFrame({'close': range(len(index))}, index=index, dtype=float)
+
+
+class TestPartitionedStore(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = PartitionedStore(self.temp_dir.name + '/', 'year')
+        self.prices = get_sample_prices()
+        self.store.write(self.prices)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_exists(self):
+        self.assertTrue(self.store.exists())
+
+    def test_partition_paths(self):
+        self.assertEqual(2, len(self.store.partition_paths()))
+        paths = self.store.partition_paths(from_date=datetime(2017, 1, 2))
+        self.assertEqual(1, len(paths))
+        self.assertTrue(paths[0].endswith('/2017.h5'))
+
+    def test_read_codes(self):
+        prices = self.store.read(codes=['KR7005930003'], from_date=datetime(2017, 1, 2))
+        testing.assert_array_equal(['KR7005930003'], prices.index.get_level_values('code').unique())
+        self.assertEqual(5, len(prices))
+
+        # Partitions of dates are cached, and codes are selected from them.
+        self.store.read(from_date=datetime(2017, 1, 2))
+        prices = self.store.read(codes=['KR7000660001'], from_date=datetime(2017, 1, 2), columns=['close'])
+        testing.assert_array_equal(['KR7000660001'], prices.index.get_level_values('code').unique())
+        self.assertEqual(['close'], list(prices.columns))
+
+    def test_read_all(self):
+        prices = self.store.read()
+        testing.assert_array_equal(self.prices.index.values, prices.index.values)
+        testing.assert_array_equal(self.prices['close'].values, prices['close'].values)
+
+    def test_read_columns(self):
+        prices = self.prices.assign(volume=1)
+        self.store.write(prices)
+        volumes = self.store.read(codes=['KR7005930003'], columns=['volume'])
+        self.assertEqual(['volume'], list(volumes.columns))
+        self.assertEqual(len(prices) // 2, len(volumes))
+
+    def test_read_nothing(self):
+        prices = self.store.read(codes=['KR7035420009'])
+        self.assertEqual(0, len(prices))
+        testing.assert_array_equal(['code', 'date'], prices.index.names)
+
+    def test_merge(self):
+        new_prices = get_sample_prices().iloc[[0]] + 100
+        new_prices.index = pd.MultiIndex.from_tuples([('KR7000660001', datetime(2017, 1, 9))], names=['code', 'date'])
+        partition_dirs = self.store.merge(pd.concat([self.prices.iloc[[1]] + 100, new_prices]))
+        self.assertEqual(2, len(partition_dirs))
+
+        prices = self.store.read()
+        self.assertEqual(len(self.prices) + 1, len(prices))
+        self.assertEqual(101.0, prices['close'].iloc[1])
+        self.assertEqual(100.0, prices.loc[('KR7000660001', datetime(2017, 1, 9)), 'close'])
+
+    def test_merge_new_period(self):
+        # Rows of a new period have the dates of old partitions, even if their dates are strings.
+        new_prices = get_sample_prices().iloc[[0]] + 100
+        new_prices.index = pd.MultiIndex.from_tuples([('KR7000660001', '2018-01-02')], names=['code', 'date'])
+        self.store.merge(new_prices)
+        self.assertEqual(3, len(self.store.partition_paths()))
+
+        prices = self.store.read()
+        self.assertEqual(prices.index.levels[1].dtype, self.prices.index.levels[1].dtype)
+        self.assertEqual(100.0, prices.loc[('KR7000660001', datetime(2018, 1, 2)), 'close'])
+
+    def test_version(self):
+        version = self.store.version()
+        self.assertIsNotNone(version)
+
+        self.store.merge(self.prices.iloc[[0]] + 100)
+        self.assertNotEqual(version, self.store.version())
+
+        self.store.clear()
+        self.assertIsNone(self.store.version())
+
+    def test_merge_string_dates(self):
+        # A cache built without parse_dates has dates as strings.
+        prices = self.prices.copy()
+        prices.index = prices.index.set_levels(prices.index.levels[1].strftime('%Y-%m-%d'), level='date')
+        self.store.write(prices)
+        self.store.merge(self.prices.loc[[('KR7005930003', datetime(2017, 1, 4))]] + 100)
+
+        prices = self.store.read(codes=['KR7005930003'])
+        self.assertEqual(len(self.prices) // 2, len(prices))
+        self.assertEqual({10}, set(prices.index.get_level_values('date').str.len()))
+        self.assertGreaterEqual(prices.loc[('KR7005930003', '2017-01-04'), 'close'], 100.0)
+        plan = QueryPlan().add(from_date=datetime(2017, 1, 3), to_date=datetime(2017, 1, 5))
+        self.assertEqual(3, len(plan.execute(prices)))
+
+    def test_cast(self):
+        memory_usage, cast_memory_usage = self.store.cast({'close': np.float32})
+        self.assertLess(cast_memory_usage, memory_usage)
+        self.assertEqual(np.float32, self.store.read()['close'].dtype)
+        self.assertEqual(np.float32, self.store.read(codes=[])['close'].dtype)
+
+        # Partitions which already have the dtypes are not rewritten.
+        version = self.store.version()
+        paths = self.store.partition_paths()
+        mtimes = [os.stat(path).st_mtime_ns for path in paths]
+        self.store.cast({'close': np.float32})
+        self.assertEqual(mtimes, [os.stat(path).st_mtime_ns for path in paths])
+        self.assertNotEqual(version, self.store.version())
+
+    def test_split_by_period(self):
+        # An old version wrote a partition per code and period.
+        self.store.clear()
+        for (code, year), partition in self.prices.groupby([self.prices.index.get_level_values('code'),
+                                                            self.prices.index.get_level_values('date').year]):
+            os.makedirs(self.store.root_dir + code, exist_ok=True)
+            partition.to_hdf('{}{}/{}.h5'.format(self.store.root_dir, code, year), key='table', format='table')
+        self.store.write_schema(self.prices)
+        self.assertTrue(self.store.is_split_by_code())
+
+        self.store.split_by_period()
+        self.assertFalse(self.store.is_split_by_code())
+        self.assertEqual(2, len(self.store.partition_paths()))
+        testing.assert_array_equal(self.prices.index.values, self.store.read().index.values)
+
+    def test_last_rows(self):
+        last_rows = self.store.last_rows(['KR7005930003', 'KR7035420009'], before=datetime(2017, 1, 2))
+        self.assertEqual([('KR7005930003', datetime(2016, 12, 30))], list(last_rows.index))
+        self.assertEqual(2, len(self.store.last_rows(['KR7000660001', 'KR7005930003'])))
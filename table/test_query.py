@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 5.
+"""
+from datetime import datetime
+from unittest import TestCase
+
+import pandas as pd
+
+from table.cache import CacheManager
+from table.query import Query, QueryPlan, take_windows, MEMORY, HDF, PARTITIONS, CSV
+
+
+def get_sample_prices():
+    dates = pd.date_range(datetime(2016, 12, 26), datetime(2017, 1, 6), freq='B')
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    return pd.DataFrame({'close': range(len(index))}, index=index, dtype=float)
+
+
+class TestQueryPlan(TestCase):
+    def test_merge_dates(self):
+        plan = QueryPlan().add(from_date=datetime(2016, 1, 1), to_date=datetime(2017, 1, 31))
+        plan.add(from_date=datetime(2017, 1, 2), to_date=datetime(2017, 1, 3))
+        self.assertEqual(datetime(2017, 1, 2), plan.from_date)
+        self.assertEqual(datetime(2017, 1, 3, 23, 59, 59), plan.to_date)
+
+    def test_contradiction(self):
+        plan = QueryPlan().add(code='KR7000660001').add(code='KR7005930003')
+        self.assertTrue(plan.is_empty)
+        self.assertEqual(0, len(plan.execute(get_sample_prices())))
+
+    def test_execute(self):
+        plan = QueryPlan().add(code='KR7005930003', from_date=datetime(2017, 1, 2), to_date=datetime(2017, 1, 6))
+        prices = plan.execute(get_sample_prices())
+        self.assertEqual(5, len(prices))
+        self.assertEqual({'KR7005930003'}, set(prices.index.get_level_values('code')))
+
+    def test_choose_source(self):
+        self.assertEqual(MEMORY, QueryPlan().choose_source([CSV, HDF, MEMORY]))
+        self.assertEqual(HDF, QueryPlan().choose_source([CSV, HDF, PARTITIONS]))
+        self.assertEqual(PARTITIONS, QueryPlan().add(code='KR7005930003').choose_source([CSV, HDF, PARTITIONS]))
+
+
+class TestQuery(TestCase):
+    def test_queries_are_independent(self):
+        prices = get_sample_prices()
+        first_query = Query('sample', None, selected_table=prices)
+        second_query = Query('sample', None, selected_table=prices)
+        first_query.where(code='KR7005930003')
+        self.assertEqual(len(prices), len(second_query.values()))
+        self.assertEqual(len(prices) // 2, len(first_query.values()))
+
+    def test_lazy_query(self):
+        plans = []
+        query = Query('sample', lambda plan: plans.append(plan) or plan.execute(get_sample_prices()), lazy=True)
+        query.where(code='KR7005930003').where(from_date=datetime(2017, 1, 2))
+        self.assertEqual(0, len(plans))
+        self.assertEqual(5, len(query.values()))
+        self.assertEqual(1, len(plans))
+
+    def test_take_windows(self):
+        windows = pd.DataFrame({
+            'code': ['KR7005930003', 'KR7000660001', 'KR7035420009'],
+            'from_date': [datetime(2017, 1, 2), datetime(2016, 12, 29), datetime(2017, 1, 2)],
+            'to_date': [datetime(2017, 1, 3), datetime(2016, 12, 29), datetime(2017, 1, 3)],
+        }, index=pd.Index(['first', 'second', 'third'], name='event'))
+        prices = take_windows(get_sample_prices(), windows)
+        self.assertEqual(['event', 'code', 'date'], list(prices.index.names))
+        self.assertEqual(['first', 'first', 'second'], list(prices.index.get_level_values('event')))
+        self.assertEqual([15.0, 16.0, 3.0], list(prices['close']))
+
+    def test_result_cache(self):
+        plans = []
+        result_cache = CacheManager()
+
+        def execute(plan):
+            plans.append(plan)
+            return plan.execute(get_sample_prices())
+
+        for lazy in [True, False, True]:
+            query = Query('sample', execute, lazy=lazy, result_cache=result_cache)
+            prices = query.where(code='KR7005930003').where(from_date=datetime(2017, 1, 2)).values()
+            self.assertEqual(5, len(prices))
+
+        # The lazy query and the eager query cache the same merged predicates.
+        self.assertEqual(2, len(plans))
+        self.assertEqual(2, result_cache.stats()['hits'])
+
+    def test_columns(self):
+        prices = get_sample_prices().assign(volume=1.0, adj_factor=2.0)
+        eager_query = Query('sample', None, selected_table=prices, columns=['close'])
+        lazy_query = Query('sample', lambda plan: plan.execute(prices), lazy=True, columns=['close'])
+        for query in [eager_query, lazy_query]:
+            closes = query.where(code='KR7005930003').values(adjusted=False)
+            self.assertEqual(['close'], list(closes.columns))
+            self.assertEqual(prices['close'].iloc[10] / 2.0, closes['close'].iloc[0])
+
+    def test_result_cache_of_columns(self):
+        prices = get_sample_prices().assign(volume=1.0, adj_factor=1.0)
+        result_cache = CacheManager()
+
+        def execute(plan):
+            return plan.execute(prices[plan.read_columns(list(prices.columns)) or prices.columns])
+
+        # A projected result is not served to a query of all columns.
+        closes = Query('sample', execute, lazy=True, result_cache=result_cache, columns=['close']) \
+            .where(code='KR7005930003').values()
+        self.assertEqual(['close'], list(closes.columns))
+        for lazy in [True, False]:
+            prices_of_code = Query('sample', execute, lazy=lazy, result_cache=result_cache) \
+                .where(code='KR7005930003').values()
+            self.assertEqual(['close', 'volume'], list(prices_of_code.columns))
+
+        # A result of all columns serves a projected query.
+        volumes = Query('sample', execute, lazy=True, result_cache=result_cache, columns=['volume']) \
+            .where(code='KR7005930003').values()
+        self.assertEqual(['volume'], list(volumes.columns))
+        self.assertEqual(2, result_cache.stats()['hits'])
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 19.
+"""
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from table.adjustment import select_prices
+from table.resample import resample_bars
+
+
+def get_sample_minute_prices():
+    dates = pd.date_range(datetime(2017, 1, 2, 9, 0), datetime(2017, 1, 2, 9, 11), freq='min')
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    prices = np.arange(len(index), dtype=float)
+    return pd.DataFrame({
+        'open': prices,
+        'high': prices + 2,
+        'low': prices - 2,
+        'close': prices + 1,
+        'volume': np.arange(len(index), dtype=np.uint32),
+    }, index=index, columns=['open', 'high', 'low', 'close', 'volume'])
+
+
+class TestResample(TestCase):
+    def setUp(self):
+        self.prices = get_sample_minute_prices()
+
+    def test_resample_bars(self):
+        bars = resample_bars(self.prices, '5min')
+        self.assertEqual(6, len(bars))
+        self.assertEqual(('KR7005930003', pd.Timestamp(2017, 1, 2, 9, 5)), bars.index[4])
+        testing.assert_array_equal([17, 23, 15, 22, 95], bars.iloc[4].values)
+
+    def test_resample_bars_as_pandas(self):
+        bars = resample_bars(self.prices, '30min')
+        expected_bars = self.prices.groupby(level='code').resample('30min', level='date').agg({
+            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+        testing.assert_array_equal(expected_bars[bars.columns].values, bars.values)
+
+    def test_resample_string_dates(self):
+        prices = self.prices.copy()
+        prices.index = pd.MultiIndex.from_arrays([prices.index.get_level_values('code'),
+                                                  prices.index.get_level_values('date').strftime('%Y-%m-%d %H:%M:%S')],
+                                                 names=['code', 'date'])
+        testing.assert_array_equal(resample_bars(self.prices, '1D').values, resample_bars(prices, '1D').values)
+
+    def test_resample_bars_by_day(self):
+        # 7 hours do not divide a day, so bars start again at the start of each day.
+        prices = self.prices.iloc[:2].copy()
+        prices.index = pd.MultiIndex.from_tuples([('KR7000660001', datetime(2017, 1, 2, 15, 0)),
+                                                  ('KR7000660001', datetime(2017, 1, 3, 3, 0))], names=['code', 'date'])
+        bars = resample_bars(prices, '7H')
+        self.assertEqual([pd.Timestamp(2017, 1, 2, 14, 0), pd.Timestamp(2017, 1, 3, 0, 0)],
+                         list(bars.index.get_level_values('date')))
+
+    def test_resample_adjusted_bars(self):
+        # KR7000660001 is split 2 for 1 at 9:03, so raw prices after it are half of adjusted ones.
+        prices = self.prices.assign(adj_factor=1.0)
+        prices.iloc[3:12, prices.columns.get_loc('adj_factor')] = 2.0
+        bars = resample_bars(prices, '5min')
+        raw_bars = select_prices(bars, adjusted=False)
+        raw_prices = select_prices(prices, adjusted=False)
+        testing.assert_array_equal(raw_prices['open'].iloc[[0, 5, 10]].values, raw_bars['open'].iloc[:3].values)
+        testing.assert_array_equal(raw_prices['high'].iloc[[2, 9, 11]].values, raw_bars['high'].iloc[:3].values)
+        testing.assert_array_equal(raw_prices['close'].iloc[[4, 9, 11]].values, raw_bars['close'].iloc[:3].values)
+        self.assertEqual(['open', 'high', 'low', 'close', 'volume'], list(raw_bars.columns))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+:Author: Jaekyoung Kim
+:Date: 2018. 2. 22.
+"""
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from numpy import testing
+
+from table.shared import publish, attach, is_published, unpublish
+
+
+def get_sample_prices():
+    dates = pd.date_range(datetime(2017, 1, 2), datetime(2017, 1, 6), freq='B')
+    index = pd.MultiIndex.from_product([['KR7000660001', 'KR7005930003'], dates], names=['code', 'date'])
+    return pd.DataFrame({
+        'close': np.arange(len(index), dtype=np.float32),
+        'volume': np.arange(len(index), dtype=np.uint32),
+        'market': 'KOSPI',
+    }, index=index, columns=['close', 'volume', 'market'])
+
+
+class TestShared(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.shared_dir = self.temp_dir.name + '/stock_daily_price.shared/'
+        self.prices = get_sample_prices()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_publish_and_attach(self):
+        publish(self.shared_dir, self.prices, {'dates': np.arange(3)})
+        prices, arrays = attach(self.shared_dir)
+
+        self.assertTrue(prices.index.equals(self.prices.index))
+        testing.assert_array_equal(self.prices['close'].values, prices['close'].values)
+        testing.assert_array_equal(self.prices['market'].values, prices['market'].values)
+        testing.assert_array_equal([0, 1, 2], arrays['dates'])
+
+        # Columns are memory-mapped and read-only.
+        self.assertIsInstance(prices['volume'].values, np.memmap)
+        with self.assertRaises(ValueError):
+            prices['close'].values[0] = 1
+
+    def test_dtypes(self):
+        prices = self.prices.assign(sector=pd.Categorical(['IT', 'Bank'] * 5))
+        publish(self.shared_dir, prices)
+        attached_prices, _ = attach(self.shared_dir)
+        self.assertTrue(prices.dtypes.equals(attached_prices.dtypes))
+        self.assertTrue(prices.equals(attached_prices))
+
+    def test_publish_again(self):
+        publish(self.shared_dir, self.prices)
+        old_prices, _ = attach(self.shared_dir)
+        publish(self.shared_dir, self.prices.iloc[:3])
+
+        # The old table is still readable after a new one is published.
+        self.assertEqual(10, len(old_prices))
+        self.assertEqual(float(old_prices['close'].sum()), float(self.prices['close'].sum()))
+        self.assertEqual(3, len(attach(self.shared_dir)[0]))
+
+    def test_unpublish(self):
+        publish(self.shared_dir, self.prices)
+        unpublish(self.shared_dir)
+        self.assertFalse(is_published(self.shared_dir))
+        self.assertEqual((None, {}), attach(self.shared_dir))
@@ -3,6 +3,7 @@
 :Author: Jaekyoung Kim
 :Date: 2018. 1. 7.
 """
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from unittest import TestCase
 
@@ -48,6 +49,19 @@ class TestStockDailyPrice(TestCase):
         testing.assert_array_equal(['volume', 'open', 'high', 'low', 'close'],
                                    stock_daily_prices.columns.values)
 
+    def test_concurrent_queries(self):
+        stock_masters = StockMaster.instance().select().where(code='KR7005930003').values()
+
+        def get_stock_daily_prices(day):
+            return StockDailyPrice.instance().select().where(stock_masters=stock_masters,
+                                                             from_date=datetime(2017, 1, 2),
+                                                             to_date=datetime(2017, 1, day)).values()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(get_stock_daily_prices, [2, 3, 4, 5, 6] * 4))
+
+        self.assertEqual([1, 2, 3, 4, 5] * 4, [len(result) for result in results])
+
 
 class TestStockMinutePrice(TestCase):
     def test_get_all_stock_minute_prices(self):
@@ -45,6 +45,16 @@ def _get_engine_key():
         default='aws',
         help='Directory to put the log data.'
     )
+    parser.add_argument(
+        '--database_url',
+        type=str,
+        default=None,
+        help='The url of a database to use instead of --engine_key, like a throwaway database of benchmarks.'
+    )
 
     flags, unparsed = parser.parse_known_args()
+    if flags.database_url is not None:
+        if flags.database_url not in engine_pool:
+            engine_pool[flags.database_url] = create_engine(flags.database_url, encoding='utf-8', pool_recycle=1)
+        return flags.database_url
     return flags.engine_key
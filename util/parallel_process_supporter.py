@@ -9,7 +9,8 @@ from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 
 
-def parallel_process(func, params, process_multiplier=None, use_kwargs=False, front_num=1, timeout=None):
+def parallel_process(func, params, process_multiplier=None, use_kwargs=False, front_num=1, timeout=None,
+                     shared_tables=None):
     """
     A parallel version of the map function with a progress bar.
 
@@ -23,6 +24,8 @@ def parallel_process(func, params, process_multiplier=None, use_kwargs=False, fr
         Useful for catching bugs
     :param timeout: (int, default=None) The maximum number of seconds to wait. If None, then the timeout become
         (# of array + 3).
+    :param shared_tables: (list of Table, default=None) Tables to share with the processes before they start.
+        The processes attach them instead of loading their own copies. See table.base.Table.share.
 
     :return results: (?) The result of futures.
     """
@@ -32,6 +35,10 @@ def parallel_process(func, params, process_multiplier=None, use_kwargs=False, fr
         processes = processes * process_multiplier
 
     print('# of processes:{}'.format(processes))
+    # Share tables before the workers load them.
+    if shared_tables is not None:
+        for shared_table in shared_tables:
+            shared_table.share()
     # Set the timeout.
     if timeout is None:
         timeout = len(params) + 3